@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.routes import google_auth, auth, user_router,exam_router, report_router
+from app.api.routes import google_auth, auth, user_router,exam_router, report_router, metrics_router
 
 router = APIRouter()
 
@@ -7,4 +7,5 @@ router.include_router(auth.router)
 router.include_router(google_auth.router)
 router.include_router(user_router.router)
 router.include_router(exam_router.router)
-router.include_router(report_router.router)
\ No newline at end of file
+router.include_router(report_router.router)
+router.include_router(metrics_router.router)
\ No newline at end of file
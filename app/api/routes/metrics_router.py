@@ -0,0 +1,9 @@
+from fastapi import APIRouter, Depends
+from app.services.embedding_service import EmbeddingService
+from app.api.routes.auth import require_role
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+@router.get("/embedding", summary="Metrics bộ gom batch embedding (batch size, thời gian chờ, hàng đợi)")
+def embedding_metrics(_: str = Depends(require_role(["admin", "master"]))):
+    return EmbeddingService.metrics()
@@ -1,10 +1,11 @@
-from typing import List
-from fastapi import APIRouter, Depends, UploadFile, File
+from typing import List, Optional
+from fastapi import APIRouter, Depends, UploadFile, File, Header
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app.models.user import User
-from app.schemas.report import ReportCreate, ReportUpdate, ReportResponse
+from app.schemas.report import ReportCreate, ReportUpdate, ReportResponse, PlagiarismMatchResponse, PlagiarismClusterResponse, UploadJobResponse
 from app.services.report_service import ReportService
+from app.services.upload_job_service import UploadJobService
 from app.schemas.base_schemas import ListResponse, DetailResponse, CreateResponse, UpdateResponse, DeleteResponse
 from app.api.routes.auth import require_role
 
@@ -14,6 +15,27 @@ router = APIRouter(prefix="/reports", tags=["Reports"])
 def get_reports(db: Session = Depends(get_db), _: str = Depends(require_role(["admin", "viewer"])), page: int = 1, page_size: int = 20):
     return ReportService.get_list(db, page, page_size)
 
+@router.get("/plagiarism/matches", response_model=ListResponse[PlagiarismMatchResponse], summary="Danh sách cặp đạo văn theo kỳ thi hoặc báo cáo")
+def get_plagiarism_matches(
+    exam_id: Optional[int] = None,
+    report_id: Optional[int] = None,
+    page: int = 1,
+    page_size: int = 20,
+    db: Session = Depends(get_db),
+    _: str = Depends(require_role(["admin", "viewer"]))
+):
+    return ReportService.get_plagiarism_matches(db, exam_id, report_id, page, page_size)
+
+@router.get("/plagiarism/clusters/{exam_id}", response_model=ListResponse[PlagiarismClusterResponse], summary="Cụm báo cáo đạo văn của kỳ thi")
+def get_plagiarism_clusters(
+    exam_id: int,
+    page: int = 1,
+    page_size: int = 20,
+    db: Session = Depends(get_db),
+    _: str = Depends(require_role(["admin", "viewer"]))
+):
+    return ReportService.get_plagiarism_clusters(db, exam_id, page, page_size)
+
 @router.get("/{report_id}", response_model=DetailResponse[ReportResponse], summary="Chi tiết báo cáo theo ID")
 def get_report_detail(report_id: int, db: Session = Depends(get_db), _: str = Depends(require_role(["admin", "viewer"]))):
     return ReportService.get_detail(db, report_id)
@@ -30,16 +52,42 @@ def update_report(report_id: int, payload: ReportUpdate, db: Session = Depends(g
 def delete_report(report_id: int, db: Session = Depends(get_db), _: str = Depends(require_role(["admin"]))):
     return ReportService.delete(db, report_id)
 
-@router.post("/upload/{exam_id}", response_model=CreateResponse, summary="Upload file báo cáo cho kỳ thi")
+@router.post("/upload/{exam_id}", response_model=DetailResponse[UploadJobResponse], status_code=202, summary="Upload file báo cáo cho kỳ thi (xử lý nền)")
 def upload_report_files(
     exam_id: int,
     files: List[UploadFile] = File(...),
     db: Session = Depends(get_db),
-    username: str = Depends(require_role(["admin", "master"]))
+    current_user: User = Depends(require_role(["admin", "master"]))
+):
+    job = UploadJobService.enqueue(db, exam_id, files, current_user.login_id)
+    return DetailResponse(status=True, data=UploadJobService.map_to_schema(job))
+
+@router.get("/jobs/{job_id}", response_model=DetailResponse[UploadJobResponse], summary="Trạng thái xử lý của lô upload")
+def get_upload_job(job_id: int, db: Session = Depends(get_db), _: str = Depends(require_role(["admin", "master"]))):
+    return UploadJobService.get_status(db, job_id)
+
+@router.get("/files/{file_id}", summary="Tải một file báo cáo (PDF, hỗ trợ Range và ETag)")
+def download_report_file(
+    file_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    _: str = Depends(require_role(["admin", "viewer"]))
 ):
-    result = ReportService.upload_files(db, exam_id, files, username)
-    return {"success": True, "status": 200, "data": result}
+    return ReportService.download_file(db, file_id, if_none_match)
+
+@router.get("/download/exams/{exam_id}", summary="Tải file báo cáo của kỳ thi (ZIP, stream)")
+def download_exam_files(exam_id: int, db: Session = Depends(get_db), _: str = Depends(require_role(["admin", "viewer"]))):
+    return ReportService.download_exam_files(db, exam_id)
+
+@router.get("/download/jobs/{job_id}", summary="Tải file của một lô upload (ZIP, stream)")
+def download_job_files(job_id: int, db: Session = Depends(get_db), _: str = Depends(require_role(["admin", "master"]))):
+    return ReportService.download_job_files(db, job_id)
 
 @router.get("/export/{exam_id}", summary="Export báo cáo theo kỳ thi ra file Excel")
-def export_reports(exam_id: int, db: Session = Depends(get_db)):
-    return ReportService.export_by_exam(db, exam_id)
+def export_reports(
+    exam_id: int,
+    include_raw_content: bool = False,
+    db: Session = Depends(get_db),
+    _: str = Depends(require_role(["admin", "viewer"]))
+):
+    return ReportService.export_by_exam(db, exam_id, include_raw_content)
@@ -8,5 +8,76 @@ class Settings:
     ALGORITHM = os.getenv("ALGORITHM")
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
     DATABASE_URL = os.getenv("DATABASE_URL")
+    EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "paraphrase-multilingual-mpnet-base-v2")
+    # torch: SentenceTransformer fp32 | onnx: model int8 (scripts/export_onnx_embedding.py)
+    EMBEDDING_ENGINE = os.getenv("EMBEDDING_ENGINE", "torch")
+    EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "ml/model/embedding_onnx")
+    EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", 0))
+    # local: model trong từng worker | server: dùng chung qua scripts/run_embedding_server.py
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "local")
+    EMBEDDING_SOCKET_PATH = os.getenv("EMBEDDING_SOCKET_PATH", "/tmp/be_tool_embedding.sock")
+    EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", 120))
+    EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", 64))
+    EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", 10))
+    EMBEDDING_MAX_QUEUE = int(os.getenv("EMBEDDING_MAX_QUEUE", 1024))
+    EMBEDDING_MICRO_BATCH = os.getenv("EMBEDDING_MICRO_BATCH", "true").lower() == "true"
+    # Chỉ mục đạo văn xuyên kỳ thi (IVF trên NumPy)
+    PLAGIARISM_INDEX_DIR = os.getenv("PLAGIARISM_INDEX_DIR", "uploads/plagiarism_index")
+    PLAGIARISM_INDEX_NPROBE = int(os.getenv("PLAGIARISM_INDEX_NPROBE", 8))
+    PLAGIARISM_INDEX_TOP_K = int(os.getenv("PLAGIARISM_INDEX_TOP_K", 5))
+    # Lọc sơ bộ từ vựng (MinHash/LSH) trước khi so sánh ngữ nghĩa
+    PLAGIARISM_LEXICAL_PREFILTER = os.getenv("PLAGIARISM_LEXICAL_PREFILTER", "true").lower() == "true"
+    PLAGIARISM_LEXICAL_THRESHOLD = float(os.getenv("PLAGIARISM_LEXICAL_THRESHOLD", 0.8))
+    MINHASH_NUM_PERM = int(os.getenv("MINHASH_NUM_PERM", 128))
+    MINHASH_BANDS = int(os.getenv("MINHASH_BANDS", 64))
+    # Embedding theo cửa sổ trượt (đơn vị: từ/âm tiết) và cách gộp điểm: max | topk_mean
+    PLAGIARISM_CHUNK_WORDS = int(os.getenv("PLAGIARISM_CHUNK_WORDS", 80))
+    PLAGIARISM_CHUNK_STRIDE = int(os.getenv("PLAGIARISM_CHUNK_STRIDE", 60))
+    PLAGIARISM_CHUNK_AGGREGATE = os.getenv("PLAGIARISM_CHUNK_AGGREGATE", "topk_mean")
+    PLAGIARISM_CHUNK_TOP_K = int(os.getenv("PLAGIARISM_CHUNK_TOP_K", 3))
+    # Render PDF sang ảnh bằng process pool (0 = số core)
+    RASTER_PROCESSES = int(os.getenv("RASTER_PROCESSES", 0))
+    PDF_RENDER_DPI = int(os.getenv("PDF_RENDER_DPI", 300))
+    # Thử render ở DPI thấp trước, kết quả chưa hợp lệ mới render lại ở mức cao hơn.
+    # Chỉ có tác dụng khi trang được render ảnh: GEMINI_INPUT_MODE=pages hoặc PDF lớn hơn
+    # GEMINI_PDF_MAX_BYTES (15MB); ở chế độ pdf mặc định file được gửi nguyên, không render
+    PDF_RENDER_DPI_TIERS = [int(d) for d in os.getenv("PDF_RENDER_DPI_TIERS", "150,300").split(",") if d.strip()]
+    # pymupdf: render trong tiến trình | poppler: pdf2image + pdftoppm
+    PDF_RENDER_ENGINE = os.getenv("PDF_RENDER_ENGINE", "pymupdf")
+    PDF_RENDER_FORMAT = os.getenv("PDF_RENDER_FORMAT", "PNG")
+    PDF_RENDER_COLORSPACE = os.getenv("PDF_RENDER_COLORSPACE", "rgb")
+    # OCR dự phòng: tesserocr (handle giữ sẵn trong tiến trình) | pytesseract | auto
+    OCR_ENGINE = os.getenv("OCR_ENGINE", "auto")
+    # Số handle tesserocr tối đa cho mỗi bộ lang/oem/psm (mặc định bằng số luồng trích xuất)
+    OCR_MAX_HANDLES = int(os.getenv("OCR_MAX_HANDLES", os.getenv("GEMINI_CONCURRENCY", 4)))
+    # Đọc lớp chữ của PDF trước, chỉ render ảnh cho trang scan
+    TEXT_LAYER_FIRST = os.getenv("TEXT_LAYER_FIRST", "true").lower() == "true"
+    TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", 100))
+    # pdf: gửi nguyên file PDF (một part application/pdf) | pages: ảnh từng trang scan
+    GEMINI_INPUT_MODE = os.getenv("GEMINI_INPUT_MODE", "pdf")
+    # PDF lớn hơn ngưỡng này thì render ảnh (giới hạn request inline của Gemini ~20MB)
+    GEMINI_PDF_MAX_BYTES = int(os.getenv("GEMINI_PDF_MAX_BYTES", 15 * 1024 * 1024))
+    # Cache kết quả trích xuất theo SHA-256 PDF + phiên bản prompt (LRU + bảng extraction_cache)
+    EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+    EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", 512))
+    EXTRACTION_CACHE_DB = os.getenv("EXTRACTION_CACHE_DB", "true").lower() == "true"
+    # Số lời gọi Gemini chạy song song khi trích xuất một lô upload
+    GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", 4))
+    # Upload: chép xuống đĩa theo khối, vượt giới hạn dung lượng thì trả 413
+    UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", 1024 * 1024))
+    UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", 50 * 1024 * 1024))
+    UPLOAD_MAX_BATCH_BYTES = int(os.getenv("UPLOAD_MAX_BATCH_BYTES", 1024 * 1024 * 1024))
+    # Kho file báo cáo theo nội dung (<root>/ab/cd/<sha256>), dọn bằng scripts/gc_blobs.py
+    BLOB_STORAGE_BACKEND = os.getenv("BLOB_STORAGE_BACKEND", "local")
+    BLOB_STORE_ROOT = os.getenv("BLOB_STORE_ROOT", "uploads/blobs")
+    BLOB_GC_GRACE_HOURS = float(os.getenv("BLOB_GC_GRACE_HOURS", 24))
+    # Xuất Excel: số dòng đọc mỗi lô, file nhỏ hơn ngưỡng giữ trong RAM (lớn hơn thì ghi đĩa)
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+    EXPORT_SPOOL_MAX_BYTES = int(os.getenv("EXPORT_SPOOL_MAX_BYTES", 16 * 1024 * 1024))
+    # Hàng đợi job upload (scripts/run_upload_worker.py)
+    UPLOAD_JOB_LEASE_SECONDS = int(os.getenv("UPLOAD_JOB_LEASE_SECONDS", 300))
+    UPLOAD_JOB_MAX_ATTEMPTS = int(os.getenv("UPLOAD_JOB_MAX_ATTEMPTS", 3))
+    UPLOAD_WORKER_PROCESSES = int(os.getenv("UPLOAD_WORKER_PROCESSES", 2))
+    UPLOAD_WORKER_POLL_INTERVAL = float(os.getenv("UPLOAD_WORKER_POLL_INTERVAL", 2))
 
 settings = Settings()
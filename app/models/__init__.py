@@ -4,4 +4,9 @@ from app.models.user import User
 from app.models.role import Role
 from app.models.exam import Exam
 from app.models.report import Report
-from app.models.report_file import ReportFile
\ No newline at end of file
+from app.models.report_file import ReportFile
+from app.models.report_embedding import ReportEmbedding
+from app.models.plagiarism_match import PlagiarismMatch
+from app.models.upload_job import UploadJob, UploadJobFile
+from app.models.extraction_cache import ExtractionCacheEntry
+from app.models.blob import Blob
\ No newline at end of file
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from app.db import Base
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True, comment="SHA-256 (hex) nội dung, cũng là khoá trong kho blob")
+    size_bytes = Column(Integer, nullable=False)
+    # Số ReportFile đang trỏ tới blob; về 0 thì blob được dọn (scripts/gc_blobs.py)
+    ref_count = Column(Integer, nullable=False, default=0)
+    # UTC, cập nhật mỗi lần upload/tham chiếu: GC bỏ qua blob mới dùng gần đây
+    last_used_at = Column(DateTime)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, UniqueConstraint, func
+from app.db import Base
+
+class ExtractionCacheEntry(Base):
+    __tablename__ = "extraction_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    pdf_sha256 = Column(String(64), nullable=False, comment="SHA-256 của bytes PDF")
+    prompt_version = Column(String(100), nullable=False, comment="Model + phiên bản prompt trích xuất")
+    data = Column(Text, nullable=False, comment="Kết quả trích xuất (JSON)")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("pdf_sha256", "prompt_version", name="uq_extraction_cache_key"),
+    )
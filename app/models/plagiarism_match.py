@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index, func
+from app.db import Base
+
+class PlagiarismMatch(Base):
+    __tablename__ = "plagiarism_matches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    report_a_id = Column(Integer, ForeignKey("reports.id", ondelete="CASCADE"), nullable=False, index=True)
+    report_b_id = Column(Integer, ForeignKey("reports.id", ondelete="CASCADE"), nullable=False, index=True)
+    exam_id = Column(Integer, ForeignKey("exams.id"), nullable=False, comment="Kỳ thi của lô upload phát hiện cặp này")
+    score = Column(Float, nullable=False)
+    method = Column(String(20), nullable=False, comment="lexical | semantic")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_plagiarism_matches_exam_created", "exam_id", "created_at"),
+        # Job chạy lại (mất lease sau khi đã lưu cặp) không ghi trùng cặp của kỳ thi
+        Index("uq_plagiarism_matches_pair", "exam_id", "report_a_id", "report_b_id", unique=True),
+    )
@@ -6,7 +6,9 @@ from app.db import Base
 class ReportStatus(str, enum.Enum):
     pending = "pending"
     completed = "completed"
+    checked = "checked"
     plagiarized = "plagiarized"
+    approved = "approved"
 
 class Report(Base):
     __tablename__ = "reports"
@@ -35,3 +37,4 @@ class Report(Base):
 
     exam = relationship("Exam", back_populates="reports")
     files = relationship("ReportFile", back_populates="report", cascade="all, delete")
+    embedding = relationship("ReportEmbedding", back_populates="report", uselist=False, cascade="all, delete")
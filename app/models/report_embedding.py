@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, LargeBinary, func
+from sqlalchemy.orm import relationship
+from app.db import Base
+
+class ReportEmbedding(Base):
+    __tablename__ = "report_embeddings"
+
+    report_id = Column(Integer, ForeignKey("reports.id", ondelete="CASCADE"), primary_key=True)
+    content_hash = Column(String(64), nullable=False, comment="SHA-256 của raw_content lúc mã hoá")
+    model_name = Column(String(255), nullable=False)
+    dim = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False, comment="Embedding float16 (little-endian), dạng bytes")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    report = relationship("Report", back_populates="embedding")
@@ -8,6 +8,9 @@ class ReportFile(Base):
     id = Column(Integer, primary_key=True, index=True)
     name_file = Column(String(255), nullable=False)
     path_storage = Column(String(500), nullable=False)
+    # Blob trong kho nội dung (NULL với file cũ chưa chuyển, xem scripts/migrate_report_files_to_blobs.py)
+    content_hash = Column(String(64), ForeignKey("blobs.sha256"), index=True)
+    render_dpi = Column(Integer, comment="DPI cuối cùng dùng khi render ảnh để trích xuất (NULL nếu không cần render)")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     report_id = Column(Integer, ForeignKey("reports.id"), nullable=False)
 
@@ -0,0 +1,65 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Text, Index, func
+from sqlalchemy.orm import relationship
+import enum
+from app.db import Base
+
+class UploadJobStatus(str, enum.Enum):
+    pending = "pending"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+class UploadJobFileStatus(str, enum.Enum):
+    pending = "pending"
+    done = "done"
+    failed = "failed"
+
+class UploadJob(Base):
+    __tablename__ = "upload_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    exam_id = Column(Integer, ForeignKey("exams.id"), nullable=False)
+    folder_path = Column(String(500), nullable=False)
+    status = Column(
+        Enum(UploadJobStatus, native_enum=False, create_type=False),
+        default=UploadJobStatus.pending,
+        nullable=False
+    )
+    total_files = Column(Integer, nullable=False, default=0)
+    processed_files = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Lease: worker giữ job tới lease_expires_at (UTC), hết hạn thì worker khác được nhận lại
+    lease_owner = Column(String(255))
+    lease_expires_at = Column(DateTime)
+    error = Column(Text)
+    result = Column(Text, comment="Kết quả xử lý (JSON)")
+    created_by = Column(String(100))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+
+    files = relationship("UploadJobFile", back_populates="job", cascade="all, delete", order_by="UploadJobFile.id")
+
+    __table_args__ = (
+        Index("ix_upload_jobs_status_lease", "status", "lease_expires_at"),
+    )
+
+class UploadJobFile(Base):
+    __tablename__ = "upload_job_files"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("upload_jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    name_file = Column(String(255), nullable=False)
+    path_storage = Column(String(500), nullable=False)
+    # Tính khi upload (chép theo khối), worker dùng làm khoá cache trích xuất
+    content_hash = Column(String(64), comment="SHA-256 (hex) nội dung file")
+    size_bytes = Column(Integer)
+    status = Column(
+        Enum(UploadJobFileStatus, native_enum=False, create_type=False),
+        default=UploadJobFileStatus.pending,
+        nullable=False
+    )
+    report_id = Column(Integer, ForeignKey("reports.id", ondelete="SET NULL"))
+    error = Column(Text)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    job = relationship("UploadJob", back_populates="files")
@@ -11,6 +11,7 @@ class PlagiarismResultSchema(BaseModel):
     score: str = Field(description="Điểm tương đồng Cosine (chuỗi thập phân).")
     id_1: Optional[int] = Field(description="ID Report của file 1.")
     id_2: Optional[int] = Field(description="ID Report của file 2.")
+    method: Optional[str] = Field(default=None, description="Giai đoạn phát hiện: lexical (MinHash) hoặc semantic (embedding).")
     
 class UploadSuccessData(BaseModel):
     message: str = Field(description="Thông báo tổng quan.")
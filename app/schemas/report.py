@@ -14,6 +14,8 @@ class ReportFileResponse(BaseModel):
     id: int
     name_file: str
     path_storage: str
+    content_hash: Optional[str] = None
+    render_dpi: Optional[int] = None
     created_at: datetime
 
     class Config:
@@ -48,6 +50,52 @@ class ReportResponse(ReportBase):
     class Config:
         from_attributes = True
 
+class PlagiarismMatchResponse(BaseModel):
+    id: int
+    report_a_id: int
+    report_b_id: int
+    exam_id: int
+    score: float
+    method: str
+    created_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+class PlagiarismClusterMember(BaseModel):
+    id: int
+    name: Optional[str]
+    student_code: Optional[str]
+    exam_id: int
+
+class PlagiarismClusterResponse(BaseModel):
+    report_ids: List[int]
+    size: int
+    pair_count: int
+    max_score: float
+    mean_score: float
+    members: List[PlagiarismClusterMember] = []
+
+class UploadJobFileResponse(BaseModel):
+    id: int
+    name_file: str
+    status: str
+    report_id: Optional[int]
+    error: Optional[str]
+
+class UploadJobResponse(BaseModel):
+    id: int
+    exam_id: int
+    status: str
+    total_files: int
+    processed_files: int
+    attempts: int
+    error: Optional[str]
+    result: Optional[dict]
+    created_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    files: List[UploadJobFileResponse] = []
+
 class ReportFileSchema(BaseModel):
     id: int
     name_file: str
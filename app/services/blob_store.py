@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Kho file báo cáo định địa chỉ theo nội dung (SHA-256).
+
+Mỗi nội dung chỉ lưu một lần tại `<root>/ab/cd/<sha256>`; upload lại cùng file chỉ
+tăng số tham chiếu. Bảng `blobs` giữ kích thước và `ref_count` (số ReportFile trỏ
+tới). Blob không còn tham chiếu, không thuộc job upload nào và không được dùng
+trong BLOB_GC_GRACE_HOURS giờ thì bị dọn bằng `scripts/gc_blobs.py`. File của job
+(kể cả file lỗi, job lỗi) được giữ tới khi job bị xoá để chạy lại hay tải ZIP của lô
+vẫn đọc được; job cũ đã kết thúc dọn bằng `gc_blobs --jobs-older-than-days`.
+
+Backend chọn qua BLOB_STORAGE_BACKEND (hiện có `local`: hệ thống file).
+"""
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+from typing import BinaryIO, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.blob import Blob
+from app.models.report_file import ReportFile
+from app.models.upload_job import UploadJobFile
+
+
+class BlobStorage:
+    name = "base"
+
+    def put_file(self, src_path: str, digest: str) -> bool:
+        """Chuyển file `src_path` vào kho; trả về False nếu nội dung đã có (file nguồn bị xoá)."""
+        raise NotImplementedError
+
+    def exists(self, digest: str) -> bool:
+        raise NotImplementedError
+
+    def open(self, digest: str) -> BinaryIO:
+        raise NotImplementedError
+
+    def local_path(self, digest: str) -> Optional[str]:
+        """Đường dẫn trên đĩa nếu backend có (để gửi file trực tiếp), ngược lại None."""
+        return None
+
+    def delete(self, digest: str):
+        raise NotImplementedError
+
+
+class LocalBlobStorage(BlobStorage):
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def blob_path(self, digest: str) -> str:
+        if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+            raise ValueError(f"SHA-256 không hợp lệ: {digest}")
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def put_file(self, src_path: str, digest: str) -> bool:
+        dest = self.blob_path(digest)
+        if os.path.exists(dest):
+            os.remove(src_path)
+            return False
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        try:
+            # Cùng hệ thống file: đổi tên nguyên tử, không chép dữ liệu
+            os.replace(src_path, dest)
+        except OSError:
+            tmp = f"{dest}.{os.getpid()}.tmp"
+            shutil.move(src_path, tmp)
+            os.replace(tmp, dest)
+        return True
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.blob_path(digest))
+
+    def open(self, digest: str) -> BinaryIO:
+        return open(self.blob_path(digest), "rb")
+
+    def local_path(self, digest: str) -> Optional[str]:
+        return self.blob_path(digest)
+
+    def delete(self, digest: str):
+        try:
+            os.remove(self.blob_path(digest))
+        except FileNotFoundError:
+            pass
+
+
+def create_storage(backend: str = None) -> BlobStorage:
+    backend = backend or settings.BLOB_STORAGE_BACKEND
+    if backend == "local":
+        return LocalBlobStorage(settings.BLOB_STORE_ROOT)
+    raise ValueError(f"BLOB_STORAGE_BACKEND không hợp lệ: {backend}")
+
+
+_storage: Optional[BlobStorage] = None
+_storage_lock = threading.Lock()
+
+
+def get_blob_storage() -> BlobStorage:
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+    return _storage
+
+
+class BlobService:
+
+    @staticmethod
+    def register(db: Session, digest: str, size: int, commit: bool = True) -> bool:
+        """
+        Ghi nhận blob vừa upload (chưa có tham chiếu). Trả về True nếu nội dung đã có
+        sẵn trong kho (upload lại). Mặc định commit ngay để upload song song cùng nội dung
+        không làm hỏng transaction của nhau; `commit=False` để người gọi gom nhiều blob
+        (và các thay đổi khác) vào một transaction.
+        """
+        now = datetime.utcnow()
+        existed = db.query(Blob).filter(Blob.sha256 == digest).update(
+            {"last_used_at": now}, synchronize_session=False
+        )
+        if not existed:
+            try:
+                # Savepoint: trùng khoá chỉ huỷ dòng này, không huỷ phần người gọi đã ghi
+                with db.begin_nested():
+                    db.add(Blob(sha256=digest, size_bytes=size, ref_count=0, last_used_at=now))
+            except IntegrityError:
+                # Request khác vừa tạo cùng blob
+                existed = 1
+        if commit:
+            db.commit()
+        return bool(existed)
+
+    @staticmethod
+    def retain(db: Session, digest: str):
+        """Tăng tham chiếu (trong transaction của người gọi)."""
+        db.query(Blob).filter(Blob.sha256 == digest).update(
+            {"ref_count": Blob.ref_count + 1, "last_used_at": datetime.utcnow()}, synchronize_session=False
+        )
+
+    @staticmethod
+    def release(db: Session, digest: str):
+        """Giảm tham chiếu (trong transaction của người gọi); file chỉ bị xoá khi chạy GC."""
+        db.query(Blob).filter(Blob.sha256 == digest, Blob.ref_count > 0).update(
+            {"ref_count": Blob.ref_count - 1, "last_used_at": datetime.utcnow()}, synchronize_session=False
+        )
+
+    @staticmethod
+    def recount(db: Session, commit: bool = True) -> int:
+        """
+        Tính lại ref_count từ report_files (sửa lệch sau sự cố). Trả về số blob đã sửa.
+        `commit=False` chỉ ghi vào session (người gọi commit hoặc rollback).
+        """
+        counts = dict(
+            db.query(ReportFile.content_hash, func.count(ReportFile.id))
+            .filter(ReportFile.content_hash.isnot(None))
+            .group_by(ReportFile.content_hash)
+            .all()
+        )
+        fixed = 0
+        for blob in db.query(Blob).all():
+            actual = counts.get(blob.sha256, 0)
+            if blob.ref_count != actual:
+                blob.ref_count = actual
+                fixed += 1
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+        return fixed
+
+    @staticmethod
+    def garbage(db: Session, grace_hours: float = None) -> List[Blob]:
+        """Blob có thể xoá: 0 tham chiếu, quá hạn và không còn UploadJobFile nào trỏ tới."""
+        grace_hours = settings.BLOB_GC_GRACE_HOURS if grace_hours is None else grace_hours
+        cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+        return db.query(Blob).filter(
+            Blob.ref_count <= 0,
+            Blob.last_used_at < cutoff,
+            Blob.sha256.notin_(BlobService._job_hashes(db)),
+        ).order_by(Blob.sha256).all()
+
+    @staticmethod
+    def _job_hashes(db: Session):
+        # path_storage của file trong job trỏ vào kho blob bất kể trạng thái file/job
+        return db.query(UploadJobFile.content_hash).filter(UploadJobFile.content_hash.isnot(None))
+
+    @staticmethod
+    def collect_garbage(db: Session, storage: BlobStorage = None, grace_hours: float = None) -> List[str]:
+        """
+        Xoá blob không còn tham chiếu. Mỗi blob được xoá bằng DELETE có điều kiện
+        (vẫn 0 tham chiếu, vẫn quá hạn, chưa có job mới trỏ tới); file bị xoá trước khi
+        commit, trong lúc dòng còn bị khoá. Upload cùng nội dung chạy song song phải chờ
+        commit đó, nên không thể thấy file cũ còn đó rồi bỏ bản của mình trong khi GC
+        xoá file. Trả về danh sách hash đã xoá.
+        """
+        storage = storage or get_blob_storage()
+        grace_hours = settings.BLOB_GC_GRACE_HOURS if grace_hours is None else grace_hours
+        cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+        removed = []
+        for digest in [blob.sha256 for blob in BlobService.garbage(db, grace_hours)]:
+            deleted = db.query(Blob).filter(
+                Blob.sha256 == digest,
+                Blob.ref_count <= 0,
+                Blob.last_used_at < cutoff,
+                Blob.sha256.notin_(BlobService._job_hashes(db)),
+            ).delete(synchronize_session=False)
+            if not deleted:
+                db.rollback()
+                continue
+            try:
+                storage.delete(digest)
+            except Exception as e:
+                # Không xoá được file: giữ lại dòng để lần GC sau thử lại
+                print(f"[ERROR] Xoá blob {digest} thất bại: {e}")
+                db.rollback()
+                continue
+            db.commit()
+            removed.append(digest)
+        return removed
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Các backend chạy model embedding, cùng một giao diện `encode(texts) -> ndarray`.
+
+torch : SentenceTransformer (PyTorch, fp32) - mặc định.
+onnx  : model đã export + lượng tử hoá int8 chạy bằng ONNX Runtime
+        (tạo bằng `scripts/export_onnx_embedding.py`), nhẹ RAM và nhanh hơn trên CPU.
+        Cần cài thêm: pip install -e ".[onnx]"
+"""
+import os
+from typing import List
+
+import numpy as np
+
+from app.core.config import settings
+
+EMBEDDING_BATCH_SIZE = 32
+ONNX_MODEL_FILE = "model_quantized.onnx"
+# Độ chính xác trọng số của từng engine (ONNX luôn dùng bản lượng tử hoá int8)
+ENGINE_PRECISION = {"torch": "fp32", "onnx": "int8"}
+
+
+def mean_pooling(token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """Trung bình các token thật (bỏ padding), giống pooling của SentenceTransformer."""
+    mask = attention_mask[..., None].astype(np.float32)
+    summed = (token_embeddings * mask).sum(axis=1)
+    counts = np.clip(mask.sum(axis=1), 1e-9, None)
+    return summed / counts
+
+
+def l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.clip(norms, 1e-12, None)
+
+
+class EmbeddingBackend:
+    name = "base"
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Trả về ma trận float32 (len(texts) x dim) đã chuẩn hoá L2."""
+        raise NotImplementedError
+
+
+class TorchBackend(EmbeddingBackend):
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(
+            self.model.encode(
+                list(texts),
+                batch_size=EMBEDDING_BATCH_SIZE,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            ),
+            dtype=np.float32,
+        )
+
+
+class OnnxBackend(EmbeddingBackend):
+    name = "onnx"
+
+    def __init__(self, model_dir: str, max_length: int = 128, threads: int = 0):
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise RuntimeError('Backend onnx cần onnxruntime: pip install -e ".[onnx]"') from e
+
+        model_path = os.path.join(model_dir, ONNX_MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise RuntimeError(
+                f"Không tìm thấy {model_path}, hãy chạy scripts/export_onnx_embedding.py trước"
+            )
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_length = max_length
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        outputs = []
+        texts = list(texts)
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            tokens = self.tokenizer(
+                texts[start:start + EMBEDDING_BATCH_SIZE],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            feeds = {k: v.astype(np.int64) for k, v in tokens.items() if k in self.input_names}
+            token_embeddings = self.session.run(None, feeds)[0]
+            outputs.append(mean_pooling(token_embeddings, tokens["attention_mask"]))
+        if not outputs:
+            return np.empty((0, 0), dtype=np.float32)
+        return l2_normalize(np.concatenate(outputs)).astype(np.float32)
+
+
+def engine_tag(engine: str = None) -> str:
+    """Engine + độ chính xác, vd. `onnx-int8`: hai engine cho vector lệch nhau chút ít."""
+    engine = engine or settings.EMBEDDING_ENGINE
+    if engine not in ENGINE_PRECISION:
+        raise ValueError(f"EMBEDDING_ENGINE không hợp lệ: {engine}")
+    return f"{engine}-{ENGINE_PRECISION[engine]}"
+
+
+def create_backend(engine: str = None) -> EmbeddingBackend:
+    engine = engine or settings.EMBEDDING_ENGINE
+    if engine == "onnx":
+        return OnnxBackend(settings.EMBEDDING_ONNX_DIR, threads=settings.EMBEDDING_ONNX_THREADS)
+    if engine == "torch":
+        return TorchBackend(settings.EMBEDDING_MODEL_NAME)
+    raise ValueError(f"EMBEDDING_ENGINE không hợp lệ: {engine}")
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Bộ gom micro-batch đặt trước model embedding.
+
+Nhiều luồng (nhiều request upload chạy song song) gửi danh sách văn bản nhỏ;
+một luồng duy nhất gom chúng trong tối đa `max_wait_ms` hoặc tới `max_batch`
+văn bản, chạy model một lần rồi trả kết quả riêng cho từng người gọi qua Future.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+
+class MicroBatcher:
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        max_batch: int = 64,
+        max_wait_ms: float = 10.0,
+        max_queue: int = 1024,
+    ):
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        # Hàng đợi có giới hạn: đầy thì người gọi bị chặn (backpressure)
+        self._queue: "queue.Queue[Tuple[List[str], Future, float]]" = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "texts": 0,
+            "batches": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+            "max_queue_depth": 0,
+            "total_wait_ms": 0.0,
+            "total_encode_ms": 0.0,
+        }
+        self._worker = threading.Thread(target=self._loop, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future: Future = Future()
+        self._queue.put((list(texts), future, time.monotonic()))
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], depth)
+        return future
+
+    def encode_sync(self, texts: List[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    def metrics(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches = stats["batches"] or 1
+        requests = stats["requests"] or 1
+        return {
+            "requests": stats["requests"],
+            "texts": stats["texts"],
+            "batches": stats["batches"],
+            "avg_batch_size": stats["texts"] / batches,
+            "last_batch_size": stats["last_batch_size"],
+            "max_batch_size": stats["max_batch_size"],
+            "avg_wait_ms": stats["total_wait_ms"] / requests,
+            "avg_encode_ms": stats["total_encode_ms"] / batches,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": stats["max_queue_depth"],
+            "config": {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "max_queue": self._queue.maxsize,
+            },
+        }
+
+    def _collect(self) -> List[Tuple[List[str], Future, float]]:
+        batch = [self._queue.get()]
+        total = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while total < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            total += len(item[0])
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            texts = [t for item, _, _ in batch for t in item]
+            try:
+                vectors = np.asarray(self.encode(texts), dtype=np.float32) if texts else None
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            encode_ms = (time.monotonic() - started) * 1000.0
+
+            start = 0
+            for item, future, _ in batch:
+                if vectors is None:
+                    future.set_result(np.empty((0, 0), dtype=np.float32))
+                else:
+                    future.set_result(vectors[start:start + len(item)])
+                start += len(item)
+
+            with self._stats_lock:
+                self._stats["batches"] += 1
+                self._stats["texts"] += len(texts)
+                self._stats["last_batch_size"] = len(texts)
+                self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(texts))
+                self._stats["total_wait_ms"] += sum((started - queued) * 1000.0 for _, _, queued in batch)
+                self._stats["total_encode_ms"] += encode_ms
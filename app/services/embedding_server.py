@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Tiến trình embedding dùng chung cho mọi worker uvicorn.
+
+Một tiến trình giữ model, nhận yêu cầu qua Unix socket. Yêu cầu từ nhiều
+worker được gom thành micro-batch: chờ tối đa `max_wait_ms` hoặc đủ
+`max_batch` văn bản, chạy model một lần rồi trả phần kết quả cho từng yêu cầu.
+"""
+import json
+import os
+import socketserver
+from typing import Callable, List
+
+import numpy as np
+
+from app.services.embedding_batcher import MicroBatcher
+from app.services.embedding_service import recv_frame, send_frame
+
+
+class EmbeddingServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        socket_path: str,
+        encode: Callable[[List[str]], np.ndarray],
+        max_batch: int = 64,
+        max_wait_ms: float = 10.0,
+        max_queue: int = 1024,
+    ):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+        self.batcher = MicroBatcher(encode, max_batch=max_batch, max_wait_ms=max_wait_ms, max_queue=max_queue)
+        super().__init__(socket_path, EmbeddingRequestHandler)
+
+
+class EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        try:
+            request = json.loads(recv_frame(self.request))
+            if request.get("stats"):
+                send_frame(self.request, json.dumps(self.server.batcher.metrics()).encode("utf-8"))
+                return
+            vectors = np.ascontiguousarray(self.server.batcher.encode_sync(request["texts"]), dtype="<f4")
+        except Exception as e:
+            send_frame(self.request, json.dumps({"error": str(e)}).encode("utf-8"))
+            return
+        header = {"shape": list(vectors.shape), "dtype": "<f4"}
+        send_frame(self.request, json.dumps(header).encode("utf-8"))
+        send_frame(self.request, vectors.tobytes())
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Điểm truy cập duy nhất tới model embedding.
+Model chạy bằng backend chọn qua EMBEDDING_ENGINE (torch | onnx), xem `embedding_backends`.
+
+EMBEDDING_BACKEND=local  : model nằm ngay trong tiến trình (tải lười ở lần gọi đầu).
+EMBEDDING_BACKEND=server : gửi yêu cầu tới tiến trình embedding dùng chung
+                           (`scripts/run_embedding_server.py`) qua Unix socket,
+                           worker API không phải giữ model trong RAM.
+"""
+import json
+import socket
+import struct
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+from app.core.config import settings
+
+_local_model = None
+_local_batcher = None
+_local_lock = threading.Lock()
+
+
+# ------------------- Giao thức socket -------------------
+# Mỗi khung = 4 byte độ dài (big-endian) + nội dung.
+# Yêu cầu : khung JSON {"texts": [...]} (hoặc {"stats": true} để lấy metrics batching)
+# Phản hồi: khung JSON {"shape": [n, dim], "dtype": "<f4"} + khung bytes của ma trận,
+#           hoặc một khung JSON {"error": "..."}.
+def send_frame(sock: socket.socket, payload: bytes):
+    sock.sendall(struct.pack(">I", len(payload)) + payload)
+
+
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError("Kết nối embedding server bị đóng giữa chừng")
+        received += n
+    return bytes(buf)
+
+
+def recv_frame(sock: socket.socket) -> bytes:
+    (size,) = struct.unpack(">I", recv_exact(sock, 4))
+    return recv_exact(sock, size)
+
+
+def load_local_model():
+    """Tải backend embedding một lần cho tiến trình hiện tại."""
+    global _local_model
+    if _local_model is None:
+        with _local_lock:
+            if _local_model is None:
+                from app.services.embedding_backends import create_backend
+
+                _local_model = create_backend()
+                print(f"✅ Embedding Model loaded ({_local_model.name}).")
+    return _local_model
+
+
+def encode_local(texts: List[str]) -> np.ndarray:
+    return load_local_model().encode(texts)
+
+
+def get_local_batcher():
+    """Bộ gom micro-batch dùng chung trong tiến trình, đặt trước model local."""
+    global _local_batcher
+    if _local_batcher is None:
+        with _local_lock:
+            if _local_batcher is None:
+                from app.services.embedding_batcher import MicroBatcher
+
+                _local_batcher = MicroBatcher(
+                    encode_local,
+                    max_batch=settings.EMBEDDING_MAX_BATCH,
+                    max_wait_ms=settings.EMBEDDING_MAX_WAIT_MS,
+                    max_queue=settings.EMBEDDING_MAX_QUEUE,
+                )
+    return _local_batcher
+
+
+class EmbeddingClient:
+
+    def __init__(self, socket_path: str, timeout: float = 120.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        with self._connect() as sock:
+            send_frame(sock, json.dumps({"texts": list(texts)}, ensure_ascii=False).encode("utf-8"))
+            header = json.loads(recv_frame(sock))
+            if "error" in header:
+                raise RuntimeError(f"Embedding server lỗi: {header['error']}")
+            data = recv_frame(sock)
+        return np.frombuffer(data, dtype=header["dtype"]).reshape(header["shape"])
+
+    def stats(self) -> Dict:
+        with self._connect() as sock:
+            send_frame(sock, b'{"stats": true}')
+            return json.loads(recv_frame(sock))
+
+
+class EmbeddingService:
+
+    @staticmethod
+    def encode(texts: List[str]) -> np.ndarray:
+        """Mã hoá danh sách văn bản, trả về ma trận float32 đã chuẩn hoá L2."""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        if settings.EMBEDDING_BACKEND == "server":
+            client = EmbeddingClient(settings.EMBEDDING_SOCKET_PATH, settings.EMBEDDING_TIMEOUT)
+            return client.encode(texts)
+        if settings.EMBEDDING_MICRO_BATCH:
+            return get_local_batcher().encode_sync(texts)
+        return encode_local(texts)
+
+    @staticmethod
+    def metrics() -> Dict:
+        """Metrics của bộ gom batch (kích thước batch, thời gian chờ, độ sâu hàng đợi)."""
+        if settings.EMBEDDING_BACKEND == "server":
+            client = EmbeddingClient(settings.EMBEDDING_SOCKET_PATH, settings.EMBEDDING_TIMEOUT)
+            return {"backend": "server", **client.stats()}
+        if not settings.EMBEDDING_MICRO_BATCH:
+            return {"backend": "local", "micro_batch": False}
+        return {"backend": "local", **get_local_batcher().metrics()}
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import hashlib
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.report import Report
+from app.models.report_embedding import ReportEmbedding
+from app.services.embedding_backends import engine_tag
+from app.services.plagiarism_service import MIN_CONTENT_LENGTH, PlagiarismService
+
+# float16 little-endian: 768 chiều ~ 1.5KB mỗi cửa sổ
+STORAGE_DTYPE = np.dtype("<f2")
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+
+def model_tag() -> str:
+    """
+    Model + engine/lượng tử hoá + cách cắt cửa sổ: đổi một trong số đó thì embedding cũ
+    không còn dùng được (vector torch fp32 và onnx int8 không trộn lẫn khi so sánh).
+    """
+    return (
+        f"{settings.EMBEDDING_MODEL_NAME}:{engine_tag()}"
+        f"@{settings.PLAGIARISM_CHUNK_WORDS}/{settings.PLAGIARISM_CHUNK_STRIDE}"
+    )
+
+
+class EmbeddingStore:
+
+    @staticmethod
+    def to_bytes(vector: np.ndarray) -> bytes:
+        return np.ascontiguousarray(vector, dtype=STORAGE_DTYPE).tobytes()
+
+    @staticmethod
+    def from_bytes(buf: bytes, dim: int) -> np.ndarray:
+        """Đọc lại ma trận cửa sổ không sao chép (view chỉ-đọc trên bytes của DB)."""
+        return np.frombuffer(buf, dtype=STORAGE_DTYPE).reshape(-1, dim)
+
+    @staticmethod
+    def ensure(
+        db: Session,
+        reports: Sequence[Report],
+        encode: Callable[[List[str]], np.ndarray],
+        changed: Optional[Set[int]] = None,
+    ) -> Dict[int, np.ndarray]:
+        """
+        Đảm bảo mỗi báo cáo có embedding khớp với `raw_content` hiện tại.
+        Mỗi báo cáo được lưu dạng ma trận (số cửa sổ x dim), xem `chunk_text`.
+        Chỉ những báo cáo chưa có hoặc đã đổi nội dung (khác hash / khác model)
+        mới được mã hoá, mọi cửa sổ của chúng chung trong một lần gọi `encode`.
+        Trả về {report_id: ma trận cửa sổ} cho các báo cáo đủ dài để so sánh.
+        `changed` (nếu truyền) nhận id các báo cáo có embedding vừa được ghi mới hoặc xoá.
+        Không commit, người gọi chịu trách nhiệm commit.
+        """
+        tag = model_tag()
+        eligible = {
+            r.id: r for r in reports
+            if r.raw_content and len(r.raw_content) >= MIN_CONTENT_LENGTH
+        }
+        ineligible_ids = [r.id for r in reports if r.id not in eligible]
+        if ineligible_ids:
+            # Nội dung đã bị xoá/rút gọn: embedding cũ không còn đúng
+            stale = db.query(ReportEmbedding).filter(ReportEmbedding.report_id.in_(ineligible_ids))
+            if changed is not None:
+                changed.update(rid for (rid,) in stale.with_entities(ReportEmbedding.report_id))
+            stale.delete(synchronize_session=False)
+        if not eligible:
+            return {}
+
+        hashes = {rid: content_hash(r.raw_content) for rid, r in eligible.items()}
+        existing = {
+            e.report_id: e
+            for e in db.query(ReportEmbedding).filter(ReportEmbedding.report_id.in_(list(eligible)))
+        }
+
+        result: Dict[int, np.ndarray] = {}
+        stale_ids = []
+        for rid in eligible:
+            row = existing.get(rid)
+            if row is not None and row.content_hash == hashes[rid] and row.model_name == tag:
+                result[rid] = EmbeddingStore.from_bytes(row.vector, row.dim)
+            else:
+                stale_ids.append(rid)
+
+        if stale_ids:
+            chunk_sets = PlagiarismService.encode_chunks(
+                [eligible[rid].raw_content for rid in stale_ids], encode
+            )
+            for rid, chunks in zip(stale_ids, chunk_sets):
+                row = existing.get(rid) or ReportEmbedding(report_id=rid)
+                row.content_hash = hashes[rid]
+                row.model_name = tag
+                row.dim = int(chunks.shape[-1])
+                row.vector = EmbeddingStore.to_bytes(chunks)
+                db.add(row)
+                result[rid] = EmbeddingStore.from_bytes(row.vector, row.dim)
+            db.flush()
+            if changed is not None:
+                changed.update(stale_ids)
+        return result
+
+    @staticmethod
+    def load_chunks(db: Session, report_ids: Iterable[int]) -> Dict[int, np.ndarray]:
+        """
+        Đọc ma trận cửa sổ đã lưu của nhiều báo cáo (view float16 trên bytes của DB),
+        không cần chạy lại encoder. Báo cáo chưa có embedding hợp lệ bị bỏ qua.
+        """
+        rows = (
+            db.query(ReportEmbedding.report_id, ReportEmbedding.dim, ReportEmbedding.vector)
+            .filter(
+                ReportEmbedding.report_id.in_(list(report_ids)),
+                ReportEmbedding.model_name == model_tag(),
+            )
+            .order_by(ReportEmbedding.report_id)
+            .all()
+        )
+        return {r.report_id: EmbeddingStore.from_bytes(r.vector, r.dim) for r in rows}
+
+    @staticmethod
+    def load_matrix(db: Session, report_ids: Iterable[int]) -> Tuple[List[int], np.ndarray]:
+        """
+        Đọc mọi cửa sổ của nhiều báo cáo thành một ma trận float16 (tổng số cửa sổ x dim),
+        kèm report_id của từng dòng. Bytes của các báo cáo được nối một lần rồi đọc
+        bằng `np.frombuffer`, không qua encoder.
+        """
+        rows = (
+            db.query(ReportEmbedding.report_id, ReportEmbedding.dim, ReportEmbedding.vector)
+            .filter(
+                ReportEmbedding.report_id.in_(list(report_ids)),
+                ReportEmbedding.model_name == model_tag(),
+            )
+            .order_by(ReportEmbedding.report_id)
+            .all()
+        )
+        if not rows:
+            return [], np.empty((0, 0), dtype=STORAGE_DTYPE)
+        dim = rows[0].dim
+        row_size = dim * STORAGE_DTYPE.itemsize
+        ids = [r.report_id for r in rows for _ in range(len(r.vector) // row_size)]
+        matrix = EmbeddingStore.from_bytes(b"".join(r.vector for r in rows), dim)
+        return ids, matrix
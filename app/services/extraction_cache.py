@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Cache kết quả trích xuất PDF, khoá theo SHA-256 của bytes PDF + phiên bản trích xuất
+(model, prompt và cách dựng đầu vào, xem `gemini_service.extraction_version`).
+
+Hai tầng: LRU trong bộ nhớ (giới hạn số mục) và bảng `extraction_cache` trong DB
+(dùng chung giữa các worker/máy). Upload lại cùng file (lô lỗi chạy lại, cùng báo cáo
+ở kỳ thi khác) không phải gọi Gemini/OCR lần nữa. Đổi prompt hay model thì tăng
+PROMPT_VERSION, đổi cấu hình đầu vào thì khoá tự đổi: mục cũ tự hết hiệu lực, dọn bằng
+`scripts/purge_extraction_cache.py`.
+"""
+import copy
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import SessionLocal
+from app.models.extraction_cache import ExtractionCacheEntry
+from app.services.upload_ingest import file_digest
+
+
+def pdf_digest(pdf_bytes: bytes) -> str:
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+class ExtractionCache:
+
+    def __init__(self, max_items: int = 512, session_factory: Callable[[], Session] = None):
+        self.max_items = max_items
+        self.session_factory = session_factory
+        self._items: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _remember(self, key: Tuple[str, str], data: dict):
+        with self._lock:
+            self._items[key] = data
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def get(self, digest: str, version: str) -> Optional[dict]:
+        key = (digest, version)
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return copy.deepcopy(data)
+
+        if self.session_factory is not None:
+            try:
+                db = self.session_factory()
+                try:
+                    row = db.query(ExtractionCacheEntry.data).filter(
+                        ExtractionCacheEntry.pdf_sha256 == digest,
+                        ExtractionCacheEntry.prompt_version == version,
+                    ).first()
+                finally:
+                    db.close()
+            except Exception as e:
+                # Lỗi tầng DB không được làm hỏng trích xuất: coi như miss
+                print(f"[ERROR] Đọc cache trích xuất thất bại: {e}")
+                self._count("errors")
+                row = None
+            if row is not None:
+                data = json.loads(row.data)
+                self._remember(key, data)
+                self._count("db_hits")
+                return copy.deepcopy(data)
+
+        self._count("misses")
+        return None
+
+    def put(self, digest: str, version: str, data: dict):
+        self._remember((digest, version), copy.deepcopy(data))
+        self._count("stores")
+        if self.session_factory is None:
+            return
+        try:
+            db = self.session_factory()
+            try:
+                db.add(ExtractionCacheEntry(
+                    pdf_sha256=digest,
+                    prompt_version=version,
+                    data=json.dumps(data, ensure_ascii=False),
+                ))
+                db.commit()
+            except IntegrityError:
+                # Worker khác vừa lưu cùng khoá
+                db.rollback()
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"[ERROR] Ghi cache trích xuất thất bại: {e}")
+            self._count("errors")
+
+    def get_or_extract(self, pdf_bytes: bytes, version: str, extract: Callable[[bytes], Tuple[dict, bool]]) -> dict:
+        """
+        Trả kết quả từ cache nếu có, ngược lại gọi `extract(pdf_bytes) -> (data, ok)`
+        và chỉ lưu khi ok (lỗi Gemini tạm thời không bị cache lại).
+        """
+        digest = pdf_digest(pdf_bytes)
+        data = self.get(digest, version)
+        if data is not None:
+            return data
+        data, ok = extract(pdf_bytes)
+        if ok:
+            self.put(digest, version, data)
+        return data
+
+    def get_or_extract_file(
+        self, path: str, version: str, extract: Callable[[bytes], Tuple[dict, bool]], digest: str = None
+    ) -> dict:
+        """
+        Như `get_or_extract` nhưng nhận đường dẫn file: `digest` tính sẵn lúc upload
+        (thiếu thì băm file theo khối), chỉ đọc file vào bộ nhớ khi cache không có.
+        """
+        digest = digest or file_digest(path)
+        data = self.get(digest, version)
+        if data is not None:
+            return data
+        with open(path, "rb") as f:
+            data, ok = extract(f.read())
+        if ok:
+            self.put(digest, version, data)
+        return data
+
+    def clear_memory(self):
+        with self._lock:
+            self._items.clear()
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            size = len(self._items)
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        return {
+            **stats,
+            "hit_rate": (stats["memory_hits"] + stats["db_hits"]) / lookups if lookups else 0.0,
+            "memory_items": size,
+            "max_items": self.max_items,
+        }
+
+    @staticmethod
+    def purge(db: Session, keep_version: str = None, older_than_days: int = None) -> int:
+        """
+        Xoá mục trong bảng cache: mọi mục (mặc định), hoặc chỉ mục khác phiên bản
+        `keep_version`, và/hoặc cũ hơn `older_than_days` ngày. Trả về số dòng đã xoá.
+        """
+        query = db.query(ExtractionCacheEntry)
+        if keep_version is not None:
+            query = query.filter(ExtractionCacheEntry.prompt_version != keep_version)
+        if older_than_days is not None:
+            query = query.filter(ExtractionCacheEntry.created_at < datetime.utcnow() - timedelta(days=older_than_days))
+        deleted = query.delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+
+_cache: Optional[ExtractionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """Cache dùng chung trong tiến trình (tầng DB dùng SessionLocal nếu EXTRACTION_CACHE_DB bật)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ExtractionCache(
+                    settings.EXTRACTION_CACHE_SIZE,
+                    SessionLocal if settings.EXTRACTION_CACHE_DB else None,
+                )
+    return _cache
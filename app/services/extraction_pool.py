@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Chạy các lời gọi trích xuất độc lập (mỗi file một round-trip tới Gemini) song song
+với số luồng giới hạn. Kết quả trả về theo đúng thứ tự đầu vào; lỗi của từng
+phần tử được trả về tại vị trí của nó thay vì làm hỏng cả lô.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, List, Optional, Sequence
+
+
+def map_ordered(
+    fn: Callable[[Any], Any],
+    items: Sequence[Any],
+    concurrency: int,
+    on_done: Optional[Callable[[int, Any], None]] = None,
+) -> List[Any]:
+    """
+    Gọi `fn(item)` cho từng phần tử với tối đa `concurrency` luồng.
+    Phần tử lỗi nhận về chính Exception đó. `on_done(index, result)` được gọi
+    ở luồng gọi hàm mỗi khi một phần tử xong (dùng để lưu kết quả từng phần tử, cập nhật tiến độ).
+    """
+    items = list(items)
+    results: List[Any] = [None] * len(items)
+    if not items:
+        return results
+
+    def finish(index: int, result: Any):
+        results[index] = result
+        if on_done is not None:
+            on_done(index, result)
+
+    if concurrency <= 1:
+        for index, item in enumerate(items):
+            try:
+                result = fn(item)
+            except Exception as e:
+                result = e
+            finish(index, result)
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(items)), thread_name_prefix="extract") as pool:
+        futures = {pool.submit(fn, item): index for index, item in enumerate(items)}
+        try:
+            for future in as_completed(futures):
+                error = future.exception()
+                finish(futures[future], error if error is not None else future.result())
+        except BaseException:
+            # `on_done` dừng cả lô (ví dụ worker mất lease): huỷ các phần tử chưa chạy
+            for future in futures:
+                future.cancel()
+            raise
+    return results
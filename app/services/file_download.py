@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Trả file báo cáo đã lưu cho client (trình xem PDF).
+
+File trong kho blob có ETag mạnh là SHA-256 nội dung: nội dung không bao giờ đổi nên
+cho cache lâu (`immutable`), và `If-None-Match` khớp thì trả 304 ngay, không chạm đĩa.
+File được gửi bằng FileResponse: hỗ trợ `Range`/`If-Range` (trình xem tải từng phần),
+đọc theo khối từ đĩa, hoặc gửi thẳng bằng đường dẫn nếu server ASGI hỗ trợ
+`http.response.pathsend` (zero-copy).
+"""
+from typing import Optional
+
+from fastapi import Response
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.services.blob_store import BlobStorage
+
+# Cache riêng (cần đăng nhập), một năm, không cần kiểm tra lại
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def strong_etag(digest: str) -> str:
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """So khớp header If-None-Match (có thể nhiều giá trị, `W/`, `*`) với ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match dùng so khớp yếu (RFC 9110 13.1.2)
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
+def blob_response(
+    storage: BlobStorage,
+    digest: Optional[str],
+    path_storage: str,
+    filename: str,
+    if_none_match: Optional[str] = None,
+) -> Response:
+    """
+    Response cho một file báo cáo. `digest` None là file cũ chưa chuyển vào kho:
+    gửi theo `path_storage`, không cache lâu.
+    """
+    if not digest:
+        return FileResponse(path_storage, media_type="application/pdf", filename=filename, content_disposition_type="inline")
+
+    etag = strong_etag(digest)
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    path = storage.local_path(digest)
+    if path is None:
+        # Backend không có file cục bộ: stream theo khối (không hỗ trợ Range)
+        source = storage.open(digest)
+        return StreamingResponse(
+            iter(lambda: source.read(STREAM_CHUNK_SIZE), b""),
+            media_type="application/pdf",
+            headers=headers,
+            background=BackgroundTask(source.close),
+        )
+    return FileResponse(
+        path,
+        media_type="application/pdf",
+        headers=headers,
+        filename=filename,
+        content_disposition_type="inline",
+    )
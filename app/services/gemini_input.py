@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Chuẩn bị phần nội dung gửi kèm prompt trích xuất cho Gemini.
+
+Thứ tự ưu tiên (nhẹ nhất trước):
+  1. Mọi trang đều có lớp chữ (TEXT_LAYER_FIRST)  -> chỉ gửi văn bản.
+  2. GEMINI_INPUT_MODE=pdf và file <= GEMINI_PDF_MAX_BYTES -> gửi nguyên PDF
+     trong một part `application/pdf`, không render/encode ảnh.
+  3. Ngược lại (mode=pages hoặc PDF quá lớn) -> văn bản các trang có lớp chữ
+     + ảnh render của các trang scan.
+"""
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.services.pdf_rasterizer import get_rasterizer
+from app.services.pdf_text import format_text_pages, is_text_page, read_text_layer
+
+PDF_MIME_TYPE = "application/pdf"
+INPUT_MODES = ("pdf", "pages")
+# Khoá phụ trong kết quả trích xuất: DPI đã dùng để render (None nếu không render ảnh)
+RENDER_DPI_KEY = "_render_dpi"
+
+
+class PreparedInput(NamedTuple):
+    text_pages: Dict[int, str]  # trang (đánh số từ 0) -> văn bản lớp chữ
+    images: Dict[int, bytes]    # trang -> ảnh đã render (chỉ các trang scan)
+    parts: List[Any]            # các part gửi kèm prompt
+    dpi: int                    # DPI dùng khi render `images`
+    path: Optional[str] = None  # file PDF đã lưu (blob): rasterizer chỉ gửi đường dẫn sang tiến trình con
+
+
+def prepare_input(
+    pdf_bytes: bytes,
+    mode: str = None,
+    text_first: bool = None,
+    max_pdf_bytes: int = None,
+    dpi: int = None,
+    path: str = None,
+) -> PreparedInput:
+    mode = mode or settings.GEMINI_INPUT_MODE
+    if mode not in INPUT_MODES:
+        raise ValueError(f"GEMINI_INPUT_MODE không hợp lệ: {mode}")
+    text_first = settings.TEXT_LAYER_FIRST if text_first is None else text_first
+    max_pdf_bytes = settings.GEMINI_PDF_MAX_BYTES if max_pdf_bytes is None else max_pdf_bytes
+
+    pages = read_text_layer(pdf_bytes) if text_first else []
+    text_pages = {i: text for i, text in enumerate(pages) if is_text_page(text)}
+    rasterizer = get_rasterizer()
+    dpi = dpi or rasterizer.dpi
+    if pages and len(text_pages) == len(pages):
+        return PreparedInput(text_pages, {}, [format_text_pages(text_pages)], dpi, path)
+
+    if mode == "pdf" and len(pdf_bytes) <= max_pdf_bytes:
+        # Gemini tự đọc cả lớp chữ lẫn hình của PDF: không gửi kèm văn bản trùng lặp
+        return PreparedInput(text_pages, {}, [{"mime_type": PDF_MIME_TYPE, "data": pdf_bytes}], dpi, path)
+
+    if pages:
+        scanned = [i for i in range(len(pages)) if i not in text_pages]
+        images = dict(zip(scanned, rasterizer.rasterize(path or pdf_bytes, pages=scanned, dpi=dpi)))
+        if not images:
+            # Render lỗi: vẫn gửi được phần văn bản nếu có
+            print(f"[ERROR] Không render được {len(scanned)} trang scan")
+    else:
+        # Không đọc được lớp chữ (hoặc tắt TEXT_LAYER_FIRST): render toàn bộ như cũ
+        images = dict(enumerate(rasterizer.rasterize(path or pdf_bytes, dpi=dpi)))
+
+    parts: List[Any] = [format_text_pages(text_pages)] if text_pages else []
+    parts += [{"mime_type": rasterizer.mime_type, "data": images[i]} for i in sorted(images)]
+    return PreparedInput(text_pages, images, parts, dpi, path)
+
+
+def first_page_image(pdf_bytes: bytes, prepared: PreparedInput):
+    """
+    Ảnh trang 1 cho OCR dự phòng ở DPI mặc định của rasterizer (PDF_RENDER_DPI);
+    render riêng nếu chưa có ở DPI đó (ví dụ khi gửi nguyên PDF hoặc đang ở DPI thấp).
+    """
+    rasterizer = get_rasterizer()
+    if 0 in prepared.images and prepared.dpi >= rasterizer.dpi:
+        return prepared.images[0]
+    rendered = rasterizer.rasterize(prepared.path or pdf_bytes, pages=[0])
+    return rendered[0] if rendered else None
+
+
+def extract_with_dpi_tiers(
+    pdf_bytes: bytes,
+    extract_once: Callable[[bytes, PreparedInput], Tuple[dict, bool]],
+    is_complete: Callable[[dict], bool],
+    tiers: Sequence[int] = None,
+    **options,
+) -> Tuple[dict, bool]:
+    """
+    Trang phải render ảnh thì thử DPI thấp trước, chỉ render lại ở mức cao hơn khi
+    `is_complete(data)` sai. DPI cuối cùng được ghi vào `data[RENDER_DPI_KEY]`
+    (None khi chỉ gửi văn bản hoặc nguyên PDF).
+    Chỉ có trang render khi mode=pages hoặc PDF vượt `max_pdf_bytes`; gửi nguyên PDF
+    hay chỉ văn bản thì `extract_once` chỉ được gọi một lần, bậc DPI không có tác dụng.
+    """
+    tiers = list(tiers or settings.PDF_RENDER_DPI_TIERS)
+    for tier, dpi in enumerate(tiers):
+        prepared = prepare_input(pdf_bytes, dpi=dpi, **options)
+        if not prepared.parts:
+            return {}, False
+        data, ok = extract_once(pdf_bytes, prepared)
+        # Không render ảnh thì tăng DPI cũng không thay đổi gì
+        if not prepared.images or is_complete(data) or tier == len(tiers) - 1:
+            break
+        print(f"[INFO] Kết quả trích xuất ở {dpi} DPI chưa hợp lệ, render lại ở {tiers[tier + 1]} DPI")
+    data[RENDER_DPI_KEY] = prepared.dpi if prepared.images else None
+    return data, ok
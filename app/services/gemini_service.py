@@ -1,21 +1,23 @@
 # -*- coding: utf-8 -*-
-import io
 import re
 import json
 import os
-from typing import List, Dict, Any
+from typing import List, Tuple
 
-from PIL import Image
-import pytesseract
-from pdf2image import convert_from_bytes
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+from app.core.config import settings
+
 # Thư viện cho Đạo văn
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 
+from app.services.embedding_service import EmbeddingService
+from app.services.gemini_input import PreparedInput, extract_with_dpi_tiers, first_page_image
+from app.services.extraction_cache import get_extraction_cache
+from app.services.mssv_ocr import RE_MSSV_STRICT, find_mssv, ocr_mssv
+from app.services.plagiarism_service import PLAGIARISM_THRESHOLD, MIN_CONTENT_LENGTH, PlagiarismService
+
 load_dotenv()
 
 # ------------------- Cấu hình Gemini -------------------
@@ -23,55 +25,93 @@ API_KEY = os.getenv("GEMINI_API_KEY")
 if not API_KEY:
     raise RuntimeError("Thiếu GEMINI_API_KEY trong file .env")
 
+GEMINI_MODEL_NAME = "models/gemini-2.5-flash"
+# Tăng khi đổi prompt/hậu xử lý để kết quả cũ trong cache trích xuất hết hiệu lực
+PROMPT_VERSION = "v2"
+
+
+def extraction_version() -> str:
+    """
+    Khoá phiên bản của cache trích xuất: model + prompt + cách dựng đầu vào gửi Gemini.
+    Cùng file nhưng gửi nguyên PDF hay văn bản lớp chữ/ảnh trang, render ở bậc DPI nào,
+    cho kết quả khác nhau, nên đổi GEMINI_INPUT_MODE, TEXT_LAYER_FIRST hoặc
+    PDF_RENDER_DPI_TIERS không dùng lại mục cũ.
+    """
+    text_layer = "text" if settings.TEXT_LAYER_FIRST else "render"
+    dpi_tiers = "-".join(str(dpi) for dpi in settings.PDF_RENDER_DPI_TIERS)
+    return f"{GEMINI_MODEL_NAME}:{PROMPT_VERSION}:{settings.GEMINI_INPUT_MODE}:{text_layer}:dpi{dpi_tiers}"
+
 genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel("models/gemini-2.5-flash")
+model = genai.GenerativeModel(GEMINI_MODEL_NAME)
 
-# Khởi tạo Global Embedding Model (chỉ 1 lần)
-try:
-    EMBEDDING_MODEL = SentenceTransformer('paraphrase-multilingual-mpnet-base-v2') 
-    print("✅ Embedding Model loaded.")
-except Exception as e:
-    print(f"❌ LỖI: Cannot load Embedding Model: {e}")
-    EMBEDDING_MODEL = None
+# Embedding Model được quản lý bởi EmbeddingService (tải lười, hoặc dùng tiến trình embedding chung)
 
-# Regex MSSV
-RE_MSSV_STRICT = re.compile(r"\bPH\d{5}\b", re.IGNORECASE)
-RE_MSSV_LOOSE = re.compile(r"\bPH\d{4,6}\b", re.IGNORECASE)
-PLAGIARISM_THRESHOLD = 0.80 # Ngưỡng tương đồng cosine
+# Trường phải có giá trị thì mới coi là trích xuất thành công (dùng cho tăng DPI)
+REQUIRED_KEYS = ["Họ và tên", "Nội dung báo cáo thô"]
 
 class GeminiService:
 
     @staticmethod
-    def _get_image_bytes(pdf_bytes: bytes) -> List[bytes]:
-        """Convert PDF bytes to a list of PNG image bytes."""
-        try:
-            # DPI cao hơn (ví dụ 300) tốt hơn cho scan/chữ viết tay mờ
-            pages = convert_from_bytes(pdf_bytes, dpi=300) 
-        except Exception as e:
-            print("[ERROR] Chuyển PDF sang ảnh thất bại:", e)
-            return []
+    def extract_info_from_pdf(pdf_bytes: bytes) -> dict:
+        """
+        Trích xuất thông tin PDF, dùng lại kết quả đã có nếu cùng file (SHA-256)
+        đã được trích xuất với cùng model, phiên bản prompt và cách dựng đầu vào.
+        """
+        if not settings.EXTRACTION_CACHE_ENABLED:
+            return GeminiService._extract_uncached(pdf_bytes)[0]
+        return get_extraction_cache().get_or_extract(
+            pdf_bytes, extraction_version(), GeminiService._extract_uncached
+        )
 
-        images_bytes = []
-        for page in pages:
-            buf = io.BytesIO()
-            page.save(buf, format="PNG")
-            images_bytes.append(buf.getvalue())
-        return images_bytes
+    @staticmethod
+    def extract_info_from_file(path: str, digest: str = None) -> dict:
+        """
+        Trích xuất từ file đã lưu khi upload; `digest` là SHA-256 tính lúc upload.
+        Trúng cache thì không cần đọc file.
+        """
+        if not settings.EXTRACTION_CACHE_ENABLED:
+            with open(path, "rb") as f:
+                return GeminiService._extract_uncached(f.read(), path)[0]
+        return get_extraction_cache().get_or_extract_file(
+            path,
+            extraction_version(),
+            lambda pdf_bytes: GeminiService._extract_uncached(pdf_bytes, path),
+            digest,
+        )
 
     @staticmethod
-    def extract_info_from_pdf(pdf_bytes: bytes) -> dict:
+    def _extract_uncached(pdf_bytes: bytes, path: str = None) -> Tuple[dict, bool]:
         """
         Gửi toàn bộ PDF lên Gemini để trích xuất thông tin cấu trúc 
         và nội dung thô (raw_content) cho kiểm tra đạo văn.
+        Trang có lớp chữ được gửi dạng văn bản; PDF có trang scan được gửi nguyên file
+        (hoặc render ảnh các trang scan nếu file quá lớn), xem `gemini_input`.
+
+        Trang phải render ảnh thì thử DPI thấp trước (PDF_RENDER_DPI_TIERS), chỉ render
+        lại ở DPI cao hơn khi kết quả không hợp lệ. DPI cuối cùng được ghi vào RENDER_DPI_KEY.
+        Chỉ render khi GEMINI_INPUT_MODE=pages hoặc PDF vượt GEMINI_PDF_MAX_BYTES; ở chế độ
+        pdf mặc định file được gửi nguyên nên bậc DPI không có tác dụng.
+        `path` (file đã lưu) cho phép tiến trình render đọc thẳng file thay vì nhận bytes.
         """
-        images_bytes = GeminiService._get_image_bytes(pdf_bytes)
-        if not images_bytes:
-             return {}
+        return extract_with_dpi_tiers(pdf_bytes, GeminiService._extract_once, GeminiService.is_complete, path=path)
+
+    @staticmethod
+    def is_complete(data: dict) -> bool:
+        """MSSV đúng định dạng, điểm số đọc được và các trường bắt buộc không rỗng."""
+        return (
+            bool(RE_MSSV_STRICT.fullmatch(data.get("MSSV") or ""))
+            and all(data.get(k) for k in ["Điểm thái độ", "Điểm công việc"])
+            and all((data.get(k) or "").strip() for k in REQUIRED_KEYS)
+        )
+
+    @staticmethod
+    def _extract_once(pdf_bytes: bytes, prepared: PreparedInput) -> Tuple[dict, bool]:
+        text_pages = prepared.text_pages
 
         # ------------------- PROMPT MỚI -------------------
         prompt = """
 Bạn là công cụ trích xuất dữ liệu từ phiếu "Báo cáo thực tập".
-Tôi gửi các trang PDF (đã convert sang ảnh) chứa thông tin.
+Tôi gửi phiếu PDF (nguyên file, hoặc văn bản trích từ lớp chữ và/hoặc ảnh các trang scan) chứa thông tin.
 Hãy trả về DUY NHẤT một JSON với các key sau (không giải thích). 
 Hãy trích xuất nội dung chi tiết của phần báo cáo công việc hàng tuần vào key "Nội dung báo cáo thô".
 
@@ -92,35 +132,37 @@ Hãy trích xuất nội dung chi tiết của phần báo cáo công việc hà
         # ---------------------------------------------------
 
         # Chuẩn bị contents
-        contents = [prompt]
-        for b in images_bytes:
-            contents.append({"mime_type": "image/png", "data": b})
+        contents = [prompt, *prepared.parts]
 
         # Gọi Gemini
+        ok = True
         try:
             resp = model.generate_content(contents)
             raw_text = resp.text.strip()
             # Xử lý trường hợp Gemini bao JSON bằng Markdown (```json ... ```)
             m = re.search(r"\{[\s\S]*\}", raw_text) 
             data = json.loads(m.group(0)) if m else {}
+            if m is None:
+                # Không có JSON (bị chặn, trả lời lạc đề...): không được cache như kết quả thật
+                print("[ERROR] Gemini không trả về JSON:", raw_text[:200])
+                ok = False
         except Exception as e:
             print("[ERROR] Lấy dữ liệu từ Gemini thất bại:", e)
             data = {}
+            ok = False
 
         # ------------------- Fallback OCR cho MSSV -------------------
         mssv = (data.get("MSSV") or "").strip()
-        if not RE_MSSV_STRICT.fullmatch(mssv) and images_bytes:
-            # Chỉ dùng ảnh trang 1 cho fallback MSSV
-            img = Image.open(io.BytesIO(images_bytes[0])).convert("RGB")
-            # Tăng DPI cho Pytesseract để cải thiện độ chính xác cho scan mờ
-            img = img.resize((img.width * 2, img.height * 2), Image.Resampling.LANCZOS)
-            
-            text = pytesseract.image_to_string(img, lang="vie+eng", config="--oem 3 --psm 6")
-            m = RE_MSSV_STRICT.search(text) or RE_MSSV_LOOSE.search(text)
-            if m:
-                data["MSSV"] = m.group(0).upper()
+        if not RE_MSSV_STRICT.fullmatch(mssv):
+            if 0 in text_pages:
+                # Trang 1 có lớp chữ: tìm MSSV ngay trong văn bản, không cần OCR
+                found = find_mssv(text_pages[0])
+            elif (first_page := first_page_image(pdf_bytes, prepared)) is not None:
+                # Chỉ dùng ảnh trang 1: OCR vùng thông tin sinh viên, không thấy mới OCR cả trang
+                found = ocr_mssv(first_page)
             else:
-                data["MSSV"] = ""
+                found = None
+            data["MSSV"] = found or ""
 
         # ------------------- Chuẩn hoá Điểm số -------------------
         for score_key in ["Điểm thái độ", "Điểm công việc"]:
@@ -140,23 +182,37 @@ Hãy trích xuất nội dung chi tiết của phần báo cáo công việc hà
             if k not in data:
                 data[k] = ""
 
-        return data
+        # Gemini không trích được trường nào (MSSV có thể chỉ đến từ OCR): coi như lỗi
+        # để cache không giữ vĩnh viễn một kết quả rỗng cho file này
+        if not any(str(data[k]).strip() for k in keys if k != "MSSV"):
+            ok = False
+
+        return data, ok
     
+    @staticmethod
+    def encode_texts(texts: List[str]) -> np.ndarray:
+        """
+        Mã hoá cả danh sách văn bản trong một lần gọi model (batch),
+        trả về ma trận embedding đã chuẩn hoá L2 (mỗi dòng một văn bản).
+        """
+        return EmbeddingService.encode(texts)
+
     @staticmethod
     def check_plagiarism_similarity(content_a: str, content_b: str) -> float:
         """
         Tính toán độ tương đồng ngữ nghĩa (Cosine Similarity) giữa hai đoạn văn bản.
+        Văn bản dài được cắt thành các cửa sổ chồng lấn nên phần cuối vẫn được so sánh.
+        Để so sánh cả một lô báo cáo, dùng `PlagiarismService.find_similar_pairs`.
         """
-        if EMBEDDING_MODEL is None or not content_a or not content_b or len(content_a) < 50 or len(content_b) < 50:
+        if not content_a or not content_b or len(content_a) < MIN_CONTENT_LENGTH or len(content_b) < MIN_CONTENT_LENGTH:
             return 0.0
         
         try:
-            # Mã hóa nội dung thành vector nhúng
-            embeddings = EMBEDDING_MODEL.encode([content_a, content_b])
-            
-            # Tính toán độ tương đồng Cosine
-            similarity = cosine_similarity([embeddings[0]], [embeddings[1]])[0][0]
-            return similarity
+            # Mã hóa mọi cửa sổ của cả hai văn bản trong một lần gọi model
+            chunks_a, chunks_b = PlagiarismService.encode_chunks(
+                [content_a, content_b], GeminiService.encode_texts
+            )
+            return PlagiarismService.pair_score(chunks_a, chunks_b)
         except Exception as e:
             print(f"[ERROR] Tính toán độ tương đồng thất bại: {e}")
             return 0.0
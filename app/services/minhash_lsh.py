@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Lọc sơ bộ đạo văn theo từ vựng: shingle âm tiết + MinHash + LSH banding.
+
+Độ phức tạp gần tuyến tính theo số báo cáo: mỗi báo cáo được băm một lần,
+các cặp ứng viên chỉ sinh ra từ những báo cáo trùng bucket ở ít nhất một band.
+"""
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+RE_NON_WORD = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    """Chuẩn hoá NFC, chữ thường, bỏ dấu câu, gộp khoảng trắng (giữ dấu tiếng Việt)."""
+    text = unicodedata.normalize("NFC", text or "").lower()
+    return RE_NON_WORD.sub(" ", text).strip()
+
+
+def shingles(text: str, k: int = 3) -> np.ndarray:
+    """Tập shingle k âm tiết liên tiếp, băm crc32 về uint64."""
+    tokens = normalize_text(text).split()
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    if len(tokens) < k:
+        grams = {" ".join(tokens)}
+    else:
+        grams = {" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+class MinHashLSH:
+
+    def __init__(self, num_perm: int = 128, bands: int = 64, shingle_size: int = 3, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm phải chia hết cho bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # h(x) = (a*x + b) mod p; a, b < 2^32 và x < 2^32 nên không tràn uint64
+        self._a = rng.integers(1, int(MAX_HASH), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(MAX_HASH), size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingles(text, self.shingle_size)
+        if len(hashes) == 0:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        values = (np.outer(hashes, self._a) + self._b) % MERSENNE_PRIME
+        return values.min(axis=0)
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        return np.stack([self.signature(t) for t in texts]) if texts else np.empty((0, self.num_perm), dtype=np.uint64)
+
+    @staticmethod
+    def jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        """Ước lượng Jaccard = tỉ lệ vị trí MinHash trùng nhau."""
+        return float(np.mean(sig_a == sig_b))
+
+    def candidate_pairs(self, signatures: np.ndarray) -> Dict[Tuple[int, int], float]:
+        """
+        Trả về {(i, j): jaccard ước lượng} cho các cặp (i < j) trùng bucket
+        ở ít nhất một band.
+        """
+        pairs: Set[Tuple[int, int]] = set()
+        for band in range(self.bands):
+            buckets: Dict[bytes, List[int]] = defaultdict(list)
+            block = signatures[:, band * self.rows:(band + 1) * self.rows]
+            for idx, row in enumerate(block):
+                buckets[row.tobytes()].append(idx)
+            for members in buckets.values():
+                if len(members) > 1:
+                    for x in range(len(members)):
+                        for y in range(x + 1, len(members)):
+                            pairs.add((members[x], members[y]))
+        return {
+            (i, j): self.jaccard(signatures[i], signatures[j])
+            for i, j in sorted(pairs)
+        }
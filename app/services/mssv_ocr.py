@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+OCR dự phòng cho MSSV khi Gemini trả về MSSV không hợp lệ.
+
+Thay vì phóng to cả trang 1 gấp đôi rồi OCR `vie+eng` toàn trang, chỉ cắt vùng
+thông tin sinh viên ở đầu trang (tìm theo mật độ mực của các dòng chữ), OCR vùng
+đó với whitelist "PH" + chữ số. Không tìm được MSSV mới OCR toàn trang như cũ.
+"""
+import io
+import re
+from typing import Callable, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from app.services.ocr_service import get_ocr_service
+
+RE_MSSV_STRICT = re.compile(r"\bPH\d{5}\b", re.IGNORECASE)
+RE_MSSV_LOOSE = re.compile(r"\bPH\d{4,6}\b", re.IGNORECASE)
+# Whitelist bỏ các ký tự khác nên "MSSV: PH12345" có thể dính liền, không dùng \b phía trước
+RE_MSSV_ROI = re.compile(r"PH\d{5}(?!\d)")
+
+ROI_CONFIG = "--oem 1 --psm 6 -c tessedit_char_whitelist=PH0123456789"
+FULL_PAGE_CONFIG = "--oem 3 --psm 6"
+# Vùng thông tin sinh viên nằm trong phần đầu trang 1
+HEADER_FRACTION = 0.4
+# Số dòng chữ đầu tiên (tiêu đề + họ tên, MSSV, ngành...) đưa vào vùng cắt
+HEADER_LINES = 8
+# Chiều rộng tối thiểu của vùng cắt trước khi OCR (ảnh nhỏ hơn thì phóng to)
+MIN_ROI_WIDTH = 1600
+
+ImageToString = Callable[..., str]
+
+
+def _default_image_to_string(image, lang: str, config: str) -> str:
+    return get_ocr_service().image_to_string(image, lang=lang, config=config)
+
+
+def identity_region(gray: np.ndarray, header_fraction: float = HEADER_FRACTION, max_lines: int = HEADER_LINES) -> Tuple[int, int, int, int]:
+    """
+    Hộp (left, top, right, bottom) bao các dòng chữ đầu tiên trong phần đầu trang.
+    Dòng chữ được tách theo hình chiếu mật độ mực theo hàng; không thấy dòng nào
+    thì trả về cả dải đầu trang.
+    """
+    height, width = gray.shape
+    band = gray[: max(1, int(height * header_fraction))]
+    ink = band < min(128, int(band.mean()) - 20)
+
+    rows = ink.mean(axis=1) > 0.002
+    lines = []
+    start = None
+    for y, has_ink in enumerate(rows):
+        if has_ink and start is None:
+            start = y
+        elif not has_ink and start is not None:
+            if y - start >= 3:
+                lines.append((start, y))
+            start = None
+        if len(lines) >= max_lines:
+            break
+    if start is not None and len(lines) < max_lines and len(rows) - start >= 3:
+        lines.append((start, len(rows)))
+    if not lines:
+        return 0, 0, width, band.shape[0]
+
+    top, bottom = lines[0][0], lines[-1][1]
+    cols = np.flatnonzero(ink[top:bottom].any(axis=0))
+    left, right = (int(cols[0]), int(cols[-1]) + 1) if cols.size else (0, width)
+    margin = max(4, (bottom - top) // 20)
+    return (
+        max(0, left - margin),
+        max(0, top - margin),
+        min(width, right + margin),
+        min(height, bottom + margin),
+    )
+
+
+def prepare_roi(image: Image.Image) -> Image.Image:
+    """Cắt vùng thông tin, chuyển xám + tăng tương phản, phóng to nếu quá nhỏ."""
+    gray = ImageOps.autocontrast(image.convert("L"))
+    roi = gray.crop(identity_region(np.asarray(gray)))
+    if roi.width < MIN_ROI_WIDTH:
+        scale = MIN_ROI_WIDTH / roi.width
+        roi = roi.resize((MIN_ROI_WIDTH, max(1, int(roi.height * scale))), Image.Resampling.LANCZOS)
+    return roi
+
+
+def find_mssv(text: str, roi: bool = False) -> Optional[str]:
+    m = RE_MSSV_ROI.search(text.upper()) if roi else (RE_MSSV_STRICT.search(text) or RE_MSSV_LOOSE.search(text))
+    return m.group(0).upper() if m else None
+
+
+def ocr_mssv(
+    image: Union[bytes, Image.Image],
+    image_to_string: ImageToString = None,
+) -> Optional[str]:
+    """Tìm MSSV trên ảnh trang 1: OCR vùng thông tin trước, không thấy mới OCR cả trang."""
+    image_to_string = image_to_string or _default_image_to_string
+    if isinstance(image, (bytes, bytearray)):
+        image = Image.open(io.BytesIO(image))
+    image = image.convert("RGB")
+
+    mssv = find_mssv(image_to_string(prepare_roi(image), lang="eng", config=ROI_CONFIG), roi=True)
+    if mssv:
+        return mssv
+
+    # Cách cũ: phóng to cả trang gấp đôi để cải thiện độ chính xác cho scan mờ
+    full = image.resize((image.width * 2, image.height * 2), Image.Resampling.LANCZOS)
+    return find_mssv(image_to_string(full, lang="vie+eng", config=FULL_PAGE_CONFIG))
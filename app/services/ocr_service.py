@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+OCR bằng Tesseract với handle giữ sẵn trong tiến trình.
+
+tesserocr  : pool `PyTessBaseAPI` đã khởi tạo dùng chung cho cả tiến trình, theo từng bộ
+             lang/oem/psm/biến, tối đa OCR_MAX_HANDLES handle mỗi bộ. Luồng OCR mượn
+             một handle rảnh rồi trả lại, nên pool luồng tạo mới cho mỗi job vẫn dùng lại
+             handle đã nạp traineddata và số handle không tăng theo số job. Ảnh NumPy được
+             đưa thẳng vào Tesseract qua `SetImageBytes`, không encode ra file tạm.
+             Cần cài thêm: pip install -e ".[ocr]"
+pytesseract: dự phòng khi không có tesserocr, mỗi lần gọi chạy một tiến trình `tesseract`.
+
+Chọn qua OCR_ENGINE (auto | tesserocr | pytesseract). Giao diện
+`image_to_string(image, lang, config)` giống pytesseract để thay thế trực tiếp.
+"""
+import shlex
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+
+OCR_ENGINES = ("auto", "tesserocr", "pytesseract")
+# Giá trị mặc định của tesseract CLI
+DEFAULT_OEM = 3
+DEFAULT_PSM = 3
+
+OcrImage = Union[Image.Image, np.ndarray]
+HandleKey = Tuple[str, int, int, Tuple[Tuple[str, str], ...]]
+
+
+def parse_config(config: str = "") -> Tuple[int, int, Dict[str, str]]:
+    """Tách chuỗi config kiểu tesseract CLI ("--oem 1 --psm 6 -c a=b") thành (oem, psm, biến)."""
+    oem, psm, variables = DEFAULT_OEM, DEFAULT_PSM, {}
+    tokens = shlex.split(config or "")
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        value = tokens[i + 1] if i + 1 < len(tokens) else ""
+        if token == "--oem":
+            oem, i = int(value), i + 2
+        elif token == "--psm":
+            psm, i = int(value), i + 2
+        elif token == "-c":
+            name, _, var = value.partition("=")
+            variables[name] = var
+            i += 2
+        else:
+            raise ValueError(f"Tuỳ chọn OCR không hỗ trợ: {token}")
+    return oem, psm, variables
+
+
+def _tesserocr_available() -> bool:
+    try:
+        import tesserocr  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class OcrService:
+
+    def __init__(self, engine: str = "auto", max_handles: int = 4):
+        if engine not in OCR_ENGINES:
+            raise ValueError(f"OCR_ENGINE không hợp lệ: {engine}")
+        if engine == "auto":
+            engine = "tesserocr" if _tesserocr_available() else "pytesseract"
+        elif engine == "tesserocr" and not _tesserocr_available():
+            raise RuntimeError('OCR_ENGINE=tesserocr cần tesserocr: pip install -e ".[ocr]"')
+        self.engine = engine
+        self.max_handles = max(1, max_handles)
+        # Mỗi bộ tham số: handle đang rảnh + tổng số handle đã tạo
+        self._idle: Dict[HandleKey, List] = {}
+        self._created: Dict[HandleKey, int] = {}
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._stats = {"calls": 0, "total_ms": 0.0, "handles": 0, "init_ms": 0.0}
+
+    def image_to_string(self, image: OcrImage, lang: str = "eng", config: str = "") -> str:
+        """OCR ảnh PIL hoặc mảng NumPy (H x W xám, H x W x 3 RGB, uint8)."""
+        started = time.perf_counter()
+        if self.engine == "tesserocr":
+            text = self._tesserocr_to_string(image, lang, config)
+        else:
+            import pytesseract
+
+            text = pytesseract.image_to_string(image, lang=lang, config=config)
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["total_ms"] += (time.perf_counter() - started) * 1000.0
+        return text
+
+    def _checkout(self, lang: str, config: str) -> Tuple[HandleKey, object]:
+        """Mượn một handle rảnh cho bộ tham số; tạo mới nếu chưa đủ `max_handles`, hết thì chờ."""
+        oem, psm, variables = parse_config(config)
+        key: HandleKey = (lang, oem, psm, tuple(sorted(variables.items())))
+        with self._available:
+            while True:
+                idle = self._idle.setdefault(key, [])
+                if idle:
+                    return key, idle.pop()
+                if self._created.get(key, 0) < self.max_handles:
+                    # Giữ chỗ trước, khởi tạo (chậm) ngoài khoá
+                    self._created[key] = self._created.get(key, 0) + 1
+                    break
+                self._available.wait()
+
+        from tesserocr import PyTessBaseAPI
+
+        started = time.perf_counter()
+        try:
+            api = PyTessBaseAPI(lang=lang, oem=oem, psm=psm)
+            for name, value in variables.items():
+                if not api.SetVariable(name, value):
+                    api.End()
+                    raise ValueError(f"Biến Tesseract không hợp lệ: {name}")
+        except BaseException:
+            with self._available:
+                self._created[key] -= 1
+                self._available.notify()
+            raise
+        with self._lock:
+            self._stats["handles"] += 1
+            self._stats["init_ms"] += (time.perf_counter() - started) * 1000.0
+        return key, api
+
+    def _checkin(self, key: HandleKey, api):
+        with self._available:
+            self._idle.setdefault(key, []).append(api)
+            self._available.notify()
+
+    def _tesserocr_to_string(self, image: OcrImage, lang: str, config: str) -> str:
+        key, api = self._checkout(lang, config)
+        try:
+            if isinstance(image, np.ndarray):
+                array = np.ascontiguousarray(image, dtype=np.uint8)
+                if array.ndim == 2:
+                    channels = 1
+                elif array.ndim == 3 and array.shape[2] in (1, 3, 4):
+                    channels = array.shape[2]
+                else:
+                    raise ValueError(f"Ảnh NumPy không hợp lệ: shape {array.shape}")
+                height, width = array.shape[:2]
+                api.SetImageBytes(array.tobytes(), width, height, channels, width * channels)
+            else:
+                api.SetImage(image)
+            return api.GetUTF8Text()
+        finally:
+            # Giải phóng ảnh + kết quả nhận dạng, giữ nguyên model đã nạp
+            api.Clear()
+            self._checkin(key, api)
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle_handles"] = sum(len(idle) for idle in self._idle.values())
+        calls = stats["calls"] or 1
+        return {**stats, "engine": self.engine, "avg_ms": stats["total_ms"] / calls}
+
+    def close(self):
+        """Giải phóng mọi handle trong pool. Chỉ gọi khi không còn luồng nào đang OCR."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+            self._created = {}
+        for handles in idle.values():
+            for api in handles:
+                api.End()
+
+
+_ocr_service: Optional[OcrService] = None
+_ocr_service_lock = threading.Lock()
+
+
+def get_ocr_service() -> OcrService:
+    """Dịch vụ OCR dùng chung trong tiến trình (pool handle Tesseract dùng chung giữa các luồng)."""
+    global _ocr_service
+    if _ocr_service is None:
+        with _ocr_service_lock:
+            if _ocr_service is None:
+                _ocr_service = OcrService(settings.OCR_ENGINE, settings.OCR_MAX_HANDLES)
+    return _ocr_service
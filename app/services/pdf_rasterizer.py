@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Chuyển PDF sang ảnh trang bằng một process pool dùng chung.
+
+Engine render chọn qua PDF_RENDER_ENGINE:
+  pymupdf : render ngay trong tiến trình con, mở tài liệu một lần cho mỗi đoạn trang (mặc định).
+  poppler : pdf2image, mỗi đoạn trang liên tiếp một lần gọi `pdftoppm`.
+
+Mỗi tác vụ là một đoạn trang liên tiếp của một file (file chia thành tối đa `processes`
+đoạn): tiến trình con chỉ nhận và phân tích tài liệu một lần cho cả đoạn, trong khi
+nhiều file / nhiều đoạn vẫn chạy song song trên mọi core. Nguồn có thể là đường dẫn
+file (blob) để chỉ gửi đường dẫn qua IPC. Kết quả trả về theo đúng thứ tự trang.
+Thời gian render từng trang được cộng dồn trong `metrics()`.
+"""
+import io
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from app.core.config import settings
+
+
+MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg"}
+JPEG_QUALITY = 90
+
+
+PdfSource = Union[bytes, str]  # nội dung PDF, hoặc đường dẫn file (blob) để không phải gửi bytes sang tiến trình con
+
+
+def _encode(image, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        image.save(buf, format=fmt, quality=JPEG_QUALITY)
+    else:
+        image.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def page_runs(page_indexes: Sequence[int], max_pages: int = None) -> List[List[int]]:
+    """Tách danh sách trang thành các đoạn trang liên tiếp, mỗi đoạn tối đa `max_pages` trang."""
+    runs: List[List[int]] = []
+    for page_index in page_indexes:
+        run = runs[-1] if runs else None
+        if run and run[-1] + 1 == page_index and (max_pages is None or len(run) < max_pages):
+            run.append(page_index)
+        else:
+            runs.append([page_index])
+    return runs
+
+
+def poppler_page_count(source: PdfSource) -> int:
+    from pdf2image import pdfinfo_from_bytes, pdfinfo_from_path
+
+    info = pdfinfo_from_path(source) if isinstance(source, str) else pdfinfo_from_bytes(source)
+    return int(info["Pages"])
+
+
+def poppler_render_pages(source: PdfSource, page_indexes: Sequence[int], dpi: int, fmt: str, colorspace: str = "rgb") -> List[bytes]:
+    """Mỗi đoạn trang liên tiếp chỉ gọi `pdftoppm` một lần."""
+    from pdf2image import convert_from_bytes, convert_from_path
+
+    convert = convert_from_path if isinstance(source, str) else convert_from_bytes
+    outputs = []
+    for run in page_runs(page_indexes):
+        pages = convert(
+            source, dpi=dpi, first_page=run[0] + 1, last_page=run[-1] + 1, grayscale=colorspace == "gray",
+        )
+        outputs += [_encode(page, fmt) for page in pages]
+    return outputs
+
+
+def _pymupdf_open(source: PdfSource):
+    import pymupdf
+
+    return pymupdf.open(source) if isinstance(source, str) else pymupdf.open(stream=source, filetype="pdf")
+
+
+def pymupdf_page_count(source: PdfSource) -> int:
+    with _pymupdf_open(source) as doc:
+        return doc.page_count
+
+
+def pymupdf_render_pages(source: PdfSource, page_indexes: Sequence[int], dpi: int, fmt: str, colorspace: str = "rgb") -> List[bytes]:
+    """Mở tài liệu một lần rồi render lần lượt các trang."""
+    import pymupdf
+
+    outputs = []
+    with _pymupdf_open(source) as doc:
+        for page_index in page_indexes:
+            pix = doc[page_index].get_pixmap(
+                dpi=dpi,
+                colorspace=pymupdf.csGRAY if colorspace == "gray" else pymupdf.csRGB,
+                alpha=False,
+            )
+            if fmt == "JPEG":
+                outputs.append(pix.tobytes(output="jpeg", jpg_quality=JPEG_QUALITY))
+            else:
+                outputs.append(pix.tobytes(output=fmt.lower()))
+    return outputs
+
+
+ENGINES = {
+    "pymupdf": (pymupdf_page_count, pymupdf_render_pages),
+    "poppler": (poppler_page_count, poppler_render_pages),
+}
+
+
+def _timed_render(
+    render_pages: Callable, source: PdfSource, page_indexes: List[int], dpi: int, fmt: str, colorspace: str
+) -> Tuple[List[bytes], float]:
+    """Chạy trong tiến trình con: render một đoạn trang, trả về (ảnh các trang, thời gian ms)."""
+    started = time.perf_counter()
+    data = render_pages(source, page_indexes, dpi, fmt, colorspace)
+    if len(data) != len(page_indexes):
+        raise RuntimeError(f"Render được {len(data)}/{len(page_indexes)} trang")
+    return data, (time.perf_counter() - started) * 1000.0
+
+
+class PdfRasterizer:
+
+    def __init__(
+        self,
+        processes: int = None,
+        dpi: int = 300,
+        fmt: str = "PNG",
+        colorspace: str = "rgb",
+        engine: str = "pymupdf",
+        page_count: Callable[[PdfSource], int] = None,
+        render_pages: Callable[[PdfSource, Sequence[int], int, str, str], List[bytes]] = None,
+    ):
+        if engine not in ENGINES:
+            raise ValueError(f"PDF_RENDER_ENGINE không hợp lệ: {engine}")
+        fmt = fmt.upper()
+        if fmt not in MIME_TYPES:
+            raise ValueError(f"PDF_RENDER_FORMAT không hợp lệ: {fmt}")
+        if colorspace not in ("rgb", "gray"):
+            raise ValueError(f"PDF_RENDER_COLORSPACE không hợp lệ: {colorspace}")
+        self.processes = processes or multiprocessing.cpu_count()
+        self.dpi = dpi
+        self.fmt = fmt
+        self.colorspace = colorspace
+        self.engine = engine
+        self.page_count = page_count or ENGINES[engine][0]
+        self.render_pages = render_pages or ENGINES[engine][1]
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats = {"files": 0, "pages": 0, "total_page_ms": 0.0, "max_page_ms": 0.0, "wall_ms": 0.0}
+
+    @property
+    def mime_type(self) -> str:
+        return MIME_TYPES[self.fmt]
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: tiến trình gọi có sẵn nhiều luồng (batcher, lease), fork không an toàn
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def _reset_pool(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def rasterize(self, pdf: PdfSource, pages: Optional[Sequence[int]] = None, dpi: int = None) -> List[bytes]:
+        """Trả về danh sách ảnh (bytes) theo thứ tự trang; `pages` giới hạn các trang cần render."""
+        return self.rasterize_many([pdf], None if pages is None else [pages], dpi=dpi)[0]
+
+    def rasterize_many(
+        self, pdfs: Sequence[PdfSource], pages: Optional[Sequence[Sequence[int]]] = None, dpi: int = None
+    ) -> List[List[bytes]]:
+        """
+        Render song song mọi trang (hoặc các trang chỉ định) của mọi file; file lỗi nhận về
+        danh sách rỗng. `dpi` ghi đè DPI mặc định cho lần gọi này.
+        """
+        started = time.perf_counter()
+        dpi = dpi or self.dpi
+        if pages is None:
+            pages = []
+            for pdf in pdfs:
+                try:
+                    pages.append(range(self.page_count(pdf)))
+                except Exception as e:
+                    print("[ERROR] Đọc số trang PDF thất bại:", e)
+                    pages.append([])
+
+        try:
+            results = self._render(pdfs, pages, dpi)
+        except BrokenProcessPool:
+            # Tiến trình con chết (OOM, segfault): tạo pool mới và thử lại một lần
+            self._reset_pool()
+            results = self._render(pdfs, pages, dpi)
+
+        # Thời gian mỗi trang = thời gian cả đoạn chia đều cho số trang của đoạn
+        chunks = [(len(data), ms) for rendered in results if rendered is not None for data, ms in rendered]
+        with self._lock:
+            self._stats["files"] += len(pdfs)
+            self._stats["pages"] += sum(n for n, _ in chunks)
+            self._stats["total_page_ms"] += sum(ms for _, ms in chunks)
+            self._stats["max_page_ms"] = max([self._stats["max_page_ms"], *(ms / n for n, ms in chunks if n)])
+            self._stats["wall_ms"] += (time.perf_counter() - started) * 1000.0
+        return [
+            [image for data, _ in rendered for image in data] if rendered is not None else []
+            for rendered in results
+        ]
+
+    def _render(
+        self, pdfs: Sequence[PdfSource], pages: Sequence[Sequence[int]], dpi: int
+    ) -> List[Optional[List[Tuple[List[bytes], float]]]]:
+        pool = self._get_pool()
+        futures = []
+        for pdf, page_indexes in zip(pdfs, pages):
+            page_indexes = list(page_indexes)
+            # Chia file thành tối đa `processes` đoạn: file lớn vẫn dùng mọi core,
+            # mỗi tiến trình con chỉ nhận và mở tài liệu một lần cho cả đoạn
+            max_pages = max(1, -(-len(page_indexes) // self.processes))
+            futures.append([
+                pool.submit(_timed_render, self.render_pages, pdf, run, dpi, self.fmt, self.colorspace)
+                for run in page_runs(page_indexes, max_pages)
+            ])
+        results = []
+        for rendered in futures:
+            try:
+                results.append([future.result() for future in rendered])
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                print("[ERROR] Chuyển PDF sang ảnh thất bại:", e)
+                results.append(None)
+        return results
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        pages = stats["pages"] or 1
+        return {
+            "files": stats["files"],
+            "pages": stats["pages"],
+            "avg_page_ms": stats["total_page_ms"] / pages,
+            "max_page_ms": stats["max_page_ms"],
+            "total_page_ms": stats["total_page_ms"],
+            "wall_ms": stats["wall_ms"],
+            "processes": self.processes,
+            "engine": self.engine,
+            "dpi": self.dpi,
+            "format": self.fmt,
+            "colorspace": self.colorspace,
+        }
+
+    def close(self):
+        self._reset_pool()
+
+
+_rasterizer: Optional[PdfRasterizer] = None
+_rasterizer_lock = threading.Lock()
+
+
+def get_rasterizer() -> PdfRasterizer:
+    """Process pool render PDF dùng chung trong tiến trình (tạo lười ở lần gọi đầu)."""
+    global _rasterizer
+    if _rasterizer is None:
+        with _rasterizer_lock:
+            if _rasterizer is None:
+                _rasterizer = PdfRasterizer(
+                    processes=settings.RASTER_PROCESSES,
+                    dpi=settings.PDF_RENDER_DPI,
+                    fmt=settings.PDF_RENDER_FORMAT,
+                    colorspace=settings.PDF_RENDER_COLORSPACE,
+                    engine=settings.PDF_RENDER_ENGINE,
+                )
+    return _rasterizer
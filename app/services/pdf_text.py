@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Đọc lớp chữ (text layer) có sẵn trong PDF xuất từ Word/Docs.
+
+Trang có đủ chữ đọc được thì gửi thẳng văn bản cho Gemini, chỉ các trang scan
+(không có hoặc lớp chữ hỏng) mới phải render ảnh và OCR.
+"""
+from typing import Dict, List
+
+from app.core.config import settings
+
+# Lớp chữ hỏng (font không có bảng mã Unicode) thường ra ký tự thay thế hoặc vùng Private Use
+MIN_ALNUM_RATIO = 0.5
+MAX_GARBLED_RATIO = 0.05
+
+
+def read_text_layer(pdf_bytes: bytes) -> List[str]:
+    """Văn bản của từng trang theo thứ tự; PDF không đọc được thì trả về danh sách rỗng."""
+    import pymupdf
+
+    try:
+        with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+            return [page.get_text("text", sort=True) for page in doc]
+    except Exception as e:
+        print("[ERROR] Đọc lớp chữ PDF thất bại:", e)
+        return []
+
+
+def is_text_page(text: str, min_chars: int = None) -> bool:
+    """Trang có đủ chữ đọc được để bỏ qua bước render ảnh hay không."""
+    min_chars = settings.TEXT_LAYER_MIN_CHARS if min_chars is None else min_chars
+    chars = [c for c in text if not c.isspace()]
+    if len(chars) < min_chars:
+        return False
+    alnum = sum(c.isalnum() for c in chars)
+    garbled = sum(c == "\ufffd" or "\ue000" <= c <= "\uf8ff" for c in chars)
+    return alnum / len(chars) >= MIN_ALNUM_RATIO and garbled / len(chars) <= MAX_GARBLED_RATIO
+
+
+def format_text_pages(pages: Dict[int, str]) -> str:
+    """Ghép văn bản các trang (đánh số từ 1) để gửi kèm prompt."""
+    return "\n\n".join(f"--- Trang {index + 1} ---\n{text.strip()}" for index, text in sorted(pages.items()))
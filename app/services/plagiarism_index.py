@@ -0,0 +1,438 @@
+# -*- coding: utf-8 -*-
+"""
+Chỉ mục IVF (inverted file) trên NumPy cho embedding của mọi báo cáo đã lưu.
+
+Vector được gom theo centroid gần nhất (k-means cầu). Khi tra cứu chỉ quét
+`nprobe` danh sách gần truy vấn nhất thay vì toàn bộ lịch sử. Chỉ mục được train lại
+(nlist ~ sqrt(N)) mỗi khi số vector tăng gấp RETRAIN_GROWTH lần so với lần train trước,
+nên phần bị quét giảm dần khi lịch sử lớn lên.
+
+Bố cục trên đĩa (thư mục `PLAGIARISM_INDEX_DIR`):
+    meta.json       dim, nlist, model_name (= embedding_store.model_tag()), generation, trained_rows
+    centroids.npy   (nlist x dim) float32, không có khi chỉ mục chưa train
+    ids.bin         int64, append-only
+    lists.bin       int32, append-only (danh sách IVF của từng dòng)
+    vectors.bin     float16 (dim mỗi dòng), append-only
+    removed.bin     int64, append-only (số thứ tự các dòng đã gỡ, bỏ đi khi train lại)
+Các tiến trình khác nhau cùng ghi được nhờ khoá `index.lock` (fcntl);
+mỗi tiến trình tự đọc thêm phần đuôi mới được ghi bởi tiến trình khác. Tiến trình API
+chỉ ghi thêm (`append_changes`), không nạp vector của chỉ mục vào bộ nhớ.
+
+Chỉ mục dựng với model_tag khác (đổi model, engine/lượng tử hoá, cách cắt cửa sổ) thì
+không được tra cứu hay ghi thêm cho tới khi chạy `scripts/rebuild_plagiarism_index.py`.
+"""
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.embedding_store import model_tag
+from app.services.plagiarism_service import normalize_rows
+
+VECTOR_DTYPE = np.dtype("<f2")
+ID_DTYPE = np.dtype("<i8")
+LIST_DTYPE = np.dtype("<i4")
+TRAIN_MIN_VECTORS = 1024 # Dưới ngưỡng này quét phẳng nhanh hơn IVF
+RETRAIN_GROWTH = 2 # Train lại khi số vector gấp đôi lần train trước
+DATA_FILES = ("meta.json", "centroids.npy", "ids.bin", "lists.bin", "vectors.bin", "removed.bin")
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """K-means cầu (cosine) đơn giản trên NumPy, trả về centroid đã chuẩn hoá."""
+    rng = np.random.default_rng(seed)
+    data = normalize_rows(vectors)
+    if len(data) > 50_000:
+        data = data[rng.choice(len(data), 50_000, replace=False)]
+    nlist = max(1, min(nlist, len(data)))
+    centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(data @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = data[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+            else:
+                # Centroid rỗng: gán lại một điểm ngẫu nhiên
+                centroids[c] = data[rng.integers(len(data))]
+        centroids = normalize_rows(centroids)
+    return centroids
+
+
+def assign_lists(vectors: np.ndarray, centroids: Optional[np.ndarray]) -> np.ndarray:
+    """Danh sách IVF (centroid gần nhất) của từng vector; chưa train thì mọi vector vào list 0."""
+    if centroids is None:
+        return np.zeros(len(vectors), dtype=LIST_DTYPE)
+    return np.argmax(vectors @ centroids.T, axis=1).astype(LIST_DTYPE)
+
+
+class PlagiarismIndex:
+
+    def __init__(self, path: str, nprobe: int = 8):
+        self.path = path
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+        self._reset()
+
+    # ------------------- Trạng thái trong bộ nhớ -------------------
+    def _reset(self):
+        self.meta: Dict = {}
+        self.centroids: Optional[np.ndarray] = None
+        # list IVF -> (report_id, vector, số thứ tự dòng trên đĩa)
+        self._lists: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._owners: set = set()
+        self._rows = 0
+        self._removed = 0
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file("index.lock"), "a+") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_meta(self) -> Dict:
+        try:
+            with open(self._file("meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _append_to_lists(self, ids: np.ndarray, lists: np.ndarray, vectors: np.ndarray):
+        rows = np.arange(self._rows, self._rows + len(ids), dtype=ID_DTYPE)
+        for list_id in np.unique(lists):
+            mask = lists == list_id
+            old = self._lists.get(int(list_id))
+            if old is None:
+                self._lists[int(list_id)] = (ids[mask], vectors[mask], rows[mask])
+            else:
+                self._lists[int(list_id)] = (
+                    np.concatenate([old[0], ids[mask]]),
+                    np.concatenate([old[1], vectors[mask]]),
+                    np.concatenate([old[2], rows[mask]]),
+                )
+        self._owners.update(int(i) for i in np.unique(ids))
+        self._rows += len(ids)
+
+    def _drop_rows(self, removed_rows: np.ndarray):
+        """Bỏ các dòng đã gỡ khỏi danh sách IVF trong bộ nhớ."""
+        for list_id, (ids, vectors, rows) in list(self._lists.items()):
+            keep = ~np.isin(rows, removed_rows)
+            if not keep.all():
+                self._lists[list_id] = (ids[keep], vectors[keep], rows[keep])
+        self._owners = {int(i) for v in self._lists.values() for i in np.unique(v[0])}
+
+    def _refresh(self):
+        """Đồng bộ với đĩa: tải lại toàn bộ nếu đã rebuild, hoặc chỉ đọc phần đuôi mới."""
+        meta = self._read_meta()
+        if not meta:
+            self._reset()
+            return
+        if meta.get("generation") != self.meta.get("generation"):
+            self._reset()
+            self.meta = meta
+            if os.path.exists(self._file("centroids.npy")):
+                self.centroids = np.load(self._file("centroids.npy"))
+
+        dim = meta["dim"]
+        if not os.path.exists(self._file("ids.bin")):
+            return
+        total = os.path.getsize(self._file("ids.bin")) // ID_DTYPE.itemsize
+        if total > self._rows:
+            start, count = self._rows, total - self._rows
+            ids = np.fromfile(self._file("ids.bin"), dtype=ID_DTYPE, count=count, offset=start * ID_DTYPE.itemsize)
+            lists = np.fromfile(self._file("lists.bin"), dtype=LIST_DTYPE, count=count, offset=start * LIST_DTYPE.itemsize)
+            vectors = np.fromfile(
+                self._file("vectors.bin"), dtype=VECTOR_DTYPE, count=count * dim,
+                offset=start * dim * VECTOR_DTYPE.itemsize,
+            ).reshape(count, dim)
+            self._append_to_lists(ids, lists, vectors)
+
+        # Dòng bị gỡ (bởi tiến trình này hoặc tiến trình khác) sau lần đọc trước
+        if os.path.exists(self._file("removed.bin")):
+            removed_total = os.path.getsize(self._file("removed.bin")) // ID_DTYPE.itemsize
+            if removed_total > self._removed:
+                removed_rows = np.fromfile(
+                    self._file("removed.bin"), dtype=ID_DTYPE, count=removed_total - self._removed,
+                    offset=self._removed * ID_DTYPE.itemsize,
+                )
+                self._drop_rows(removed_rows)
+                self._removed = removed_total
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return assign_lists(vectors, self.centroids)
+
+    @staticmethod
+    def _check_model(meta: Dict):
+        """Vector trong chỉ mục phải cùng không gian với embedding hiện tại."""
+        if meta and meta.get("model_name") != model_tag():
+            raise ValueError(
+                f"Chỉ mục dựng với embedding {meta.get('model_name')}, hiện tại là {model_tag()}: "
+                "cần chạy scripts/rebuild_plagiarism_index.py"
+            )
+
+    # ------------------- API -------------------
+    def __len__(self) -> int:
+        """Số vector còn hiệu lực (không tính dòng đã gỡ)."""
+        return sum(len(v[0]) for v in self._lists.values())
+
+    def __contains__(self, report_id: int) -> bool:
+        with self._lock, self._file_lock(exclusive=False):
+            self._refresh()
+            return int(report_id) in self._owners
+
+    def add(self, ids: Sequence[int], vectors: np.ndarray):
+        """
+        Thêm vector mới vào cuối chỉ mục (tăng dần, không cần rebuild). Báo cáo đã có
+        trong chỉ mục bị bỏ qua (job chạy lại không thêm trùng); muốn thay vector của
+        báo cáo đã có thì dùng `replace`.
+        """
+        self.replace((), ids, vectors)
+
+    def remove(self, report_ids: Iterable[int]) -> int:
+        """Gỡ mọi vector của các báo cáo (bị xoá hoặc đổi nội dung). Trả về số dòng đã gỡ."""
+        return self.replace(report_ids, (), None)
+
+    def replace(self, report_ids: Iterable[int], ids: Sequence[int], vectors: Optional[np.ndarray]) -> int:
+        """
+        Gỡ vector cũ của `report_ids` rồi thêm (`ids`, `vectors`) trong cùng một lần giữ khoá.
+        Trả về số dòng đã gỡ.
+        """
+        report_ids = np.fromiter((int(i) for i in report_ids), dtype=ID_DTYPE)
+        with self._lock, self._file_lock(exclusive=True):
+            self._refresh()
+            self._check_model(self.meta)
+            removed = self._remove_locked(report_ids) if len(report_ids) else 0
+            if len(ids):
+                self._add_locked(np.asarray(ids, dtype=ID_DTYPE), normalize_rows(vectors))
+            needs_training = self._needs_training()
+        if needs_training:
+            self.retrain(only_if_needed=True)
+        return removed
+
+    def append_changes(self, report_ids: Iterable[int], ids: Sequence[int], vectors: Optional[np.ndarray]) -> int:
+        """
+        Như `replace` nhưng không nạp chỉ mục vào bộ nhớ (dùng trong tiến trình API):
+        chỉ đọc meta, centroid, ids.bin và removed.bin để biết dòng cần gỡ và báo cáo đã có,
+        rồi ghi thêm vào cuối file. Không train lại; worker/CLI train ở lần ghi sau nếu cần.
+        Trả về số dòng đã gỡ.
+        """
+        report_ids = np.fromiter((int(i) for i in report_ids), dtype=ID_DTYPE)
+        ids = np.asarray(ids, dtype=ID_DTYPE)
+        with self._lock, self._file_lock(exclusive=True):
+            meta = self._read_meta()
+            self._check_model(meta)
+            row_ids = (
+                np.fromfile(self._file("ids.bin"), dtype=ID_DTYPE)
+                if meta and os.path.exists(self._file("ids.bin")) else np.empty(0, dtype=ID_DTYPE)
+            )
+            live = np.ones(len(row_ids), dtype=bool)
+            if meta and os.path.exists(self._file("removed.bin")):
+                live[np.fromfile(self._file("removed.bin"), dtype=ID_DTYPE)] = False
+
+            removed_rows = np.flatnonzero(live & np.isin(row_ids, report_ids)).astype(ID_DTYPE)
+            if len(removed_rows):
+                with open(self._file("removed.bin"), "ab") as f:
+                    f.write(removed_rows.tobytes())
+                live[removed_rows] = False
+
+            if len(ids):
+                vectors = normalize_rows(vectors)
+                fresh = ~np.isin(ids, row_ids[live])
+                ids, vectors = ids[fresh], vectors[fresh]
+            if len(ids):
+                if not meta:
+                    meta = self._new_meta(int(vectors.shape[1]))
+                    self._write_meta(meta)
+                elif meta["dim"] != vectors.shape[1]:
+                    raise ValueError(
+                        f"Số chiều embedding ({vectors.shape[1]}) khác chỉ mục ({meta['dim']}), cần rebuild"
+                    )
+                centroids = np.load(self._file("centroids.npy")) if os.path.exists(self._file("centroids.npy")) else None
+                self._append_files(ids, assign_lists(vectors, centroids), vectors.astype(VECTOR_DTYPE))
+        return len(removed_rows)
+
+    def _remove_locked(self, report_ids: np.ndarray) -> int:
+        removed_rows = [rows[np.isin(ids, report_ids)] for ids, _, rows in self._lists.values()]
+        removed_rows = np.concatenate(removed_rows) if removed_rows else np.empty(0, dtype=ID_DTYPE)
+        if len(removed_rows):
+            with open(self._file("removed.bin"), "ab") as f:
+                f.write(removed_rows.astype(ID_DTYPE).tobytes())
+            self._drop_rows(removed_rows)
+            self._removed += len(removed_rows)
+        return len(removed_rows)
+
+    def _add_locked(self, ids: np.ndarray, vectors: np.ndarray):
+        fresh = np.fromiter((int(i) not in self._owners for i in ids), dtype=bool, count=len(ids))
+        ids, vectors = ids[fresh], vectors[fresh]
+        if len(ids) == 0:
+            return
+        if self.meta and self.meta["dim"] != vectors.shape[1]:
+            raise ValueError(
+                f"Số chiều embedding ({vectors.shape[1]}) khác chỉ mục ({self.meta['dim']}), cần rebuild"
+            )
+        if not self.meta:
+            self.meta = self._new_meta(int(vectors.shape[1]))
+            self._write_meta(self.meta)
+        lists = self._assign(vectors)
+        stored = vectors.astype(VECTOR_DTYPE)
+        self._append_files(ids, lists, stored)
+        self._append_to_lists(ids, lists, stored)
+
+    @staticmethod
+    def _new_meta(dim: int) -> Dict:
+        return {"dim": dim, "nlist": 1, "model_name": model_tag(), "generation": 1, "trained_rows": 0}
+
+    def _append_files(self, ids: np.ndarray, lists: np.ndarray, stored: np.ndarray):
+        for name, arr in (("ids.bin", ids), ("lists.bin", lists), ("vectors.bin", stored)):
+            with open(self._file(name), "ab") as f:
+                f.write(arr.tobytes())
+
+    def _needs_training(self) -> bool:
+        size = len(self)
+        if self.centroids is None:
+            return size >= TRAIN_MIN_VECTORS
+        # Chỉ mục cũ chưa ghi trained_rows: ước lượng từ nlist ~ sqrt(N)
+        trained_rows = self.meta.get("trained_rows") or len(self.centroids) ** 2
+        return size >= trained_rows * RETRAIN_GROWTH
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 5,
+        exclude_ids: Iterable[int] = (),
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Trả về top-k (report_id, cosine) cho từng truy vấn.
+        Chỉ quét `nprobe` danh sách IVF gần truy vấn nhất.
+        """
+        queries = normalize_rows(np.atleast_2d(queries))
+        with self._lock, self._file_lock(exclusive=False):
+            self._refresh()
+            self._check_model(self.meta)
+            # Danh sách rỗng (mọi dòng đã bị gỡ) không cần quét
+            inverted_lists = {list_id: v for list_id, v in self._lists.items() if len(v[0])}
+            centroids = self.centroids
+        if not inverted_lists:
+            return [[] for _ in range(len(queries))]
+
+        exclude = np.fromiter(exclude_ids, dtype=ID_DTYPE)
+        if centroids is None:
+            probes = np.zeros((len(queries), 1), dtype=np.int64)
+        else:
+            nprobe = min(self.nprobe, len(centroids))
+            centroid_scores = queries @ centroids.T
+            probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+
+        results = []
+        for query, probe in zip(queries, probes):
+            candidates = [inverted_lists[int(p)] for p in probe if int(p) in inverted_lists]
+            if not candidates:
+                results.append([])
+                continue
+            cand_ids = np.concatenate([c[0] for c in candidates])
+            cand_vecs = np.concatenate([c[1] for c in candidates])
+            scores = cand_vecs.astype(np.float32) @ query
+            if len(exclude):
+                scores[np.isin(cand_ids, exclude)] = -np.inf
+            top = min(k, len(scores))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            results.append([
+                (int(cand_ids[i]), float(scores[i])) for i in best if np.isfinite(scores[i])
+            ])
+        return results
+
+    def rebuild(self, ids: Sequence[int], vectors: np.ndarray, nlist: Optional[int] = None):
+        """Dựng lại toàn bộ chỉ mục từ đầu (dùng cho lệnh CLI rebuild)."""
+        if len(ids) == 0:
+            self.clear()
+            return
+        vectors = normalize_rows(vectors)
+        ids = np.asarray(ids, dtype=ID_DTYPE)
+        centroids = None
+        if len(ids) >= TRAIN_MIN_VECTORS or nlist:
+            centroids = train_centroids(vectors, nlist or int(np.sqrt(len(ids))))
+        with self._lock, self._file_lock(exclusive=True):
+            self._write_all(ids, vectors, centroids)
+
+    def clear(self):
+        """Xoá toàn bộ dữ liệu chỉ mục trên đĩa."""
+        with self._lock, self._file_lock(exclusive=True):
+            for name in DATA_FILES:
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+            self._reset()
+
+    def retrain(self, only_if_needed: bool = False):
+        """
+        Train centroid trên dữ liệu hiện có (nlist ~ sqrt(N)) và ghi lại các danh sách IVF,
+        bỏ luôn các dòng đã gỡ. `only_if_needed`: bỏ qua nếu tiến trình khác vừa train xong.
+        """
+        with self._lock, self._file_lock(exclusive=True):
+            self._refresh()
+            if not self._lists or (only_if_needed and not self._needs_training()):
+                return
+            ids = np.concatenate([v[0] for v in self._lists.values()])
+            vectors = np.concatenate([v[1] for v in self._lists.values()]).astype(np.float32)
+            centroids = train_centroids(vectors, int(np.sqrt(len(ids))))
+            self._write_all(ids, vectors, centroids)
+
+    # ------------------- Ghi đĩa -------------------
+    def _write_meta(self, meta: Dict):
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._file("meta.json"))
+
+    def _write_all(self, ids: np.ndarray, vectors: np.ndarray, centroids: Optional[np.ndarray]):
+        """Ghi toàn bộ file rồi tăng generation để tiến trình khác tải lại. Gọi khi đang giữ khoá."""
+        os.makedirs(self.path, exist_ok=True)
+        self.centroids = centroids
+        lists = self._assign(vectors) if len(ids) else np.empty(0, dtype=LIST_DTYPE)
+        stored = vectors.astype(VECTOR_DTYPE)
+        for name, arr in (("ids.bin", ids), ("lists.bin", lists), ("vectors.bin", stored)):
+            tmp = self._file(name + ".tmp")
+            arr.tofile(tmp)
+            os.replace(tmp, self._file(name))
+        if centroids is not None:
+            np.save(self._file("centroids.npy"), centroids)
+        elif os.path.exists(self._file("centroids.npy")):
+            os.remove(self._file("centroids.npy"))
+        if os.path.exists(self._file("removed.bin")):
+            os.remove(self._file("removed.bin"))
+
+        previous = self._read_meta()
+        meta = {
+            "dim": int(vectors.shape[1]),
+            "nlist": 1 if centroids is None else int(len(centroids)),
+            "model_name": model_tag(),
+            "generation": previous.get("generation", 0) + 1,
+            "trained_rows": 0 if centroids is None else int(len(ids)),
+        }
+        self._write_meta(meta)
+        self._reset()
+        self.meta = meta
+        self.centroids = centroids
+        self._append_to_lists(ids, lists, stored)
+
+
+_index: Optional[PlagiarismIndex] = None
+
+
+def get_plagiarism_index() -> PlagiarismIndex:
+    """Chỉ mục dùng chung trong tiến trình (khởi tạo lười)."""
+    global _index
+    if _index is None:
+        _index = PlagiarismIndex(settings.PLAGIARISM_INDEX_DIR, nprobe=settings.PLAGIARISM_INDEX_NPROBE)
+    return _index
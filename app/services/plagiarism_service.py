@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.minhash_lsh import MinHashLSH
+
+PLAGIARISM_THRESHOLD = 0.80 # Ngưỡng tương đồng cosine
+MIN_CONTENT_LENGTH = 50 # Nội dung ngắn hơn ngưỡng này không được so sánh
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Chuẩn hoá L2 từng dòng, dòng toàn 0 được giữ nguyên."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def chunk_text(text: str, window: Optional[int] = None, stride: Optional[int] = None) -> List[str]:
+    """
+    Cắt văn bản thành các cửa sổ `window` từ, bước nhảy `stride` (chồng lấn nhau),
+    để phần cuối báo cáo không bị model cắt bỏ khi vượt độ dài tối đa.
+    """
+    window = window or settings.PLAGIARISM_CHUNK_WORDS
+    stride = stride or settings.PLAGIARISM_CHUNK_STRIDE
+    words = (text or "").split()
+    if len(words) <= window:
+        return [" ".join(words)] if words else []
+    starts = list(range(0, len(words) - window + 1, stride))
+    if starts[-1] + window < len(words):
+        starts.append(len(words) - window)
+    return [" ".join(words[i:i + window]) for i in starts]
+
+
+class PlagiarismService:
+
+    @staticmethod
+    def similarity_matrix(embeddings: np.ndarray) -> np.ndarray:
+        """Ma trận cosine giữa mọi cặp vector, tính bằng một phép nhân ma trận."""
+        normalized = normalize_rows(embeddings)
+        return normalized @ normalized.T
+
+    @staticmethod
+    def find_similar_pairs(
+        reports: Sequence[Dict],
+        encode: Optional[Callable[[List[str]], np.ndarray]] = None,
+        threshold: float = PLAGIARISM_THRESHOLD,
+        embeddings: Optional[Dict[int, np.ndarray]] = None,
+        prefilter: Optional[bool] = None,
+    ) -> List[Dict]:
+        """
+        So sánh mọi cặp báo cáo trong cùng một lô, theo hai giai đoạn:
+        1. Từ vựng (MinHash/LSH): cặp có Jaccard ước lượng >= `PLAGIARISM_LEXICAL_THRESHOLD`
+           bị gắn cờ ngay ("method": "lexical"), các cặp ứng viên còn lại đi tiếp.
+        2. Ngữ nghĩa: cosine giữa embedding theo cửa sổ ("method": "semantic"). Chỉ báo cáo
+           có mặt trong cặp ứng viên mới được mã hoá, mọi cửa sổ trong một lần gọi `encode`.
+        Tắt `prefilter` thì giai đoạn 2 chạy trên toàn bộ ma trận tương đồng.
+        `reports` là danh sách dict có các key: report_id, filename, content.
+        Nếu truyền `embeddings` ({report_id: ma trận cửa sổ}, ví dụ từ `EmbeddingStore`)
+        thì dùng trực tiếp, không gọi encoder.
+        """
+        eligible = [
+            r for r in reports
+            if r.get("content") and len(r["content"]) >= MIN_CONTENT_LENGTH
+        ]
+        if len(eligible) < 2:
+            return []
+        if prefilter is None:
+            prefilter = settings.PLAGIARISM_LEXICAL_PREFILTER
+
+        lexical: Dict[Tuple[int, int], float] = {}
+        semantic_pairs = None # None = so sánh mọi cặp
+        if prefilter:
+            lsh = MinHashLSH(num_perm=settings.MINHASH_NUM_PERM, bands=settings.MINHASH_BANDS)
+            candidates = lsh.candidate_pairs(lsh.signatures([r["content"] for r in eligible]))
+            lexical = {
+                pair: jaccard for pair, jaccard in candidates.items()
+                if jaccard >= settings.PLAGIARISM_LEXICAL_THRESHOLD
+            }
+            semantic_pairs = [pair for pair in candidates if pair not in lexical]
+
+        semantic = PlagiarismService._semantic_scores(
+            eligible, semantic_pairs, encode, embeddings, threshold
+        )
+
+        flagged = [(pair, score, "lexical") for pair, score in lexical.items()]
+        flagged += [(pair, score, "semantic") for pair, score in semantic.items()]
+        flagged.sort(key=lambda item: item[0])
+
+        results = []
+        for (i, j), score, method in flagged:
+            report1 = eligible[i]
+            report2 = eligible[j]
+            results.append({
+                "file_1": report1["filename"],
+                "file_2": report2["filename"],
+                "score": f"{score:.4f}",
+                "id_1": report1["report_id"],
+                "id_2": report2["report_id"],
+                "method": method
+            })
+        return results
+
+    @staticmethod
+    def cluster_pairs(edges: Sequence[Tuple[int, int, float]]) -> List[Dict]:
+        """
+        Gom các cặp đạo văn (report_a, report_b, score) thành nhóm liên thông (union-find).
+        Mỗi nhóm gồm report_ids, số cặp, điểm cao nhất và trung bình giữa các cặp bên trong.
+        Cặp trùng lặp (phát hiện nhiều lần) chỉ tính một lần với điểm cao nhất.
+        """
+        parent: Dict[int, int] = {}
+
+        def find(x: int) -> int:
+            parent.setdefault(x, x)
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        best: Dict[Tuple[int, int], float] = {}
+        for a, b, score in edges:
+            key = (min(a, b), max(a, b))
+            best[key] = max(score, best.get(key, score))
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        groups: Dict[int, Dict] = {}
+        for (a, b), score in best.items():
+            group = groups.setdefault(find(a), {"report_ids": set(), "scores": []})
+            group["report_ids"].update((a, b))
+            group["scores"].append(score)
+
+        clusters = [
+            {
+                "report_ids": sorted(g["report_ids"]),
+                "size": len(g["report_ids"]),
+                "pair_count": len(g["scores"]),
+                "max_score": float(max(g["scores"])),
+                "mean_score": float(np.mean(g["scores"])),
+            }
+            for g in groups.values()
+        ]
+        clusters.sort(key=lambda c: (-c["size"], -c["max_score"], c["report_ids"][0]))
+        return clusters
+
+    @staticmethod
+    def encode_chunks(
+        contents: Sequence[str],
+        encode: Callable[[List[str]], np.ndarray],
+    ) -> List[np.ndarray]:
+        """
+        Cắt từng nội dung thành các cửa sổ chồng lấn rồi mã hoá mọi cửa sổ
+        của mọi báo cáo trong một lần gọi `encode`.
+        Trả về danh sách ma trận (số cửa sổ x dim), mỗi báo cáo một ma trận.
+        """
+        chunked = [chunk_text(c) for c in contents]
+        counts = [len(c) for c in chunked]
+        flat = [chunk for chunks in chunked for chunk in chunks]
+        if not flat:
+            return [np.empty((0, 0), dtype=np.float32) for _ in contents]
+        vectors = np.asarray(encode(flat))
+        return np.split(vectors, np.cumsum(counts)[:-1])
+
+    @staticmethod
+    def aggregate(block: np.ndarray) -> float:
+        """Gộp ma trận cosine giữa các cửa sổ của hai báo cáo thành một điểm."""
+        flat = np.ravel(block)
+        if settings.PLAGIARISM_CHUNK_AGGREGATE == "max":
+            return float(flat.max())
+        top = min(settings.PLAGIARISM_CHUNK_TOP_K, flat.size)
+        return float(np.partition(flat, flat.size - top)[-top:].mean())
+
+    @staticmethod
+    def pair_score(chunks_a: np.ndarray, chunks_b: np.ndarray) -> float:
+        return PlagiarismService.aggregate(normalize_rows(chunks_a) @ normalize_rows(chunks_b).T)
+
+    @staticmethod
+    def _semantic_scores(
+        eligible: Sequence[Dict],
+        pairs: Optional[List[Tuple[int, int]]],
+        encode: Optional[Callable[[List[str]], np.ndarray]],
+        embeddings: Optional[Dict[int, np.ndarray]],
+        threshold: float,
+    ) -> Dict[Tuple[int, int], float]:
+        """
+        Điểm ngữ nghĩa cho các cặp (chỉ số trong `eligible`), chỉ giữ cặp vượt ngưỡng.
+        Mỗi báo cáo là một ma trận embedding theo cửa sổ; điểm cặp là max-sim hoặc
+        trung bình top-k của ma trận cosine giữa các cửa sổ.
+        """
+        if pairs is None:
+            needed = list(range(len(eligible)))
+        else:
+            needed = sorted({idx for pair in pairs for idx in pair})
+        if embeddings is not None:
+            needed = [idx for idx in needed if eligible[idx]["report_id"] in embeddings]
+        if len(needed) < 2:
+            return {}
+
+        if embeddings is not None:
+            chunk_sets = [np.atleast_2d(embeddings[eligible[idx]["report_id"]]) for idx in needed]
+        else:
+            try:
+                chunk_sets = PlagiarismService.encode_chunks(
+                    [eligible[idx]["content"] for idx in needed], encode
+                )
+            except Exception as e:
+                print(f"[ERROR] Mã hoá nội dung báo cáo thất bại: {e}")
+                return {}
+        chunk_sets = [normalize_rows(c) for c in chunk_sets]
+
+        scores: Dict[Tuple[int, int], float] = {}
+        if pairs is None:
+            # Mỗi báo cáo nhân một lần với toàn bộ cửa sổ của các báo cáo phía sau
+            counts = np.array([len(c) for c in chunk_sets])
+            offsets = np.concatenate([[0], np.cumsum(counts)])
+            chunks = np.concatenate(chunk_sets)
+            for a in range(len(needed) - 1):
+                sim = chunk_sets[a] @ chunks[offsets[a + 1]:].T
+                starts = offsets[a + 1:-1] - offsets[a + 1]
+                if settings.PLAGIARISM_CHUNK_AGGREGATE == "max":
+                    row_scores = np.maximum.reduceat(sim.max(axis=0), starts)
+                else:
+                    ends = np.append(starts[1:], sim.shape[1])
+                    row_scores = [PlagiarismService.aggregate(sim[:, s:e]) for s, e in zip(starts, ends)]
+                for offset, score in enumerate(row_scores):
+                    scores[(needed[a], needed[a + 1 + offset])] = float(score)
+        else:
+            position = {idx: pos for pos, idx in enumerate(needed)}
+            for i, j in pairs:
+                if i in position and j in position:
+                    block = chunk_sets[position[i]] @ chunk_sets[position[j]].T
+                    scores[(i, j)] = PlagiarismService.aggregate(block)
+
+        return {pair: score for pair, score in scores.items() if score >= threshold}
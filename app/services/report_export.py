@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Xuất báo cáo của kỳ thi ra Excel theo kiểu stream.
+
+Đọc theo lô bằng `yield_per` (PostgreSQL: server-side cursor), chỉ lấy các cột cần
+xuất (không nạp đối tượng ORM), ghi bằng openpyxl `write_only` (từng dòng xuống file
+tạm) vào SpooledTemporaryFile: file nhỏ nằm trong RAM, file lớn tự chuyển xuống đĩa.
+Bộ nhớ không tăng theo số báo cáo. Cột nội dung thô (rất lớn) chỉ xuất khi được yêu cầu.
+"""
+import enum
+import tempfile
+from typing import BinaryIO, Iterable, Iterator, List, Tuple
+
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.report import Report
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# Giới hạn ký tự của một ô Excel
+EXCEL_CELL_MAX_CHARS = 32767
+
+EXPORT_COLUMNS = [
+    ("ID", Report.id),
+    ("Họ và tên", Report.name),
+    ("MSSV", Report.student_code),
+    ("Ngành", Report.major),
+    ("Vị trí thực tập", Report.position),
+    ("Ưu điểm", Report.strengths),
+    ("Nhược điểm", Report.weaknesses),
+    ("Đề xuất", Report.proposal),
+    ("Điểm thái độ", Report.attitude_score),
+    ("Điểm công việc", Report.work_score),
+    ("Đánh giá cuối cùng", Report.note),
+    ("Trạng thái", Report.status),
+    ("Ngày tạo", Report.created_at),
+    ("Người tạo", Report.created_by),
+]
+RAW_CONTENT_COLUMN = ("Nội dung báo cáo thô", Report.raw_content)
+
+
+def export_columns(include_raw_content: bool = False) -> List[Tuple[str, object]]:
+    return EXPORT_COLUMNS + ([RAW_CONTENT_COLUMN] if include_raw_content else [])
+
+
+def iter_report_rows(db: Session, exam_id: int, include_raw_content: bool = False, batch_size: int = None) -> Iterator[tuple]:
+    """Các dòng (tuple cột) báo cáo của kỳ thi theo thứ tự id, đọc từng lô `batch_size`."""
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    columns = [column for _, column in export_columns(include_raw_content)]
+    query = db.query(*columns).filter(Report.exam_id == exam_id).order_by(Report.id)
+    yield from query.yield_per(batch_size)
+
+
+def _cell(value):
+    if isinstance(value, enum.Enum):
+        value = value.value
+    if isinstance(value, str):
+        # Ký tự điều khiển (hay gặp trong text OCR) làm openpyxl báo lỗi / Excel không mở được
+        return ILLEGAL_CHARACTERS_RE.sub("", value)[:EXCEL_CELL_MAX_CHARS]
+    if getattr(value, "tzinfo", None) is not None:
+        # Excel không lưu múi giờ
+        return value.replace(tzinfo=None)
+    return value
+
+
+def write_workbook(rows: Iterable[tuple], headers: List[str], out: BinaryIO, sheet_title: str = "Reports") -> int:
+    """Ghi các dòng vào file xlsx (write-only) tại `out`. Trả về số dòng dữ liệu."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_title)
+    ws.append(headers)
+    count = 0
+    for row in rows:
+        ws.append([_cell(v) for v in row])
+        count += 1
+    wb.save(out)
+    return count
+
+
+def build_export(db: Session, exam_id: int, include_raw_content: bool = False) -> Tuple[BinaryIO, int]:
+    """
+    Tạo file xlsx của kỳ thi trong SpooledTemporaryFile (đã seek về đầu).
+    Trả về (file, kích thước byte); người gọi đóng file sau khi gửi xong.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_BYTES)
+    try:
+        headers = [header for header, _ in export_columns(include_raw_content)]
+        write_workbook(iter_report_rows(db, exam_id, include_raw_content), headers, spool)
+        size = spool.tell()
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return spool, size
+
+
+def iter_file(source: BinaryIO, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    while chunk := source.read(chunk_size):
+        yield chunk
@@ -1,18 +1,33 @@
-import os, zipfile
+import os
 from datetime import datetime
-from fastapi.responses import FileResponse
-import openpyxl
+from typing import Callable
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+import numpy as np
+from loguru import logger
+from sqlalchemy import insert, or_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from fastapi import UploadFile
-from app.core.ai_reader import extract_report_info
 from app.models.report import Report
 from app.models.report_file import ReportFile
 from app.models.exam import Exam
+from app.models.plagiarism_match import PlagiarismMatch
+from app.models.upload_job import UploadJob, UploadJobFile, UploadJobFileStatus
+from app.models.report import ReportStatus as ReportStatusModel
 from app.schemas.base_schemas import CreateResponse, DeleteResponse, DetailResponse, ListResponse, UpdateResponse
 from app.schemas.report import ReportCreate, ReportUpdate, ReportStatus
-from app.services.gemini_service import GeminiService, PLAGIARISM_THRESHOLD
-
-UPLOAD_ROOT = "uploads/reports"
+from app.services.gemini_service import GeminiService
+from app.services.gemini_input import RENDER_DPI_KEY
+from app.services.plagiarism_service import PlagiarismService, PLAGIARISM_THRESHOLD
+from app.services.embedding_store import EmbeddingStore
+from app.services.extraction_pool import map_ordered
+from app.services.upload_job_service import LeaseLost
+from app.services.blob_store import BlobService, get_blob_storage
+from app.services.plagiarism_index import get_plagiarism_index
+from app.services.report_export import XLSX_MEDIA_TYPE, build_export, iter_file
+from app.services.file_download import blob_response, etag_matches, strong_etag
+from app.services.zip_stream import iter_zip_stored, unique_names
+from app.core.config import settings
 
 # Helper để raise lỗi chuẩn
 def raise_error(status: int, message: str):
@@ -66,6 +81,9 @@ class ReportService:
         db.add(new_report)
         db.commit()
         db.refresh(new_report)
+        changed = set()
+        embeddings = ReportService._store_embeddings(db, [new_report], changed)
+        ReportService._sync_index(changed, embeddings)
         return CreateResponse(
             message="Tạo báo cáo thành công",
             status=True,
@@ -81,6 +99,10 @@ class ReportService:
             setattr(report, key, value)
         db.commit()
         db.refresh(report)
+        # Nội dung không đổi thì embedding giữ nguyên: không ghi gì vào chỉ mục
+        changed = set()
+        embeddings = ReportService._store_embeddings(db, [report], changed)
+        ReportService._sync_index(changed, embeddings)
         return UpdateResponse(
             message="Cập nhật báo cáo thành công",
             status=True,
@@ -92,190 +114,422 @@ class ReportService:
         report = db.query(Report).filter(Report.id == report_id).first()
         if not report:
             raise_error(404, "Report không tồn tại")
+        for f in report.files:
+            if f.content_hash:
+                BlobService.release(db, f.content_hash)
         db.delete(report)
         db.commit()
+        ReportService._sync_index([report_id], {})
         return DeleteResponse(
             message="Xóa báo cáo thành công",
             status=True,
-            examId=report.id
+            objectId=report_id
         )
 
     @staticmethod
-    def upload_files(db: Session, exam_id: int, files: list[UploadFile], username: str):
+    def process_job(db: Session, job: UploadJob, lease_lost: Callable[[], bool] = None):
+        """
+        Worker xử lý một job upload: trích xuất thông tin từng file, lưu DB và
+        kiểm tra đạo văn (file ZIP của lô chỉ được tạo khi tải, xem `download_job_files`).
+        Kết quả từng file được lưu ngay khi file đó trích xuất xong, nên tiến độ theo file
+        hiện ngay trên API trạng thái và file đã xong ở lần chạy trước (job bị nhận lại
+        sau khi worker chết) không bị xử lý lại.
+
+        `lease_lost()` trả về True khi worker đã mất lease (job đã/sẽ được worker khác nhận):
+        dừng với LeaseLost trước khi ghi thêm bất cứ gì, các file chưa trích xuất bị huỷ.
+        """
+        def ensure_lease():
+            if lease_lost is not None and lease_lost():
+                raise LeaseLost(f"Worker đã mất lease của job #{job.id}")
+
+        pending_files = [f for f in job.files if f.status == UploadJobFileStatus.pending]
+
+        # Luồng trích xuất chỉ nhận (đường dẫn, SHA-256), không chạm vào đối tượng ORM của session
+        sources = [(f.path_storage, f.content_hash) for f in pending_files]
+
+        def read_and_extract(source) -> dict:
+            path, digest = source
+            return GeminiService.extract_info_from_file(path, digest)
+
+        def save_result(index, info):
+            # Chạy ở luồng gọi map_ordered: dùng session an toàn, mỗi file một transaction
+            ensure_lease()
+            if ReportService._save_extracted(db, job, pending_files[index], info):
+                job.processed_files = UploadJob.processed_files + 1
+                db.commit()
+
+        # 1. TRÍCH XUẤT SONG SONG (tối đa GEMINI_CONCURRENCY lời gọi cùng lúc)
+        job.processed_files = len(job.files) - len(pending_files)
+        db.commit()
+        map_ordered(read_and_extract, sources, settings.GEMINI_CONCURRENCY, on_done=save_result)
+        ensure_lease()
+
+        report_ids = [f.report_id for f in job.files if f.status == UploadJobFileStatus.done and f.report_id]
+        new_reports = db.query(Report).filter(Report.id.in_(report_ids)).order_by(Report.id).all()
+        names = {f.report_id: f.name_file for f in job.files}
+        reports_to_check = [
+            {
+                "report_id": report.id,
+                "filename": names[report.id],
+                "content": report.raw_content or ""
+            }
+            for report in new_reports
+        ]
+
+        # Lưu embedding của cả lô (mã hoá một lần), dùng lại cho mọi lần so sánh sau
+        embeddings = ReportService._store_embeddings(db, new_reports)
+
+        # 2. KIỂM TRA ĐẠO VĂN (So sánh giữa các file mới)
+        logger.info(f"Job #{job.id}: kiểm tra đạo văn {len(reports_to_check)} báo cáo mới")
+        plagiarism_detected = PlagiarismService.find_similar_pairs(
+            reports_to_check, embeddings=embeddings
+        )
+        # So với toàn bộ lịch sử (lô trước, kỳ thi khác) qua chỉ mục ANN
+        plagiarism_detected += ReportService._check_history(db, reports_to_check, embeddings)
+
+        # 3. LƯU KẾT QUẢ: một lệnh insert hàng loạt + một lệnh UPDATE trạng thái
+        ReportService._save_plagiarism_matches(db, job.exam_id, plagiarism_detected)
+
+        if plagiarism_detected:
+            logger.warning(f"Job #{job.id}: phát hiện {len(plagiarism_detected)} cặp file có dấu hiệu đạo văn")
+
+        return {
+            "message": "Upload, xử lý, và kiểm tra đạo văn thành công",
+            "download_url": f"/api/reports/download/jobs/{job.id}",
+            "plagiarism_results": plagiarism_detected
+        }
+
+    @staticmethod
+    def export_by_exam(db: Session, exam_id: int, include_raw_content: bool = False):
+        """Xuất báo cáo của kỳ thi ra Excel (stream, bộ nhớ không tăng theo số báo cáo)."""
         exam = db.query(Exam).filter(Exam.id == exam_id).first()
         if not exam:
             raise_error(404, "Kỳ thi không tồn tại")
+        spool, size = build_export(db, exam_id, include_raw_content)
+        return StreamingResponse(
+            iter_file(spool),
+            media_type=XLSX_MEDIA_TYPE,
+            headers={
+                "Content-Disposition": f'attachment; filename="report_{exam.code}.xlsx"',
+                "Content-Length": str(size),
+            },
+            background=BackgroundTask(spool.close),
+        )
 
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        folder_name = f"report_{exam.code}_{timestamp}"
-        folder_path = os.path.join(UPLOAD_ROOT, folder_name)
-        os.makedirs(folder_path, exist_ok=True)
-
-        reports_to_commit = []
-
-        for file in files:
-            # Lưu file PDF
-            file_path = os.path.join(folder_path, file.filename)
-            with open(file_path, "wb") as f:
-                f.write(file.file.read())
-
-            # Gọi GeminiService để trích xuất info
-            with open(file_path, "rb") as f:
-                pdf_bytes = f.read()
-            info = GeminiService.extract_info_from_pdf(pdf_bytes)
-
-            # Lưu Report vào DB
-            report = Report(
-                name=info.get("Họ và tên", file.filename),
-                student_code=info.get("MSSV", "UNKNOWN"),
-                major=info.get("Ngành"),
-                position=info.get("Vị trí thực tập"),
-                strengths=info.get("Ưu điểm"),
-                weaknesses=info.get("Nhược điểm"),
-                proposal=info.get("Đề xuất"),
-                attitude_score=info.get("Điểm thái độ"),
-                work_score=info.get("Điểm công việc"),
-                note=info.get("Đánh giá cuối cùng"),
-                status=ReportStatus.completed,
-                created_by=username,
-                exam_id=exam_id,
-                created_at=datetime.utcnow()
-            )
-            db.add(report)
-            db.flush()
+    @staticmethod
+    def download_file(db: Session, file_id: int, if_none_match: str = None):
+        """Tải một file báo cáo (PDF), hỗ trợ Range và 304 theo ETag là SHA-256 nội dung."""
+        row = (
+            db.query(ReportFile.name_file, ReportFile.content_hash, ReportFile.path_storage)
+            .filter(ReportFile.id == file_id)
+            .first()
+        )
+        if not row:
+            raise_error(404, "File báo cáo không tồn tại")
+        storage = get_blob_storage()
+        not_modified = row.content_hash and etag_matches(if_none_match, strong_etag(row.content_hash))
+        path = storage.local_path(row.content_hash) if row.content_hash else row.path_storage
+        # 304 không cần chạm đĩa; còn lại kiểm tra trước để trả 404 thay vì lỗi khi đang gửi
+        if not not_modified and path is not None and not os.path.isfile(path):
+            raise_error(404, "File báo cáo không còn trên kho lưu trữ")
+        return blob_response(storage, row.content_hash, row.path_storage, row.name_file, if_none_match)
 
-            db.add(ReportFile(
-                name_file=file.filename,
-                path_storage=file_path,
-                report_id=report.id
-            ))
+    @staticmethod
+    def download_exam_files(db: Session, exam_id: int):
+        """Tải mọi file báo cáo của kỳ thi dưới dạng ZIP, tạo theo kiểu stream khi tải."""
+        exam = db.query(Exam).filter(Exam.id == exam_id).first()
+        if not exam:
+            raise_error(404, "Kỳ thi không tồn tại")
+        rows = (
+            db.query(ReportFile.name_file, ReportFile.content_hash, ReportFile.path_storage)
+            .join(Report, Report.id == ReportFile.report_id)
+            .filter(Report.exam_id == exam_id)
+            .order_by(ReportFile.id)
+            .all()
+        )
+        return ReportService._zip_response(rows, f"report_{exam.code}.zip")
 
-            reports_to_commit.append(report)
+    @staticmethod
+    def download_job_files(db: Session, job_id: int):
+        """Tải các file của một lô upload dưới dạng ZIP, tạo theo kiểu stream khi tải."""
+        job = db.query(UploadJob).filter(UploadJob.id == job_id).first()
+        if not job:
+            raise_error(404, "Job upload không tồn tại")
+        rows = (
+            db.query(UploadJobFile.name_file, UploadJobFile.content_hash, UploadJobFile.path_storage)
+            .filter(UploadJobFile.job_id == job_id)
+            .order_by(UploadJobFile.id)
+            .all()
+        )
+        return ReportService._zip_response(rows, f"{os.path.basename(job.folder_path)}.zip")
 
-        db.commit()
+    @staticmethod
+    def _zip_response(rows, filename: str) -> StreamingResponse:
+        if not rows:
+            raise_error(404, "Không có file nào để tải")
+        storage = get_blob_storage()
+
+        def opener(content_hash, path_storage):
+            # File đã vào kho blob đọc theo hash, file cũ (chưa chuyển) đọc theo đường dẫn
+            if content_hash:
+                return lambda: storage.open(content_hash)
+            return lambda: open(path_storage, "rb")
+
+        # Chỉ giữ (tên, hash, đường dẫn) - session DB có thể đóng trước khi stream xong
+        names = unique_names([row.name_file for row in rows])
+        entries = [(name, opener(row.content_hash, row.path_storage)) for name, row in zip(names, rows)]
+        return StreamingResponse(
+            iter_zip_stored(entries),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
 
-        zip_name = f"{folder_name}.zip"
-        zip_path = os.path.join(UPLOAD_ROOT, zip_name)
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-            for root, _, files_in_folder in os.walk(folder_path):
-                for f in files_in_folder:
-                    path = os.path.join(root, f)
-                    zipf.write(path, os.path.relpath(path, folder_path))
+    @staticmethod
+    def _save_extracted(db: Session, job: UploadJob, job_file: UploadJobFile, info) -> bool:
+        """
+        Lưu Report + ReportFile của một file vừa trích xuất (hoặc lỗi của file đó). Không commit.
+        Chỉ ghi khi file còn pending trong DB: file đã được worker khác lưu (job bị nhận lại)
+        thì huỷ phần vừa ghi và trả về False, không tạo Report trùng.
+        """
+        report = None
+        if isinstance(info, Exception):
+            logger.error(f"Xử lý file {job_file.name_file} thất bại: {info}")
+            values = {"status": UploadJobFileStatus.failed, "error": str(info)}
+        else:
+            report = ReportService._build_report(info, job_file.name_file, job.exam_id, job.created_by)
+            db.add(report)
+            db.flush() # Lấy report.id
+            values = {"status": UploadJobFileStatus.done, "report_id": report.id, "error": None}
+
+        # Cập nhật có điều kiện: hai worker cùng lưu một file thì chỉ một bên thành công
+        claimed = db.query(UploadJobFile).filter(
+            UploadJobFile.id == job_file.id,
+            UploadJobFile.status == UploadJobFileStatus.pending,
+        ).update(values, synchronize_session=False)
+        if not claimed:
+            logger.info(f"File {job_file.name_file} đã được lưu bởi worker khác, bỏ qua")
+            db.rollback()
+            return False
+        if report is None:
+            return True
+
+        db.add(ReportFile(
+            name_file=job_file.name_file,
+            path_storage=job_file.path_storage,
+            content_hash=job_file.content_hash,
+            render_dpi=info.get(RENDER_DPI_KEY),
+            report_id=report.id
+        ))
+        if job_file.content_hash:
+            BlobService.retain(db, job_file.content_hash)
+        return True
 
-        return {"message": "Upload và xử lý thành công", "zip_file": zip_name}
+    @staticmethod
+    def _build_report(info: dict, filename: str, exam_id: int, username: str) -> Report:
+        return Report(
+            name=info.get("Họ và tên", filename),
+            student_code=info.get("MSSV", "UNKNOWN"),
+            major=info.get("Ngành"),
+            position=info.get("Vị trí thực tập"),
+            strengths=info.get("Ưu điểm"),
+            weaknesses=info.get("Nhược điểm"),
+            proposal=info.get("Đề xuất"),
+            attitude_score=float(info.get("Điểm thái độ", 0) or 0), # Chuẩn hoá float
+            work_score=float(info.get("Điểm công việc", 0) or 0),   # Chuẩn hoá float
+            note=info.get("Đánh giá cuối cùng"),
+            raw_content=info.get("Nội dung báo cáo thô", ""), # 👈 LƯU NỘI DUNG THÔ
+            status=ReportStatus.checked,
+            created_by=username,
+            exam_id=exam_id,
+            created_at=datetime.utcnow()
+        )
+
+    @staticmethod
+    def get_plagiarism_matches(db: Session, exam_id: int = None, report_id: int = None, page: int = 1, page_size: int = 20):
+        query = db.query(PlagiarismMatch)
+        if exam_id is not None:
+            query = query.filter(PlagiarismMatch.exam_id == exam_id)
+        if report_id is not None:
+            query = query.filter(or_(PlagiarismMatch.report_a_id == report_id, PlagiarismMatch.report_b_id == report_id))
+        total = query.count()
+        matches = (
+            query.order_by(PlagiarismMatch.created_at.desc(), PlagiarismMatch.id.desc())
+            .offset((page - 1) * page_size).limit(page_size).all()
+        )
+        return ListResponse(
+            data=matches,
+            total=total,
+            pageSize=page_size,
+            pageIndex=page
+        )
 
     @staticmethod
-    def upload_files(db: Session, exam_id: int, files: list[UploadFile], username: str):
+    def get_plagiarism_clusters(db: Session, exam_id: int, page: int = 1, page_size: int = 20):
         """
-        Tải lên file, trích xuất thông tin, lưu DB, kiểm tra đạo văn và nén file.
+        Nhóm các báo cáo đạo văn của một kỳ thi thành cụm (thay vì liệt kê từng cặp).
+
+        Cụm dựng từ các cặp ghi nhận khi kiểm tra kỳ thi này, gồm cả cặp khớp với báo cáo
+        trong lịch sử: thành viên có thể thuộc kỳ thi khác (xem `exam_id` của từng thành viên).
+        Ngược lại, cụm của kỳ thi cũ không nhận thêm báo cáo mới chép từ nó.
         """
         exam = db.query(Exam).filter(Exam.id == exam_id).first()
         if not exam:
-            # Thay thế bằng hàm raise_error thực tế của bạn
-            # raise_error(404, "Kỳ thi không tồn tại") 
-            raise ValueError("Kỳ thi không tồn tại") 
-
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        folder_name = f"report_{exam.code}_{timestamp}"
-        folder_path = os.path.join(UPLOAD_ROOT, folder_name)
-        os.makedirs(folder_path, exist_ok=True)
-
-        reports_to_check = [] # Dùng để lưu các báo cáo mới cần kiểm tra đạo văn
-
-        for file in files:
-            # Lưu file PDF
-            file_path = os.path.join(folder_path, file.filename)
-            # Đọc nội dung file trước khi đóng và lưu
-            file_content = file.file.read() 
-            
-            with open(file_path, "wb") as f:
-                f.write(file_content)
-
-            # Gọi GeminiService để trích xuất info (dùng nội dung file đã đọc)
-            info = GeminiService.extract_info_from_pdf(file_content) 
-
-            # 1. LƯU REPORT VÀ THU THẬP NỘI DUNG THÔ
-            report = Report(
-                name=info.get("Họ và tên", file.filename),
-                student_code=info.get("MSSV", "UNKNOWN"),
-                major=info.get("Ngành"),
-                position=info.get("Vị trí thực tập"),
-                strengths=info.get("Ưu điểm"),
-                weaknesses=info.get("Nhược điểm"),
-                proposal=info.get("Đề xuất"),
-                attitude_score=float(info.get("Điểm thái độ", 0) or 0), # Chuẩn hoá float
-                work_score=float(info.get("Điểm công việc", 0) or 0),   # Chuẩn hoá float
-                note=info.get("Đánh giá cuối cùng"),
-                raw_content=info.get("Nội dung báo cáo thô", ""), # 👈 LƯU NỘI DUNG THÔ
-                status=ReportStatus.checked,
-                created_by="test",
-                exam_id=exam_id,
-                created_at=datetime.utcnow()
-            )
-            db.add(report)
-            db.flush() # Lấy report.id
+            raise_error(404, "Kỳ thi không tồn tại")
+        edges = db.query(
+            PlagiarismMatch.report_a_id, PlagiarismMatch.report_b_id, PlagiarismMatch.score
+        ).filter(PlagiarismMatch.exam_id == exam_id).all()
+        clusters = PlagiarismService.cluster_pairs(edges)
+        page_clusters = clusters[(page - 1) * page_size:page * page_size]
+
+        member_ids = {rid for c in page_clusters for rid in c["report_ids"]}
+        members = {
+            r.id: {"id": r.id, "name": r.name, "student_code": r.student_code, "exam_id": r.exam_id}
+            for r in db.query(Report.id, Report.name, Report.student_code, Report.exam_id).filter(Report.id.in_(member_ids))
+        }
+        for cluster in page_clusters:
+            cluster["members"] = [members[rid] for rid in cluster["report_ids"] if rid in members]
 
-            db.add(ReportFile(
-                name_file=file.filename,
-                path_storage=file_path,
-                report_id=report.id
-            ))
+        return ListResponse(
+            data=page_clusters,
+            total=len(clusters),
+            pageSize=page_size,
+            pageIndex=page
+        )
 
-            # Thu thập thông tin để kiểm tra đạo văn sau khi commit
-            reports_to_check.append({
-                "report_id": report.id,
-                "filename": file.filename,
-                "content": info.get("Nội dung báo cáo thô", "")
-            })
+    @staticmethod
+    def _save_plagiarism_matches(db: Session, exam_id: int, pairs: list[dict]):
+        """
+        Ghi mọi cặp đạo văn của lô bằng một insert hàng loạt và đánh dấu báo cáo liên quan.
+        Cặp đã có của kỳ thi (job chạy lại sau khi đã lưu) được bỏ qua nhờ unique index
+        (exam_id, report_a_id, report_b_id), không bị ghi trùng.
+        """
+        if not pairs:
+            return
+        db.execute(ReportService._insert_ignoring_duplicates(db), [
+            {
+                "report_a_id": pair["id_1"],
+                "report_b_id": pair["id_2"],
+                "exam_id": exam_id,
+                "score": float(pair["score"]),
+                "method": pair.get("method", "semantic"),
+            }
+            for pair in pairs
+        ])
+        report_ids = {pair["id_1"] for pair in pairs} | {pair["id_2"] for pair in pairs}
+        db.query(Report).filter(Report.id.in_(report_ids)).update(
+            {"status": ReportStatusModel.plagiarized}, synchronize_session=False
+        )
+        db.commit()
 
-        db.commit() # Commit tất cả Report và ReportFile
+    @staticmethod
+    def _insert_ignoring_duplicates(db: Session):
+        dialect = {"postgresql": postgresql, "sqlite": sqlite}.get(db.get_bind().dialect.name)
+        if dialect is None:
+            return insert(PlagiarismMatch)
+        return dialect.insert(PlagiarismMatch).on_conflict_do_nothing(
+            index_elements=["exam_id", "report_a_id", "report_b_id"]
+        )
 
-        # 2. KIỂM TRA ĐẠO VĂN (So sánh giữa các file mới)
-        print("\n--- Bắt đầu Kiểm tra Đạo văn giữa các file mới ---")
-        plagiarism_detected = []
-        
-        for i in range(len(reports_to_check)):
-            for j in range(i + 1, len(reports_to_check)):
-                report1 = reports_to_check[i]
-                report2 = reports_to_check[j]
-                
-                score = GeminiService.check_plagiarism_similarity(report1["content"], report2["content"])
-                
-                if score >= PLAGIARISM_THRESHOLD:
-                    # 3. Ghi nhận kết quả đạo văn
-                    plagiarism_detected.append({
-                        "file_1": report1["filename"],
-                        "file_2": report2["filename"],
-                        "score": f"{score:.4f}",
-                        "id_1": report1["report_id"],
-                        "id_2": report2["report_id"]
-                    })
-                    
-                    # CẬP NHẬT TRẠNG THÁI REPORT (Nếu cần)
-                    # Ví dụ: đánh dấu cờ đạo văn trong DB hoặc thêm ghi chú vào Report
-                    db.query(Report).filter(Report.id.in_([report1["report_id"], report2["report_id"]])).update(
-                        {"note": Report.note + f" | ⚠️ Cảnh báo Đạo văn (Score: {score:.2f} vs {report2['filename']})"}, 
-                        synchronize_session='fetch'
-                    )
-                    db.commit() # Commit cập nhật ghi chú/cờ
-
-        # 4. Nén thư mục và Trả về kết quả
-        zip_name = f"{folder_name}.zip"
-        zip_path = os.path.join(UPLOAD_ROOT, zip_name)
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-            for root, _, files_in_folder in os.walk(folder_path):
-                for f in files_in_folder:
-                    path = os.path.join(root, f)
-                    zipf.write(path, os.path.relpath(path, folder_path))
+    @staticmethod
+    def _store_embeddings(db: Session, reports: list[Report], changed: set = None):
+        """
+        Tính và lưu embedding cho các báo cáo; lỗi encoder không làm hỏng luồng chính.
+        `changed` nhận id các báo cáo có embedding đã đổi (xem `EmbeddingStore.ensure`).
+        """
+        try:
+            embeddings = EmbeddingStore.ensure(db, reports, GeminiService.encode_texts, changed)
+            db.commit()
+            return embeddings
+        except Exception as e:
+            db.rollback()
+            if changed is not None:
+                changed.clear()  # Đã rollback: embedding cũ vẫn còn
+            print(f"[ERROR] Lưu embedding báo cáo thất bại: {e}")
+            return {}
 
-        if plagiarism_detected:
-            print(f"🚨 Phát hiện {len(plagiarism_detected)} cặp file có dấu hiệu đạo văn.")
+    @staticmethod
+    def _sync_index(report_ids, embeddings: dict):
+        """
+        Thay vector của các báo cáo trong chỉ mục lịch sử bằng embedding hiện tại;
+        báo cáo không còn embedding (bị xoá, nội dung quá ngắn) bị gỡ khỏi chỉ mục.
+        Chạy trong tiến trình API nên chỉ ghi thêm vào file chỉ mục (`append_changes`),
+        không nạp vector lịch sử vào bộ nhớ.
+        """
+        report_ids = sorted(report_ids)
+        if not report_ids:
+            return
+        ids = [rid for rid in report_ids if rid in embeddings]
+        owners = [rid for rid in ids for _ in range(len(embeddings[rid]))]
+        matrix = np.concatenate([embeddings[rid] for rid in ids]).astype(np.float32) if ids else None
+        try:
+            get_plagiarism_index().append_changes(report_ids, owners, matrix)
+        except Exception as e:
+            print(f"[ERROR] Cập nhật chỉ mục đạo văn thất bại: {e}")
 
-        return {
-            "message": "Upload, xử lý, và kiểm tra đạo văn thành công", 
-            "zip_file": zip_name, 
-            "plagiarism_results": plagiarism_detected
+    @staticmethod
+    def _check_history(db: Session, reports_to_check: list[dict], embeddings: dict):
+        """
+        Tra top-k cửa sổ gần nhất của từng báo cáo mới trong chỉ mục lịch sử,
+        chấm lại các ứng viên bằng ma trận cửa sổ đã lưu (không chạy encoder),
+        rồi thêm các báo cáo mới vào chỉ mục (cập nhật tăng dần; báo cáo đã có trong
+        chỉ mục, ví dụ khi job chạy lại, không bị thêm lần nữa).
+        """
+        batch = [r for r in reports_to_check if r["report_id"] in embeddings]
+        if not batch:
+            return []
+        ids = [r["report_id"] for r in batch]
+        owners = [rid for rid in ids for _ in range(len(embeddings[rid]))]
+        matrix = np.concatenate([embeddings[rid] for rid in ids]).astype(np.float32)
+        try:
+            index = get_plagiarism_index()
+            neighbours = index.search(matrix, k=settings.PLAGIARISM_INDEX_TOP_K, exclude_ids=ids)
+            index.add(owners, matrix)
+        except Exception as e:
+            print(f"[ERROR] Tra cứu chỉ mục đạo văn thất bại: {e}")
+            return []
+
+        candidates = {
+            (owner, other_id)
+            for owner, found in zip(owners, neighbours)
+            for other_id, score in found
+            if score >= PLAGIARISM_THRESHOLD
         }
+        if not candidates:
+            return []
+        stored = EmbeddingStore.load_chunks(db, {other_id for _, other_id in candidates})
+        by_id = {r["report_id"]: r for r in batch}
+        hits = []
+        for owner, other_id in sorted(candidates):
+            if other_id not in stored:
+                continue
+            score = PlagiarismService.pair_score(embeddings[owner], stored[other_id])
+            if score >= PLAGIARISM_THRESHOLD:
+                hits.append((by_id[owner], other_id, score))
+        if not hits:
+            return []
+
+        # Báo cáo đã bị xoá khỏi DB vẫn có thể còn trong chỉ mục: bỏ qua
+        other_ids = {other_id for _, other_id, _ in hits}
+        names = dict(db.query(Report.id, Report.name).filter(Report.id.in_(other_ids)).all())
+        for report_id, name_file in (
+            db.query(ReportFile.report_id, ReportFile.name_file)
+            .filter(ReportFile.report_id.in_(other_ids))
+            .order_by(ReportFile.id.desc())
+        ):
+            names[report_id] = name_file
+
+        return [
+            {
+                "file_1": report["filename"],
+                "file_2": names[other_id],
+                "score": f"{score:.4f}",
+                "id_1": report["report_id"],
+                "id_2": other_id,
+                "method": "semantic"
+            }
+            for report, other_id, score in hits
+            if other_id in names
+        ]
 
     @staticmethod
     def map_to_schema(report: Report):
@@ -299,6 +553,8 @@ class ReportService:
                     "id": f.id,
                     "name_file": f.name_file,
                     "path_storage": f.path_storage,
+                    "content_hash": f.content_hash,
+                    "render_dpi": f.render_dpi,
                     "created_at": f.created_at or datetime.utcnow()
                 }
                 for f in getattr(report, "files", [])
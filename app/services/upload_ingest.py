@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Ghi file upload xuống đĩa theo từng khối cố định, không đọc cả file vào bộ nhớ.
+
+Trong lúc chép: tính SHA-256 (dùng làm khoá cache trích xuất, worker không phải
+băm lại) và kiểm tra giới hạn dung lượng từng file / cả lô. Vượt giới hạn thì dừng
+ngay, xoá phần đã ghi và trả 413. File được ghi vào `<tên>.part` rồi mới đổi tên,
+nên không bao giờ có file dở dang mang tên thật.
+"""
+import hashlib
+import os
+import shutil
+from typing import BinaryIO, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+
+from app.core.config import settings
+
+PART_SUFFIX = ".part"
+
+
+def raise_error(status: int, message: str):
+    raise HTTPException(status_code=status, detail={"status": status, "message": message})
+
+
+class StoredUpload(NamedTuple):
+    name: str     # tên file gốc
+    path: str     # đường dẫn đã lưu
+    size: int     # số byte
+    sha256: str   # hex digest
+
+
+def file_digest(path: str, chunk_size: int = None) -> str:
+    """SHA-256 của file trên đĩa, đọc theo khối."""
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_BYTES
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stream_to_file(
+    src: BinaryIO,
+    dest_path: str,
+    max_bytes: int,
+    chunk_size: int = None,
+    name: str = None,
+) -> Tuple[int, str]:
+    """
+    Chép `src` vào `dest_path` theo khối `chunk_size`, trả về (số byte, sha256).
+    Vượt `max_bytes` thì xoá phần đã ghi và trả 413.
+    """
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_BYTES
+    name = name or os.path.basename(dest_path)
+    part_path = dest_path + PART_SUFFIX
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(part_path, "wb") as out:
+            while chunk := src.read(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise_error(413, f"File {name} vượt quá giới hạn {max_bytes} byte")
+                digest.update(chunk)
+                out.write(chunk)
+        os.replace(part_path, dest_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return size, digest.hexdigest()
+
+
+def ingest_files(
+    files: List[UploadFile],
+    folder_path: str,
+    max_file_bytes: int = None,
+    max_batch_bytes: int = None,
+    chunk_size: int = None,
+) -> List[StoredUpload]:
+    """
+    Lưu cả lô vào `folder_path` (thư mục riêng của lô). Bất kỳ file nào vượt giới hạn
+    hoặc tổng cả lô vượt giới hạn thì xoá toàn bộ thư mục và trả 413.
+    """
+    max_file_bytes = max_file_bytes or settings.UPLOAD_MAX_FILE_BYTES
+    max_batch_bytes = max_batch_bytes or settings.UPLOAD_MAX_BATCH_BYTES
+
+    stored = []
+    total = 0
+    try:
+        for file in files:
+            # Biết trước kích thước (header multipart) thì từ chối luôn, khỏi chép
+            declared: Optional[int] = getattr(file, "size", None)
+            if declared is not None and declared > max_file_bytes:
+                raise_error(413, f"File {file.filename} vượt quá giới hạn {max_file_bytes} byte")
+
+            name = os.path.basename(file.filename)
+            path = os.path.join(folder_path, name)
+            if any(s.path == path for s in stored):
+                # Trùng tên trong cùng lô: không ghi đè file (và hash) của file trước
+                path = os.path.join(folder_path, f"{len(stored)}_{name}")
+            # Mỗi file bị chặn bởi giới hạn riêng và phần còn lại của cả lô
+            limit = min(max_file_bytes, max_batch_bytes - total)
+            try:
+                size, sha256 = stream_to_file(file.file, path, limit, chunk_size, name=file.filename)
+            except HTTPException:
+                if limit < max_file_bytes:
+                    raise_error(413, f"Tổng dung lượng lô upload vượt quá giới hạn {max_batch_bytes} byte")
+                raise
+            total += size
+            stored.append(StoredUpload(file.filename, path, size, sha256))
+    except BaseException:
+        shutil.rmtree(folder_path, ignore_errors=True)
+        raise
+    return stored
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Hàng đợi job upload bền vững, lưu trong DB (chạy được cả với SQLite khi dev).
+
+API chỉ lưu file và tạo job rồi trả job id ngay. Worker (`scripts/run_upload_worker.py`,
+có thể chạy trên nhiều máy) nhận job bằng lease: cập nhật có điều kiện
+`status/lease_expires_at` nên hai worker không nhận trùng một job. Worker gia hạn
+lease định kỳ; nếu worker chết, lease hết hạn và job được worker khác nhận lại,
+các file đã xử lý xong (status=done) không bị chạy lại.
+"""
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.exam import Exam
+from app.models.upload_job import UploadJob, UploadJobFile, UploadJobStatus, UploadJobFileStatus
+from app.schemas.base_schemas import DetailResponse
+from app.services.blob_store import BlobService, get_blob_storage
+from app.services.upload_ingest import ingest_files
+
+UPLOAD_ROOT = "uploads/reports"
+CLAIM_CANDIDATES = 5
+
+def raise_error(status: int, message: str):
+    raise HTTPException(status_code=status, detail={"status": status, "message": message})
+
+class LeaseLost(Exception):
+    """Worker không còn giữ lease của job: phải dừng, không ghi thêm kết quả."""
+
+class UploadJobService:
+
+    @staticmethod
+    def enqueue(db: Session, exam_id: int, files: list[UploadFile], username: str) -> UploadJob:
+        """Lưu file vào thư mục của lô và tạo job chờ worker xử lý."""
+        exam = db.query(Exam).filter(Exam.id == exam_id).first()
+        if not exam:
+            raise_error(404, "Kỳ thi không tồn tại")
+        if not files:
+            raise_error(400, "Chưa chọn file nào")
+
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        folder_path = os.path.join(UPLOAD_ROOT, f"report_{exam.code}_{timestamp}")
+        os.makedirs(folder_path, exist_ok=True)
+        # Chép theo khối + tính SHA-256; vượt giới hạn dung lượng thì trả 413
+        stored = ingest_files(files, folder_path)
+
+        # Chuyển vào kho blob: nội dung đã có (upload lại) thì chỉ bỏ bản vừa chép
+        storage = get_blob_storage()
+        for upload in stored:
+            BlobService.register(db, upload.sha256, upload.size)
+            storage.put_file(upload.path, upload.sha256)
+        shutil.rmtree(folder_path, ignore_errors=True)
+
+        job = UploadJob(
+            exam_id=exam_id,
+            folder_path=folder_path,
+            status=UploadJobStatus.pending,
+            total_files=len(files),
+            processed_files=0,
+            attempts=0,
+            created_by=username,
+        )
+        for upload in stored:
+            job.files.append(UploadJobFile(
+                name_file=upload.name,
+                path_storage=storage.local_path(upload.sha256) or upload.sha256,
+                content_hash=upload.sha256,
+                size_bytes=upload.size,
+                status=UploadJobFileStatus.pending,
+            ))
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    @staticmethod
+    def claim(db: Session, worker_id: str, lease_seconds: int = None) -> Optional[UploadJob]:
+        """
+        Nhận một job đang chờ hoặc có lease đã hết hạn (worker trước bị chết).
+        Trả về None nếu không còn job nào.
+        """
+        lease_seconds = lease_seconds or settings.UPLOAD_JOB_LEASE_SECONDS
+        now = datetime.utcnow()
+        expired = and_(UploadJob.status == UploadJobStatus.running, UploadJob.lease_expires_at < now)
+
+        # Job đã bị nhận lại quá số lần cho phép thì đánh dấu lỗi, tránh lặp vô hạn
+        db.query(UploadJob).filter(expired, UploadJob.attempts >= settings.UPLOAD_JOB_MAX_ATTEMPTS).update(
+            {
+                "status": UploadJobStatus.failed,
+                "error": "Worker không hoàn thành job sau số lần thử tối đa",
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "finished_at": now,
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+
+        claimable = or_(UploadJob.status == UploadJobStatus.pending, expired)
+        candidates = db.query(UploadJob.id).filter(claimable).order_by(UploadJob.id).limit(CLAIM_CANDIDATES).all()
+        for (job_id,) in candidates:
+            # Cập nhật có điều kiện: chỉ một worker thắng khi nhiều worker cùng nhận
+            claimed = db.query(UploadJob).filter(UploadJob.id == job_id, claimable).update(
+                {
+                    "status": UploadJobStatus.running,
+                    "lease_owner": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                    "attempts": UploadJob.attempts + 1,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+            if claimed:
+                return db.query(UploadJob).filter(UploadJob.id == job_id).first()
+        return None
+
+    @staticmethod
+    def heartbeat(db: Session, job_id: int, worker_id: str, lease_seconds: int = None) -> bool:
+        """Gia hạn lease. Trả về False nếu job không còn thuộc worker này."""
+        lease_seconds = lease_seconds or settings.UPLOAD_JOB_LEASE_SECONDS
+        renewed = db.query(UploadJob).filter(
+            UploadJob.id == job_id,
+            UploadJob.lease_owner == worker_id,
+            UploadJob.status == UploadJobStatus.running,
+        ).update(
+            {"lease_expires_at": datetime.utcnow() + timedelta(seconds=lease_seconds)},
+            synchronize_session=False,
+        )
+        db.commit()
+        return bool(renewed)
+
+    @staticmethod
+    def complete(db: Session, job_id: int, worker_id: str, result: dict) -> bool:
+        return UploadJobService._finish(db, job_id, worker_id, {
+            "status": UploadJobStatus.done,
+            "result": json.dumps(result, ensure_ascii=False, default=str),
+            "error": None,
+        })
+
+    @staticmethod
+    def fail(db: Session, job_id: int, worker_id: str, error: str) -> bool:
+        """Lỗi khi xử lý: trả job về hàng đợi nếu còn lượt thử, ngược lại đánh dấu failed."""
+        db.rollback()
+        job = db.query(UploadJob).filter(UploadJob.id == job_id).first()
+        if job is None:
+            return False
+        if job.attempts < settings.UPLOAD_JOB_MAX_ATTEMPTS:
+            return UploadJobService._finish(db, job_id, worker_id, {
+                "status": UploadJobStatus.pending,
+                "error": error,
+                "finished_at": None,
+            })
+        return UploadJobService._finish(db, job_id, worker_id, {
+            "status": UploadJobStatus.failed,
+            "error": error,
+        })
+
+    @staticmethod
+    def _finish(db: Session, job_id: int, worker_id: str, values: dict) -> bool:
+        values = {"lease_owner": None, "lease_expires_at": None, "finished_at": datetime.utcnow(), **values}
+        updated = db.query(UploadJob).filter(
+            UploadJob.id == job_id,
+            UploadJob.lease_owner == worker_id,
+        ).update(values, synchronize_session=False)
+        db.commit()
+        return bool(updated)
+
+    @staticmethod
+    def purge(db: Session, older_than_days: int) -> int:
+        """
+        Xoá job đã kết thúc (done/failed) trước `older_than_days` ngày cùng các file của job.
+        Blob của các file đó không còn được giữ và sẽ được GC dọn nếu không có ReportFile
+        nào tham chiếu. Trả về số job đã xoá.
+        """
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        finished = db.query(UploadJob.id).filter(
+            UploadJob.status.in_([UploadJobStatus.done, UploadJobStatus.failed]),
+            UploadJob.finished_at < cutoff,
+        )
+        job_ids = [job_id for (job_id,) in finished]
+        if not job_ids:
+            return 0
+        db.query(UploadJobFile).filter(UploadJobFile.job_id.in_(job_ids)).delete(synchronize_session=False)
+        deleted = db.query(UploadJob).filter(UploadJob.id.in_(job_ids)).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+    @staticmethod
+    def get_status(db: Session, job_id: int):
+        job = db.query(UploadJob).filter(UploadJob.id == job_id).first()
+        if not job:
+            raise_error(404, "Job upload không tồn tại")
+        return DetailResponse(status=True, data=UploadJobService.map_to_schema(job))
+
+    @staticmethod
+    def map_to_schema(job: UploadJob):
+        return {
+            "id": job.id,
+            "exam_id": job.exam_id,
+            "status": job.status,
+            "total_files": job.total_files,
+            "processed_files": job.processed_files,
+            "attempts": job.attempts,
+            "error": job.error,
+            "result": json.loads(job.result) if job.result else None,
+            "created_at": job.created_at,
+            "finished_at": job.finished_at,
+            "files": [
+                {
+                    "id": f.id,
+                    "name_file": f.name_file,
+                    "status": f.status,
+                    "report_id": f.report_id,
+                    "error": f.error,
+                }
+                for f in job.files
+            ],
+        }
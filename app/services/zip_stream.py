@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Tạo file ZIP theo kiểu stream: đọc từng file nguồn theo khối và trả ngay các byte ZIP
+vừa sinh ra, không dựng archive trên đĩa hay trong bộ nhớ.
+
+PDF đã nén sẵn nên mọi mục dùng ZIP_STORED (không tốn CPU nén). Output không seek
+được nên zipfile ghi CRC/kích thước vào data descriptor sau mỗi mục; bảng mục lục
+(central directory) ở cuối archive vẫn đầy đủ cho mọi công cụ giải nén.
+"""
+import io
+import os
+import time
+import zipfile
+from typing import BinaryIO, Callable, Iterable, Iterator, Tuple
+
+ZipEntry = Tuple[str, Callable[[], BinaryIO]]  # (tên trong archive, hàm mở file nguồn)
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+class _ZipSink(io.RawIOBase):
+    """Đích ghi của ZipFile: gom byte vừa ghi để generator lấy ra (không hỗ trợ seek)."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def unique_names(names: Iterable[str]) -> Iterator[str]:
+    """Đổi tên trùng thành `ten (2).pdf`, `ten (3).pdf`... để không ghi đè nhau khi giải nén."""
+    seen = set()
+    for name in names:
+        candidate = name
+        stem, ext = os.path.splitext(name)
+        index = 2
+        while candidate in seen:
+            candidate = f"{stem} ({index}){ext}"
+            index += 1
+        seen.add(candidate)
+        yield candidate
+
+
+def iter_zip_stored(entries: Iterable[ZipEntry], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Sinh archive ZIP (ZIP_STORED) theo từng khối. Bộ nhớ dùng không phụ thuộc số file
+    hay kích thước file (chỉ một khối đọc + header). File không mở được thì bỏ qua.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for arcname, open_source in entries:
+            try:
+                source = open_source()
+            except OSError as e:
+                print(f"[ERROR] Bỏ qua {arcname} khi nén: {e}")
+                continue
+            with source:
+                info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                with archive.open(info, "w") as dest:
+                    while chunk := source.read(chunk_size):
+                        dest.write(chunk)
+                        # Không trả khối rỗng: với chunked transfer, khối rỗng là kết thúc body
+                        if data := sink.drain():
+                            yield data
+            if data := sink.drain():
+                yield data
+    if data := sink.drain():
+        yield data
@@ -0,0 +1,37 @@
+"""add report_embeddings table
+
+Revision ID: 3c9a1e7b2f40
+Revises: 76bfcf9f3b4d
+Create Date: 2026-10-17 09:12:05.114203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a1e7b2f40'
+down_revision: Union[str, Sequence[str], None] = '76bfcf9f3b4d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('report_embeddings',
+    sa.Column('report_id', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False, comment='SHA-256 của raw_content lúc mã hoá'),
+    sa.Column('model_name', sa.String(length=255), nullable=False),
+    sa.Column('dim', sa.Integer(), nullable=False),
+    sa.Column('vector', sa.LargeBinary(), nullable=False, comment='Embedding float16 (little-endian), dạng bytes'),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['report_id'], ['reports.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('report_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('report_embeddings')
@@ -0,0 +1,67 @@
+"""add upload_jobs tables
+
+Revision ID: 5b7e2d9c4a13
+Revises: 8d41f0c2a9e7
+Create Date: 2026-10-17 15:21:07.316402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2d9c4a13'
+down_revision: Union[str, Sequence[str], None] = '8d41f0c2a9e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('upload_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('exam_id', sa.Integer(), nullable=False),
+    sa.Column('folder_path', sa.String(length=500), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'running', 'done', 'failed', name='uploadjobstatus', native_enum=False), nullable=False),
+    sa.Column('total_files', sa.Integer(), nullable=False),
+    sa.Column('processed_files', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('lease_owner', sa.String(length=255), nullable=True),
+    sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('result', sa.Text(), nullable=True, comment='Kết quả xử lý (JSON)'),
+    sa.Column('created_by', sa.String(length=100), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['exam_id'], ['exams.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_upload_jobs_id'), 'upload_jobs', ['id'], unique=False)
+    op.create_index('ix_upload_jobs_status_lease', 'upload_jobs', ['status', 'lease_expires_at'], unique=False)
+    op.create_table('upload_job_files',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('name_file', sa.String(length=255), nullable=False),
+    sa.Column('path_storage', sa.String(length=500), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'done', 'failed', name='uploadjobfilestatus', native_enum=False), nullable=False),
+    sa.Column('report_id', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['job_id'], ['upload_jobs.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['report_id'], ['reports.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_upload_job_files_id'), 'upload_job_files', ['id'], unique=False)
+    op.create_index(op.f('ix_upload_job_files_job_id'), 'upload_job_files', ['job_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_upload_job_files_job_id'), table_name='upload_job_files')
+    op.drop_index(op.f('ix_upload_job_files_id'), table_name='upload_job_files')
+    op.drop_table('upload_job_files')
+    op.drop_index('ix_upload_jobs_status_lease', table_name='upload_jobs')
+    op.drop_index(op.f('ix_upload_jobs_id'), table_name='upload_jobs')
+    op.drop_table('upload_jobs')
@@ -0,0 +1,50 @@
+"""add plagiarism_matches table
+
+Revision ID: 8d41f0c2a9e7
+Revises: 3c9a1e7b2f40
+Create Date: 2026-10-17 14:03:51.482911
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41f0c2a9e7'
+down_revision: Union[str, Sequence[str], None] = '3c9a1e7b2f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('plagiarism_matches',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('report_a_id', sa.Integer(), nullable=False),
+    sa.Column('report_b_id', sa.Integer(), nullable=False),
+    sa.Column('exam_id', sa.Integer(), nullable=False, comment='Kỳ thi của lô upload phát hiện cặp này'),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('method', sa.String(length=20), nullable=False, comment='lexical | semantic'),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['exam_id'], ['exams.id'], ),
+    sa.ForeignKeyConstraint(['report_a_id'], ['reports.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['report_b_id'], ['reports.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_plagiarism_matches_id'), 'plagiarism_matches', ['id'], unique=False)
+    op.create_index(op.f('ix_plagiarism_matches_report_a_id'), 'plagiarism_matches', ['report_a_id'], unique=False)
+    op.create_index(op.f('ix_plagiarism_matches_report_b_id'), 'plagiarism_matches', ['report_b_id'], unique=False)
+    op.create_index('ix_plagiarism_matches_exam_created', 'plagiarism_matches', ['exam_id', 'created_at'], unique=False)
+    op.create_index('uq_plagiarism_matches_pair', 'plagiarism_matches', ['exam_id', 'report_a_id', 'report_b_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_plagiarism_matches_pair', table_name='plagiarism_matches')
+    op.drop_index('ix_plagiarism_matches_exam_created', table_name='plagiarism_matches')
+    op.drop_index(op.f('ix_plagiarism_matches_report_b_id'), table_name='plagiarism_matches')
+    op.drop_index(op.f('ix_plagiarism_matches_report_a_id'), table_name='plagiarism_matches')
+    op.drop_index(op.f('ix_plagiarism_matches_id'), table_name='plagiarism_matches')
+    op.drop_table('plagiarism_matches')
@@ -0,0 +1,38 @@
+"""add extraction_cache table
+
+Revision ID: a2f6c8e1d357
+Revises: 5b7e2d9c4a13
+Create Date: 2026-10-17 21:14:32.905118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2f6c8e1d357'
+down_revision: Union[str, Sequence[str], None] = '5b7e2d9c4a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('extraction_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('pdf_sha256', sa.String(length=64), nullable=False, comment='SHA-256 của bytes PDF'),
+    sa.Column('prompt_version', sa.String(length=100), nullable=False, comment='Model + phiên bản prompt trích xuất'),
+    sa.Column('data', sa.Text(), nullable=False, comment='Kết quả trích xuất (JSON)'),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('pdf_sha256', 'prompt_version', name='uq_extraction_cache_key')
+    )
+    op.create_index(op.f('ix_extraction_cache_id'), 'extraction_cache', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_extraction_cache_id'), table_name='extraction_cache')
+    op.drop_table('extraction_cache')
@@ -0,0 +1,28 @@
+"""add render_dpi to report_files
+
+Revision ID: c4d9e2b7f810
+Revises: a2f6c8e1d357
+Create Date: 2026-10-17 21:31:48.602774
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d9e2b7f810'
+down_revision: Union[str, Sequence[str], None] = 'a2f6c8e1d357'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('report_files', sa.Column('render_dpi', sa.Integer(), nullable=True, comment='DPI cuối cùng dùng khi render ảnh để trích xuất (NULL nếu không cần render)'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('report_files', 'render_dpi')
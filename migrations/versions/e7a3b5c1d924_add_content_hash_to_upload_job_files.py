@@ -0,0 +1,30 @@
+"""add content_hash and size_bytes to upload_job_files
+
+Revision ID: e7a3b5c1d924
+Revises: c4d9e2b7f810
+Create Date: 2026-10-17 22:14:05.318842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3b5c1d924'
+down_revision: Union[str, Sequence[str], None] = 'c4d9e2b7f810'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('upload_job_files', sa.Column('content_hash', sa.String(length=64), nullable=True, comment='SHA-256 (hex) nội dung file'))
+    op.add_column('upload_job_files', sa.Column('size_bytes', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('upload_job_files', 'size_bytes')
+    op.drop_column('upload_job_files', 'content_hash')
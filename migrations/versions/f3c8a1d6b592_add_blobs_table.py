@@ -0,0 +1,41 @@
+"""add blobs table and report_files.content_hash
+
+Revision ID: f3c8a1d6b592
+Revises: e7a3b5c1d924
+Create Date: 2026-10-17 22:41:19.527304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8a1d6b592'
+down_revision: Union[str, Sequence[str], None] = 'e7a3b5c1d924'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('blobs',
+    sa.Column('sha256', sa.String(length=64), nullable=False, comment='SHA-256 (hex) nội dung, cũng là khoá trong kho blob'),
+    sa.Column('size_bytes', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('last_used_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    op.add_column('report_files', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_report_files_content_hash'), 'report_files', ['content_hash'], unique=False)
+    op.create_foreign_key('fk_report_files_content_hash_blobs', 'report_files', 'blobs', ['content_hash'], ['sha256'])
+    # File cũ (content_hash NULL) chuyển vào kho bằng scripts/migrate_report_files_to_blobs.py
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('fk_report_files_content_hash_blobs', 'report_files', type_='foreignkey')
+    op.drop_index(op.f('ix_report_files_content_hash'), table_name='report_files')
+    op.drop_column('report_files', 'content_hash')
+    op.drop_table('blobs')
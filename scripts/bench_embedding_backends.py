@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+So sánh throughput và bộ nhớ của backend embedding torch (fp32) và onnx (int8).
+
+    python -m scripts.bench_embedding_backends [--texts 512] [--engines torch,onnx]
+
+Mỗi backend chạy trong một tiến trình con riêng để đo peak RSS độc lập.
+"""
+import json
+import random
+import resource
+import subprocess
+import sys
+import time
+
+import click
+from dotenv import find_dotenv, load_dotenv
+
+SYLLABLES = (
+    "báo cáo thực tập tuần em tìm hiểu hệ thống cài đặt môi trường viết api kiểm thử "
+    "giao diện người dùng cơ sở dữ liệu triển khai sửa lỗi họp nhóm tài liệu dự án"
+).split()
+
+
+def sample_texts(count: int, words: int = 120, seed: int = 0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(SYLLABLES) for _ in range(words)) for _ in range(count)]
+
+
+def run_engine(engine: str, count: int) -> dict:
+    from app.services.embedding_backends import create_backend
+
+    started = time.perf_counter()
+    backend = create_backend(engine)
+    load_s = time.perf_counter() - started
+
+    texts = sample_texts(count)
+    backend.encode(texts[:8])  # warm-up
+    started = time.perf_counter()
+    backend.encode(texts)
+    encode_s = time.perf_counter() - started
+    return {
+        "engine": engine,
+        "load_s": round(load_s, 2),
+        "texts_per_s": round(count / encode_s, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+@click.command()
+@click.option("--texts", "count", default=512, type=int, help="Số văn bản mã hoá mỗi backend.")
+@click.option("--engines", default="torch,onnx", help="Danh sách backend, cách nhau bởi dấu phẩy.")
+@click.option("--worker", default=None, help="(nội bộ) chạy một backend trong tiến trình con.")
+def main(count, engines, worker):
+    if worker:
+        print(json.dumps(run_engine(worker, count)))
+        return
+
+    for engine in engines.split(","):
+        proc = subprocess.run(
+            [sys.executable, "-m", "scripts.bench_embedding_backends", "--texts", str(count), "--worker", engine],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"{engine:6s} lỗi: {proc.stderr.strip().splitlines()[-1] if proc.stderr else proc.returncode}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(
+            f"{engine:6s} load {result['load_s']:6.2f}s | "
+            f"{result['texts_per_s']:8.1f} texts/s | peak RSS {result['peak_rss_mb']:8.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+
+    load_dotenv(find_dotenv())
+
+    # pylint: disable = no-value-for-parameter
+    main()
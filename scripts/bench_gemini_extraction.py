@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+So sánh thời gian trích xuất một lô upload tuần tự và song song.
+
+Dựng một "Gemini giả" cục bộ (HTTP, có độ trễ cấu hình được) rồi gửi mỗi file
+một round-trip qua `map_ordered`, giống bước trích xuất của ReportService.process_job.
+
+    python -m scripts.bench_gemini_extraction [--files 50] [--latency-ms 1500] [--concurrency 1,4,8]
+"""
+import json
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import click
+from dotenv import find_dotenv, load_dotenv
+from loguru import logger
+
+from app.services.extraction_pool import map_ordered
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    latency = 1.0
+    jitter = 0.2
+    error_rate = 0.0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(max(0.0, random.gauss(self.latency, self.latency * self.jitter)))
+        if random.random() < self.error_rate:
+            self.send_response(503)
+            self.end_headers()
+            return
+        payload = json.dumps({"Họ và tên": f"file {len(body)} bytes"}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fake_gemini(latency_ms: float, error_rate: float) -> ThreadingHTTPServer:
+    FakeGeminiHandler.latency = latency_ms / 1000.0
+    FakeGeminiHandler.error_rate = error_rate
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGeminiHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_extract(url: str):
+    def extract(pdf_bytes: bytes) -> dict:
+        request = urllib.request.Request(url, data=pdf_bytes, method="POST")
+        with urllib.request.urlopen(request, timeout=60) as resp:
+            return json.loads(resp.read())
+    return extract
+
+
+@click.command()
+@click.option("--files", default=50, type=int, help="Số file trong lô.")
+@click.option("--file-kb", default=200, type=int, help="Kích thước mỗi file giả (KB).")
+@click.option("--latency-ms", default=1500.0, type=float, help="Độ trễ trung bình của Gemini giả.")
+@click.option("--error-rate", default=0.02, type=float, help="Tỉ lệ lời gọi lỗi (503).")
+@click.option("--concurrency", default="1,4,8,16", help="Các mức song song cần đo, cách nhau bởi dấu phẩy.")
+def main(files, file_kb, latency_ms, error_rate, concurrency):
+    """Đo thời gian trích xuất cả lô với từng mức song song."""
+    server = start_fake_gemini(latency_ms, error_rate)
+    extract = make_extract(f"http://127.0.0.1:{server.server_address[1]}/extract")
+    contents = [bytes(file_kb * 1024) for _ in range(files)]
+    try:
+        for level in [int(c) for c in concurrency.split(",")]:
+            started = time.perf_counter()
+            results = map_ordered(extract, contents, level)
+            elapsed = time.perf_counter() - started
+            errors = sum(isinstance(r, Exception) for r in results)
+            logger.info(
+                f"concurrency={level:<3} {files} file: {elapsed:7.2f}s "
+                f"({elapsed / files * 1000:6.0f} ms/file, {errors} lỗi)"
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+
+    load_dotenv(find_dotenv())
+
+    # pylint: disable = no-value-for-parameter
+    main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+So sánh kích thước request và độ trễ giữa các cách gửi PDF cho Gemini, dùng client giả
+(ghi lại request, mô phỏng thời gian upload theo băng thông) nên không tốn quota API.
+
+    python -m scripts.bench_gemini_payload [--pdf a.pdf --pdf b.pdf] [--uplink-mbps 20]
+
+  legacy : render mọi trang 300 DPI, mỗi trang một part image/png (cách cũ)
+  pages  : văn bản lớp chữ + ảnh các trang scan (GEMINI_INPUT_MODE=pages)
+  pdf    : nguyên file PDF trong một part application/pdf (GEMINI_INPUT_MODE=pdf)
+"""
+import base64
+import json
+import time
+
+import click
+from dotenv import find_dotenv, load_dotenv
+
+from app.services.gemini_input import prepare_input
+
+MODES = {
+    "legacy": {"mode": "pages", "text_first": False},
+    "pages": {"mode": "pages", "text_first": True},
+    "pdf": {"mode": "pdf", "text_first": True},
+}
+
+
+class RecordingClient:
+    """Thay cho model Gemini: đo số byte của request JSON (inline_data base64 như REST API)."""
+
+    def __init__(self, uplink_mbps: float, base_latency_ms: float):
+        self.bytes_per_s = uplink_mbps * 1e6 / 8
+        self.base_latency = base_latency_ms / 1000.0
+        self.requests = []
+
+    def generate_content(self, contents):
+        parts = [
+            {"text": c} if isinstance(c, str)
+            else {"inline_data": {"mime_type": c["mime_type"], "data": base64.b64encode(c["data"]).decode("ascii")}}
+            for c in contents
+        ]
+        body = json.dumps({"contents": [{"parts": parts}]}).encode("utf-8")
+        self.requests.append(len(body))
+        time.sleep(self.base_latency + len(body) / self.bytes_per_s)
+        return len(body)
+
+
+def sample_pdfs():
+    """Một phiếu xuất từ Word (toàn chữ) và một phiếu scan (ảnh trang)."""
+    import pymupdf
+
+    digital = pymupdf.open()
+    for i in range(4):
+        page = digital.new_page()
+        for line in range(40):
+            page.insert_text((60, 60 + line * 17), f"Tuan {line % 12 + 1}: tim hieu he thong, viet API va kiem thu {i}-{line}")
+    scanned = pymupdf.open()
+    for page in digital:
+        pix = page.get_pixmap(dpi=150)
+        scanned.new_page(width=page.rect.width, height=page.rect.height).insert_image(
+            page.rect, stream=pix.tobytes(output="jpeg", jpg_quality=80)
+        )
+    return {"digital.pdf": digital.tobytes(), "scanned.pdf": scanned.tobytes()}
+
+
+@click.command()
+@click.option("--pdf", "pdf_paths", multiple=True, type=click.Path(exists=True), help="File PDF cần đo (mặc định tự tạo).")
+@click.option("--uplink-mbps", default=20.0, type=float, help="Băng thông upload mô phỏng.")
+@click.option("--base-latency-ms", default=300.0, type=float, help="Độ trễ cố định mỗi request.")
+def main(pdf_paths, uplink_mbps, base_latency_ms):
+    """In số byte request và độ trễ (chuẩn bị + gửi) của từng cách gửi."""
+    pdfs = {}
+    for path in pdf_paths:
+        with open(path, "rb") as f:
+            pdfs[path] = f.read()
+    pdfs = pdfs or sample_pdfs()
+
+    prompt = "Trả về JSON thông tin phiếu báo cáo thực tập."
+    prepare_input(next(iter(pdfs.values())), mode="pages")  # warm-up: import pymupdf, khởi động pool render
+    for name, pdf_bytes in pdfs.items():
+        print(f"{name} ({len(pdf_bytes) / 1024:.0f} KB)")
+        for label, options in MODES.items():
+            client = RecordingClient(uplink_mbps, base_latency_ms)
+            started = time.perf_counter()
+            prepared = prepare_input(pdf_bytes, **options)
+            prepare_s = time.perf_counter() - started
+            client.generate_content([prompt, *prepared.parts])
+            total_s = time.perf_counter() - started
+            print(
+                f"  {label:7s} {len(prepared.parts):3d} part | request {client.requests[-1] / 1024:9.1f} KB | "
+                f"chuẩn bị {prepare_s * 1000:7.1f} ms | tổng {total_s * 1000:8.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+
+    load_dotenv(find_dotenv())
+
+    # pylint: disable = no-value-for-parameter
+    main()
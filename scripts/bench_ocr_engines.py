@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+So sánh thông lượng OCR giữa pytesseract (một tiến trình tesseract mỗi lần gọi) và
+tesserocr (handle giữ sẵn trong từng luồng), trên cùng ảnh và cùng số luồng.
+
+    python -m scripts.bench_ocr_engines [--images 40] [--threads 4] [--region roi|full] [--engines pytesseract,tesserocr]
+
+Ảnh là trang scan tự tạo của `bench_mssv_ocr` (roi: vùng thông tin sinh viên với whitelist
+như fallback MSSV; full: cả trang với vie+eng). Mỗi engine chạy trong một tiến trình con riêng.
+"""
+import io
+import json
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+import numpy as np
+from dotenv import find_dotenv, load_dotenv
+
+
+def sample_images(count: int, region: str):
+    from PIL import Image
+
+    from app.services.mssv_ocr import FULL_PAGE_CONFIG, ROI_CONFIG, prepare_roi
+    from scripts.bench_mssv_ocr import sample_scan
+
+    distinct = [Image.open(io.BytesIO(sample_scan(f"PH{10000 + i * 7919 % 90000:05d}", i))) for i in range(min(count, 8))]
+    if region == "roi":
+        prepared = [np.asarray(prepare_roi(img)) for img in distinct]
+        lang, config = "eng", ROI_CONFIG
+    else:
+        prepared = [np.asarray(img.convert("L")) for img in distinct]
+        lang, config = "vie+eng", FULL_PAGE_CONFIG
+    return [prepared[i % len(prepared)] for i in range(count)], lang, config
+
+
+def run_engine(engine: str, count: int, threads: int, region: str) -> dict:
+    from app.services.ocr_service import OcrService
+
+    images, lang, config = sample_images(count, region)
+    service = OcrService(engine, max_handles=threads)
+    # Lượt khởi động: tính riêng thời gian nạp traineddata lần đầu
+    started = time.perf_counter()
+    service.image_to_string(images[0], lang=lang, config=config)
+    warmup = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        texts = list(pool.map(lambda img: service.image_to_string(img, lang=lang, config=config), images))
+    elapsed = time.perf_counter() - started
+    service.close()
+    return {
+        "engine": engine,
+        "images": len(texts),
+        "warmup_ms": round(warmup * 1000, 1),
+        "total_s": round(elapsed, 3),
+        "images_per_s": round(len(texts) / elapsed, 2),
+        "ms_per_image": round(elapsed / len(texts) * 1000, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+@click.command()
+@click.option("--images", "count", default=40, type=int, help="Số ảnh OCR mỗi engine.")
+@click.option("--threads", default=4, type=int, help="Số luồng gọi OCR cùng lúc.")
+@click.option("--region", default="roi", type=click.Choice(["roi", "full"]))
+@click.option("--engines", default="pytesseract,tesserocr", help="Danh sách engine, cách nhau bởi dấu phẩy.")
+@click.option("--worker", default=None, help="(nội bộ) chạy một engine trong tiến trình con.")
+def main(count, threads, region, engines, worker):
+    if worker:
+        print(json.dumps(run_engine(worker, count, threads, region)))
+        return
+
+    for engine in engines.split(","):
+        proc = subprocess.run(
+            [sys.executable, "-m", "scripts.bench_ocr_engines", "--images", str(count), "--threads", str(threads),
+             "--region", region, "--worker", engine],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"{engine:11s} lỗi: {proc.stderr.strip().splitlines()[-1] if proc.stderr else proc.returncode}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(
+            f"{engine:11s} {r['images']:4d} ảnh | khởi động {r['warmup_ms']:7.1f} ms | {r['total_s']:7.3f}s | "
+            f"{r['images_per_s']:6.2f} ảnh/s | {r['ms_per_image']:7.1f} ms/ảnh | peak RSS {r['peak_rss_mb']:7.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+
+    load_dotenv(find_dotenv())
+
+    # pylint: disable = no-value-for-parameter
+    main()
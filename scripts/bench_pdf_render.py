@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+So sánh độ trễ và peak RSS khi render PDF sang ảnh giữa các engine.
+
+    python -m scripts.bench_pdf_render [--pdf bao_cao.pdf] [--pages 10] [--dpi 300] [--engines pymupdf,poppler,legacy]
+
+  pymupdf : render trong tiến trình, mở tài liệu một lần (PDF_RENDER_ENGINE=pymupdf)
+  poppler : pdf2image, một lần `pdftoppm` cho đoạn trang liên tiếp (PDF_RENDER_ENGINE=poppler)
+  legacy  : cách cũ, convert_from_bytes cả file một lần rồi encode từng ảnh PIL
+
+Mỗi engine chạy trong một tiến trình con riêng để đo peak RSS độc lập.
+"""
+import io
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import click
+from dotenv import find_dotenv, load_dotenv
+
+
+def sample_pdf(pages: int) -> bytes:
+    """PDF nhiều trang chữ + hình, gần giống phiếu báo cáo thực tập."""
+    import pymupdf
+
+    doc = pymupdf.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"BÁO CÁO THỰC TẬP - Trang {i + 1}", fontsize=16)
+        for line in range(40):
+            page.insert_text((72, 110 + line * 16), f"Tuần {line % 12 + 1}: tìm hiểu hệ thống, viết API và kiểm thử {line}")
+        page.draw_rect(pymupdf.Rect(60, 60, 540, 780), color=(0, 0, 0), width=1)
+    return doc.tobytes()
+
+
+def render_legacy(pdf_bytes: bytes, dpi: int, fmt: str, colorspace: str):
+    from pdf2image import convert_from_bytes
+
+    pages = convert_from_bytes(pdf_bytes, dpi=dpi, grayscale=colorspace == "gray")
+    outputs = []
+    for page in pages:
+        buf = io.BytesIO()
+        page.save(buf, format=fmt)
+        outputs.append(buf.getvalue())
+    return outputs
+
+
+def run_engine(engine: str, pdf_bytes: bytes, dpi: int, fmt: str, colorspace: str) -> dict:
+    from app.services.pdf_rasterizer import ENGINES
+
+    started = time.perf_counter()
+    if engine == "legacy":
+        outputs = render_legacy(pdf_bytes, dpi, fmt, colorspace)
+    else:
+        page_count, render_pages = ENGINES[engine]
+        outputs = render_pages(pdf_bytes, range(page_count(pdf_bytes)), dpi, fmt, colorspace)
+    elapsed = time.perf_counter() - started
+    return {
+        "engine": engine,
+        "pages": len(outputs),
+        "total_s": round(elapsed, 3),
+        "page_ms": round(elapsed / max(len(outputs), 1) * 1000, 1),
+        "output_kb": round(sum(len(o) for o in outputs) / 1024, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+@click.command()
+@click.option("--pdf", "pdf_path", default=None, type=click.Path(exists=True), help="File PDF dùng để đo (mặc định tự tạo).")
+@click.option("--pages", default=10, type=int, help="Số trang của PDF tự tạo.")
+@click.option("--dpi", default=300, type=int)
+@click.option("--format", "fmt", default="PNG", type=click.Choice(["PNG", "JPEG"]))
+@click.option("--colorspace", default="rgb", type=click.Choice(["rgb", "gray"]))
+@click.option("--engines", default="pymupdf,poppler,legacy", help="Danh sách engine, cách nhau bởi dấu phẩy.")
+@click.option("--worker", default=None, help="(nội bộ) chạy một engine trong tiến trình con.")
+def main(pdf_path, pages, dpi, fmt, colorspace, engines, worker):
+    if worker:
+        with open(pdf_path, "rb") as f:
+            print(json.dumps(run_engine(worker, f.read(), dpi, fmt, colorspace)))
+        return
+
+    if pdf_path is None:
+        pdf_path = "/tmp/bench_pdf_render.pdf"
+        with open(pdf_path, "wb") as f:
+            f.write(sample_pdf(pages))
+
+    for engine in engines.split(","):
+        proc = subprocess.run(
+            [sys.executable, "-m", "scripts.bench_pdf_render", "--pdf", pdf_path, "--dpi", str(dpi),
+             "--format", fmt, "--colorspace", colorspace, "--worker", engine],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"{engine:8s} lỗi: {proc.stderr.strip().splitlines()[-1] if proc.stderr else proc.returncode}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(
+            f"{engine:8s} {result['pages']:3d} trang | {result['total_s']:7.3f}s | "
+            f"{result['page_ms']:7.1f} ms/trang | {result['output_kb']:9.1f} KB | peak RSS {result['peak_rss_mb']:7.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+
+    load_dotenv(find_dotenv())
+
+    # pylint: disable = no-value-for-parameter
+    main()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+So sánh xuất Excel báo cáo của một kỳ thi: cách cũ (nạp toàn bộ đối tượng ORM, Workbook
+thường, lưu vào BytesIO) với cách stream (`report_export.build_export`).
+
+    python -m scripts.bench_report_export [--rows 50000] [--raw-chars 3000] [--db /tmp/bench_export.db]
+
+Dữ liệu là DB SQLite tạm với `--rows` báo cáo (nội dung thô dài `--raw-chars` ký tự).
+Mỗi cách chạy trong một tiến trình con riêng để đo peak RSS độc lập.
+
+  legacy     : query(Report).all() + Workbook() + BytesIO, không có cột nội dung thô
+  legacy_raw : như trên, có cột nội dung thô
+  stream     : yield_per + write_only + SpooledTemporaryFile
+  stream_raw : như trên, có cột nội dung thô
+"""
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import click
+from dotenv import find_dotenv, load_dotenv
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.models import Exam, Report
+
+MODES = ["legacy", "legacy_raw", "stream", "stream_raw"]
+EXAM_ID = 1
+
+
+def seed(db_path: str, rows: int, raw_chars: int) -> None:
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    line = "Tuần {}: tìm hiểu hệ thống, viết API và kiểm thử. "
+    raw = "".join(line.format(i % 12 + 1) for i in range(raw_chars // len(line) + 1))[:raw_chars]
+    with engine.begin() as conn:
+        conn.execute(insert(Exam), [{"id": EXAM_ID, "code": "EXAM001", "name": "Kỳ thi",
+                                     "start_time": datetime(2025, 1, 1), "end_time": datetime(2025, 1, 2)}])
+        for start in range(0, rows, 5000):
+            conn.execute(insert(Report), [
+                {
+                    "name": f"Nguyễn Văn {i}", "student_code": f"PH{10000 + i}", "exam_id": EXAM_ID,
+                    "major": "Ứng dụng phần mềm", "position": "Lập trình viên",
+                    "strengths": "Chủ động, chăm chỉ", "weaknesses": "Cần cải thiện giao tiếp",
+                    "proposal": "Tiếp tục phát triển", "attitude_score": 8, "work_score": 9,
+                    "note": "Đạt", "raw_content": raw, "created_at": datetime(2025, 1, 1, 8, 0),
+                }
+                for i in range(start, min(start + 5000, rows))
+            ])
+    engine.dispose()
+
+
+def run_legacy(db, include_raw_content: bool) -> int:
+    from openpyxl import Workbook
+
+    from app.services.report_export import _cell, export_columns
+
+    columns = export_columns(include_raw_content)
+    reports = db.query(Report).filter(Report.exam_id == EXAM_ID).order_by(Report.id).all()
+    wb = Workbook()
+    ws = wb.active
+    ws.append([header for header, _ in columns])
+    for report in reports:
+        ws.append([_cell(getattr(report, column.key)) for _, column in columns])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return len(buf.getvalue())
+
+
+def run_stream(db, include_raw_content: bool) -> int:
+    from app.services.report_export import build_export, iter_file
+
+    spool, size = build_export(db, EXAM_ID, include_raw_content)
+    with spool:
+        # Đọc hết như khi gửi cho client
+        for _ in iter_file(spool):
+            pass
+    return size
+
+
+def run_mode(mode: str, db_path: str) -> dict:
+    engine = create_engine(f"sqlite:///{db_path}")
+    db = sessionmaker(bind=engine)()
+    include_raw_content = mode.endswith("_raw")
+    started = time.perf_counter()
+    if mode.startswith("legacy"):
+        size = run_legacy(db, include_raw_content)
+    else:
+        size = run_stream(db, include_raw_content)
+    elapsed = time.perf_counter() - started
+    db.close()
+    return {
+        "mode": mode,
+        "total_s": round(elapsed, 2),
+        "size_mb": round(size / 1024 / 1024, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+@click.command()
+@click.option("--rows", default=50000, type=int, help="Số báo cáo trong kỳ thi.")
+@click.option("--raw-chars", default=3000, type=int, help="Độ dài nội dung thô mỗi báo cáo.")
+@click.option("--db", "db_path", default="/tmp/bench_report_export.db", help="File SQLite tạm.")
+@click.option("--modes", default=",".join(MODES), help="Danh sách cách xuất, cách nhau bởi dấu phẩy.")
+@click.option("--worker", default=None, help="(nội bộ) chạy một cách xuất trong tiến trình con.")
+def main(rows, raw_chars, db_path, modes, worker):
+    if worker:
+        print(json.dumps(run_mode(worker, db_path)))
+        return
+
+    seed(db_path, rows, raw_chars)
+    print(f"{rows} báo cáo, nội dung thô {raw_chars} ký tự")
+    try:
+        for mode in modes.split(","):
+            proc = subprocess.run(
+                [sys.executable, "-m", "scripts.bench_report_export", "--db", db_path, "--worker", mode],
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                print(f"{mode:10s} lỗi: {proc.stderr.strip().splitlines()[-1] if proc.stderr else proc.returncode}")
+                continue
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"{mode:10s} | {r['total_s']:7.2f}s | file {r['size_mb']:6.1f} MB | peak RSS {r['peak_rss_mb']:7.1f} MB")
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+
+    load_dotenv(find_dotenv())
+
+    # pylint: disable = no-value-for-parameter
+    main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Export model embedding sang ONNX rồi lượng tử hoá động int8 cho backend `onnx`.
+
+    python -m scripts.export_onnx_embedding [--model-name ...] [--output-dir ml/model/embedding_onnx]
+
+Sau khi export: đặt EMBEDDING_ENGINE=onnx (và EMBEDDING_ONNX_DIR nếu đổi thư mục).
+"""
+import os
+
+import click
+from dotenv import find_dotenv, load_dotenv
+from loguru import logger
+
+from app.core.config import settings
+from app.services.embedding_backends import ONNX_MODEL_FILE
+
+FP32_MODEL_FILE = "model.onnx"
+
+
+def export_transformer(transformer, output_dir: str, opset: int = 17) -> str:
+    """
+    Export phần transformer (trả về token embeddings) sang ONNX fp32,
+    sau đó lượng tử hoá trọng số int8. Pooling + chuẩn hoá làm ở `OnnxBackend`.
+    Trả về đường dẫn model int8.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+    os.makedirs(output_dir, exist_ok=True)
+    fp32_path = os.path.join(output_dir, FP32_MODEL_FILE)
+    int8_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    dynamic = {0: "batch", 1: "sequence"}
+    input_ids = torch.ones((2, 16), dtype=torch.long)
+    attention_mask = torch.ones((2, 16), dtype=torch.long)
+
+    transformer.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(transformer),
+            (input_ids, attention_mask),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["token_embeddings"],
+            dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic, "token_embeddings": dynamic},
+            opset_version=opset,
+            dynamo=False,
+        )
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+@click.command()
+@click.option("--model-name", default=None, help="Model SentenceTransformer (mặc định EMBEDDING_MODEL_NAME).")
+@click.option("--output-dir", default=None, help="Thư mục đích (mặc định EMBEDDING_ONNX_DIR).")
+@click.option("--opset", default=17, type=int)
+@click.option("--keep-fp32/--no-keep-fp32", default=False, help="Giữ lại file ONNX fp32 trung gian.")
+def main(model_name, output_dir, opset, keep_fp32):
+    """Export + lượng tử hoá int8 model embedding."""
+    from sentence_transformers import SentenceTransformer
+
+    model_name = model_name or settings.EMBEDDING_MODEL_NAME
+    output_dir = output_dir or settings.EMBEDDING_ONNX_DIR
+    st_model = SentenceTransformer(model_name)
+
+    int8_path = export_transformer(st_model[0].auto_model, output_dir, opset)
+    st_model.tokenizer.save_pretrained(output_dir)
+    if not keep_fp32:
+        os.remove(os.path.join(output_dir, FP32_MODEL_FILE))
+    logger.info(f"Đã export model int8 tại {int8_path} ({os.path.getsize(int8_path) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+
+    load_dotenv(find_dotenv())
+
+    # pylint: disable = no-value-for-parameter
+    main()
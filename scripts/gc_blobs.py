@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Dọn kho blob file báo cáo: xoá blob không còn ReportFile nào tham chiếu.
+
+    python -m scripts.gc_blobs [--grace-hours 24] [--recount] [--jobs-older-than-days 30] [--dry-run]
+
+Blob còn thuộc job upload (kể cả job lỗi) hoặc mới được dùng trong `--grace-hours` giờ được
+giữ lại. `--jobs-older-than-days` xoá job đã kết thúc từ trước đó để giải phóng file của chúng.
+"""
+import click
+from dotenv import find_dotenv, load_dotenv
+from loguru import logger
+
+from app.core.config import settings
+from app.db import SessionLocal
+from app.services.blob_store import BlobService
+from app.services.upload_job_service import UploadJobService
+
+
+@click.command()
+@click.option("--grace-hours", default=settings.BLOB_GC_GRACE_HOURS, type=float, help="Chỉ xoá blob không dùng trong số giờ này.")
+@click.option("--recount", is_flag=True, default=False, help="Tính lại ref_count từ report_files trước khi dọn.")
+@click.option("--jobs-older-than-days", default=None, type=int, help="Xoá job upload đã kết thúc trước số ngày này.")
+@click.option("--dry-run", is_flag=True, default=False, help="Chỉ liệt kê, không xoá.")
+def main(grace_hours, recount, jobs_older_than_days, dry_run):
+    """Xoá blob không còn tham chiếu."""
+    db = SessionLocal()
+    try:
+        if recount:
+            # Dry-run: dùng số đếm lại để liệt kê nhưng không ghi vào DB
+            fixed = BlobService.recount(db, commit=not dry_run)
+            logger.info(f"{'[dry-run] ' if dry_run else ''}Sửa ref_count của {fixed} blob")
+        if jobs_older_than_days is not None and not dry_run:
+            logger.info(f"Đã xoá {UploadJobService.purge(db, jobs_older_than_days)} job upload cũ")
+        if dry_run:
+            garbage = BlobService.garbage(db, grace_hours)
+            for blob in garbage:
+                logger.info(f"{blob.sha256} ({blob.size_bytes} byte)")
+            logger.info(f"{len(garbage)} blob sẽ bị xoá, tổng {sum(b.size_bytes for b in garbage)} byte")
+            db.rollback()
+            return
+        removed = BlobService.collect_garbage(db, grace_hours=grace_hours)
+    finally:
+        db.close()
+    logger.info(f"Đã xoá {len(removed)} blob")
+
+
+if __name__ == "__main__":
+
+    load_dotenv(find_dotenv())
+
+    # pylint: disable = no-value-for-parameter
+    main()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Chuyển file báo cáo cũ (uploads/reports/report_<mã>_<thời gian>/...) vào kho blob.
+
+    python -m scripts.migrate_report_files_to_blobs [--batch-size 200] [--keep-originals] [--dry-run]
+
+Với mỗi ReportFile chưa có content_hash: băm file, đưa vào kho (bản trùng nội dung chỉ
+giữ một), cập nhật content_hash + path_storage và tăng ref_count. Mỗi lô là một
+transaction; file gốc chỉ bị xoá sau khi lô commit, nên lô lỗi giữa chừng không để lại
+ref_count lệch hay dòng trỏ tới file đã mất. Chạy lại an toàn: dòng đã chuyển bị bỏ qua.
+Mặc định file gốc bị xoá (không giữ bản sao) để giải phóng đĩa.
+"""
+import os
+import shutil
+
+import click
+from dotenv import find_dotenv, load_dotenv
+from loguru import logger
+
+from app.db import SessionLocal
+from app.models.report_file import ReportFile
+from app.services.blob_store import BlobService, get_blob_storage
+from app.services.upload_ingest import file_digest
+
+
+def stage_copy(path: str) -> str:
+    """Bản để đưa vào kho (hard link nếu được, không chép dữ liệu); file gốc giữ nguyên."""
+    staged = f"{path}.blob.tmp"
+    if os.path.exists(staged):
+        os.remove(staged)  # Còn sót từ lần chạy lỗi trước
+    try:
+        os.link(path, staged)
+    except OSError:
+        shutil.copy2(path, staged)
+    return staged
+
+
+def remove_originals(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass  # Thư mục lô còn file khác
+
+
+def migrate_batch(db, storage, rows, keep_originals: bool, dry_run: bool, seen: dict, seen_digests: set) -> dict:
+    stats = {"migrated": 0, "missing": 0, "duplicates": 0, "bytes_freed": 0}
+    originals = []
+    for row in rows:
+        path = row.path_storage
+        digest = seen.get(path)
+        if digest is None:
+            if not os.path.isfile(path):
+                logger.warning(f"Không tìm thấy file của ReportFile #{row.id}: {path}")
+                stats["missing"] += 1
+                continue
+            digest = file_digest(path)
+            size = os.path.getsize(path)
+            if dry_run:
+                if digest in seen_digests:
+                    stats["duplicates"] += 1
+                    stats["bytes_freed"] += size
+                seen[path] = digest
+                seen_digests.add(digest)
+                stats["migrated"] += 1
+                continue
+
+            # Cùng transaction với việc trỏ lại ReportFile bên dưới
+            if BlobService.register(db, digest, size, commit=False):
+                stats["duplicates"] += 1
+                stats["bytes_freed"] += size
+            storage.put_file(stage_copy(path), digest)
+            seen[path] = digest
+            originals.append(path)
+
+        if not dry_run:
+            row.content_hash = digest
+            row.path_storage = storage.local_path(digest) or digest
+            BlobService.retain(db, digest)
+        stats["migrated"] += 1
+    if not dry_run:
+        db.commit()
+        if not keep_originals:
+            remove_originals(originals)
+    return stats
+
+
+@click.command()
+@click.option("--batch-size", default=200, type=int, help="Số ReportFile xử lý mỗi transaction.")
+@click.option("--keep-originals", is_flag=True, default=False, help="Chép vào kho thay vì chuyển file gốc.")
+@click.option("--dry-run", is_flag=True, default=False, help="Chỉ thống kê, không thay đổi gì.")
+def main(batch_size, keep_originals, dry_run):
+    """Đưa các file báo cáo chưa có content_hash vào kho blob."""
+    storage = get_blob_storage()
+    db = SessionLocal()
+    totals = {"migrated": 0, "missing": 0, "duplicates": 0, "bytes_freed": 0}
+    seen, seen_digests = {}, set()
+    last_id = 0
+    try:
+        while True:
+            rows = (
+                db.query(ReportFile)
+                .filter(ReportFile.content_hash.is_(None), ReportFile.id > last_id)
+                .order_by(ReportFile.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            last_id = rows[-1].id
+            stats = migrate_batch(db, storage, rows, keep_originals, dry_run, seen, seen_digests)
+            for key, value in stats.items():
+                totals[key] += value
+            logger.info(f"Đến ReportFile #{last_id}: {totals}")
+    finally:
+        db.close()
+
+    prefix = "[dry-run] " if dry_run else ""
+    logger.info(
+        f"{prefix}Đã chuyển {totals['migrated']} file, {totals['duplicates']} bản trùng "
+        f"(giải phóng {totals['bytes_freed']} byte), thiếu {totals['missing']} file"
+    )
+
+
+if __name__ == "__main__":
+
+    load_dotenv(find_dotenv())
+
+    # pylint: disable = no-value-for-parameter
+    main()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Dọn bảng cache trích xuất PDF (`extraction_cache`).
+
+    python -m scripts.purge_extraction_cache [--stale] [--older-than-days 90] [--yes]
+
+Không có tuỳ chọn lọc thì xoá toàn bộ cache.
+"""
+import click
+from dotenv import find_dotenv, load_dotenv
+from loguru import logger
+
+from app.db import SessionLocal
+from app.services.extraction_cache import ExtractionCache
+
+
+@click.command()
+@click.option("--stale", is_flag=True, default=False, help="Chỉ xoá mục khác phiên bản trích xuất hiện tại (model, prompt, đầu vào).")
+@click.option("--older-than-days", default=None, type=int, help="Chỉ xoá mục tạo trước số ngày này.")
+@click.option("--yes", is_flag=True, default=False, help="Không hỏi xác nhận.")
+def main(stale, older_than_days, yes):
+    """Xoá các mục cache trích xuất theo điều kiện."""
+    keep_version = None
+    if stale:
+        from app.services.gemini_service import extraction_version
+
+        keep_version = extraction_version()
+    if keep_version is None and older_than_days is None and not yes:
+        click.confirm("Xoá toàn bộ cache trích xuất?", abort=True)
+
+    db = SessionLocal()
+    try:
+        deleted = ExtractionCache.purge(db, keep_version=keep_version, older_than_days=older_than_days)
+    finally:
+        db.close()
+    logger.info(f"Đã xoá {deleted} mục cache trích xuất")
+
+
+if __name__ == "__main__":
+
+    load_dotenv(find_dotenv())
+
+    # pylint: disable = no-value-for-parameter
+    main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Dựng lại chỉ mục đạo văn xuyên kỳ thi từ bảng `reports`.
+
+    python -m scripts.rebuild_plagiarism_index [--nlist 256] [--encode-missing]
+"""
+import click
+from dotenv import find_dotenv, load_dotenv
+from loguru import logger
+
+from app.db import SessionLocal
+from app.models.report import Report
+from app.services.embedding_store import EmbeddingStore
+from app.services.plagiarism_index import get_plagiarism_index
+
+BATCH_SIZE = 500
+
+
+def encode_missing_embeddings(db):
+    """Tính embedding cho các báo cáo chưa có (hoặc đã đổi nội dung), theo từng lô."""
+    from app.services.gemini_service import GeminiService
+
+    last_id = 0
+    while True:
+        reports = (
+            db.query(Report).filter(Report.id > last_id)
+            .order_by(Report.id).limit(BATCH_SIZE).all()
+        )
+        if not reports:
+            break
+        EmbeddingStore.ensure(db, reports, GeminiService.encode_texts)
+        db.commit()
+        last_id = reports[-1].id
+        logger.info(f"Đã kiểm tra embedding tới report #{last_id}")
+
+
+@click.command()
+@click.option("--nlist", default=None, type=int, help="Số danh sách IVF (mặc định sqrt(N)).")
+@click.option("--encode-missing/--no-encode-missing", default=False,
+              help="Chạy encoder cho báo cáo chưa có embedding trước khi dựng chỉ mục.")
+def main(nlist, encode_missing):
+    """Đọc toàn bộ embedding đã lưu và ghi lại chỉ mục trên đĩa."""
+    db = SessionLocal()
+    try:
+        if encode_missing:
+            encode_missing_embeddings(db)
+        report_ids = [rid for (rid,) in db.query(Report.id).order_by(Report.id)]
+        ids, matrix = EmbeddingStore.load_matrix(db, report_ids)
+    finally:
+        db.close()
+
+    index = get_plagiarism_index()
+    index.rebuild(ids, matrix, nlist=nlist)
+    logger.info(f"Đã dựng lại chỉ mục với {len(ids)} báo cáo tại {index.path}")
+
+
+if __name__ == "__main__":
+
+    load_dotenv(find_dotenv())
+
+    # pylint: disable = no-value-for-parameter
+    main()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Chạy tiến trình embedding dùng chung (giữ model một lần cho mọi worker API).
+
+    python -m scripts.run_embedding_server [--socket-path /tmp/be_tool_embedding.sock]
+
+Các worker API cần đặt EMBEDDING_BACKEND=server và cùng EMBEDDING_SOCKET_PATH.
+"""
+import click
+from dotenv import find_dotenv, load_dotenv
+from loguru import logger
+
+from app.core.config import settings
+from app.services.embedding_server import EmbeddingServer
+from app.services.embedding_service import encode_local, load_local_model
+
+
+@click.command()
+@click.option("--socket-path", default=None, help="Đường dẫn Unix socket (mặc định EMBEDDING_SOCKET_PATH).")
+@click.option("--max-batch", default=None, type=int, help="Số văn bản tối đa mỗi lần chạy model.")
+@click.option("--max-wait-ms", default=None, type=float, help="Thời gian chờ gom batch (ms).")
+def main(socket_path, max_batch, max_wait_ms):
+    """Tải model rồi phục vụ yêu cầu encode qua Unix socket."""
+    socket_path = socket_path or settings.EMBEDDING_SOCKET_PATH
+    load_local_model()
+    server = EmbeddingServer(
+        socket_path,
+        encode_local,
+        max_batch=max_batch or settings.EMBEDDING_MAX_BATCH,
+        max_wait_ms=max_wait_ms if max_wait_ms is not None else settings.EMBEDDING_MAX_WAIT_MS,
+        max_queue=settings.EMBEDDING_MAX_QUEUE,
+    )
+    logger.info(f"Embedding server đang lắng nghe tại {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+
+    load_dotenv(find_dotenv())
+
+    # pylint: disable = no-value-for-parameter
+    main()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Chạy worker xử lý job upload báo cáo (trích xuất, lưu DB, kiểm tra đạo văn).
+
+    python -m scripts.run_upload_worker [--processes 2] [--once]
+
+Có thể chạy trên nhiều máy cùng trỏ tới một DB: job được nhận bằng lease,
+worker chết thì lease hết hạn và job được worker khác nhận lại.
+"""
+import multiprocessing
+import os
+import socket
+import threading
+import time
+
+import click
+from dotenv import find_dotenv, load_dotenv
+from loguru import logger
+
+from app.core.config import settings
+from app.db import SessionLocal, engine
+from app.services.extraction_cache import get_extraction_cache
+from app.services.pdf_rasterizer import get_rasterizer
+from app.services.upload_job_service import LeaseLost, UploadJobService
+
+
+class LeaseKeeper(threading.Thread):
+    """
+    Gia hạn lease của job trong lúc worker đang xử lý. Lease bị nhận lại thì đặt `lost`
+    để `process_job` dừng trước khi ghi thêm kết quả.
+    """
+
+    def __init__(self, job_id: int, worker_id: str, lease_seconds: int):
+        super().__init__(name=f"lease-{job_id}", daemon=True)
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+        self.lost = threading.Event()
+
+    def run(self):
+        db = SessionLocal()
+        try:
+            while not self.stopped.wait(self.lease_seconds / 3):
+                try:
+                    renewed = UploadJobService.heartbeat(db, self.job_id, self.worker_id, self.lease_seconds)
+                except Exception as e:
+                    # Lỗi DB tạm thời: lease có thể vẫn còn hạn, thử lại ở nhịp sau
+                    db.rollback()
+                    logger.warning(f"Gia hạn lease job #{self.job_id} lỗi: {e}")
+                    continue
+                if not renewed:
+                    logger.warning(f"Job #{self.job_id} không còn thuộc {self.worker_id} (lease đã bị nhận lại)")
+                    self.lost.set()
+                    return
+        finally:
+            db.close()
+
+
+def run_job(db, job, worker_id: str, lease_seconds: int):
+    from app.services.report_service import ReportService
+
+    keeper = LeaseKeeper(job.id, worker_id, lease_seconds)
+    keeper.start()
+    try:
+        logger.info(f"[{worker_id}] Bắt đầu job #{job.id} ({job.total_files} file, lần {job.attempts})")
+        raster_before = get_rasterizer().metrics()
+        result = ReportService.process_job(db, job, lease_lost=keeper.lost.is_set)
+        UploadJobService.complete(db, job.id, worker_id, result)
+        raster = get_rasterizer().metrics()
+        pages = raster["pages"] - raster_before["pages"]
+        page_ms = (raster["total_page_ms"] - raster_before["total_page_ms"]) / (pages or 1)
+        cache = get_extraction_cache().metrics()
+        logger.info(
+            f"[{worker_id}] Hoàn thành job #{job.id} (render {pages} trang, {page_ms:.0f} ms/trang; "
+            f"cache trích xuất: {cache['memory_hits'] + cache['db_hits']} hit / {cache['misses']} miss)"
+        )
+    except LeaseLost as e:
+        # Job đã thuộc worker khác: không đánh dấu lỗi, không ghi gì thêm
+        db.rollback()
+        logger.warning(f"[{worker_id}] Dừng job #{job.id}: {e}")
+    except Exception as e:
+        logger.exception(f"[{worker_id}] Job #{job.id} lỗi: {e}")
+        UploadJobService.fail(db, job.id, worker_id, str(e))
+    finally:
+        keeper.stopped.set()
+        keeper.join()
+
+
+def worker_loop(poll_interval: float, lease_seconds: int, once: bool):
+    # Tiến trình con không dùng lại kết nối DB mở từ tiến trình cha
+    engine.dispose()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    db = SessionLocal()
+    try:
+        while True:
+            job = UploadJobService.claim(db, worker_id, lease_seconds)
+            if job is None:
+                if once:
+                    return
+                time.sleep(poll_interval)
+                continue
+            run_job(db, job, worker_id, lease_seconds)
+    finally:
+        db.close()
+
+
+@click.command()
+@click.option("--processes", default=None, type=int, help="Số tiến trình worker (mặc định UPLOAD_WORKER_PROCESSES).")
+@click.option("--poll-interval", default=None, type=float, help="Giây chờ giữa hai lần hỏi job mới.")
+@click.option("--lease-seconds", default=None, type=int, help="Thời hạn lease của job (giây).")
+@click.option("--once", is_flag=True, default=False, help="Xử lý hết job đang chờ rồi thoát.")
+def main(processes, poll_interval, lease_seconds, once):
+    """Khởi chạy các tiến trình worker nhận job upload từ DB."""
+    processes = processes or settings.UPLOAD_WORKER_PROCESSES
+    poll_interval = poll_interval if poll_interval is not None else settings.UPLOAD_WORKER_POLL_INTERVAL
+    lease_seconds = lease_seconds or settings.UPLOAD_JOB_LEASE_SECONDS
+    if processes <= 1:
+        worker_loop(poll_interval, lease_seconds, once)
+        return
+
+    workers = [
+        multiprocessing.Process(target=worker_loop, args=(poll_interval, lease_seconds, once), name=f"upload-worker-{i}")
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    logger.info(f"Đã khởi chạy {processes} worker upload")
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+
+
+if __name__ == "__main__":
+
+    load_dotenv(find_dotenv())
+
+    # pylint: disable = no-value-for-parameter
+    main()
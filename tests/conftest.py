@@ -0,0 +1,19 @@
+import os
+
+# app.db tạo engine ngay khi import, cần DATABASE_URL để import được models trong test
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+# gemini_service cấu hình client Gemini ngay khi import. Test service không gọi Gemini thật
+# (các hàm trích xuất / encoder được thay trong từng test); nếu môi trường chưa cài SDK
+# thì dùng module giả tối thiểu để import được ReportService.
+os.environ.setdefault("GEMINI_API_KEY", "test")
+try:
+    import google.generativeai  # noqa: F401
+except ImportError:
+    import sys
+    import types
+
+    _genai = types.ModuleType("google.generativeai")
+    _genai.configure = lambda **kwargs: None
+    _genai.GenerativeModel = lambda name: None
+    sys.modules["google.generativeai"] = _genai
@@ -0,0 +1,216 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.models import Blob, Exam, Report, ReportFile, UploadJob, UploadJobFile
+from app.models.upload_job import UploadJobFileStatus, UploadJobStatus
+from app.services.blob_store import BlobService, LocalBlobStorage
+from app.services.upload_job_service import UploadJobService
+
+DATA = b"%PDF-1.7 bao cao"
+DIGEST = hashlib.sha256(DATA).hexdigest()
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Exam(id=1, code="EXAM001", name="Kỳ thi 1", start_time=datetime(2025, 1, 1), end_time=datetime(2025, 1, 2)))
+    session.commit()
+    yield session
+    session.close()
+
+
+def write(tmp_path, name, data=DATA):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_put_file_shards_and_deduplicates(tmp_path):
+    storage = LocalBlobStorage(str(tmp_path / "blobs"))
+
+    assert storage.put_file(write(tmp_path, "a.pdf"), DIGEST) is True
+    assert storage.put_file(write(tmp_path, "b.pdf"), DIGEST) is False
+
+    path = storage.local_path(DIGEST)
+    assert path == str(tmp_path / "blobs" / DIGEST[:2] / DIGEST[2:4] / DIGEST)
+    with storage.open(DIGEST) as f:
+        assert f.read() == DATA
+    # Bản upload lại bị bỏ, không còn file nguồn nào
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["blobs"]
+    with pytest.raises(ValueError):
+        storage.blob_path("../../etc/passwd")
+
+
+def add_report_file(db, digest):
+    report = Report(name="A", student_code="PH12345", exam_id=1)
+    db.add(report)
+    db.flush()
+    db.add(ReportFile(name_file="a.pdf", path_storage="x", content_hash=digest, report_id=report.id))
+    BlobService.retain(db, digest)
+    db.commit()
+    return report
+
+
+def test_register_detects_reupload(db):
+    assert BlobService.register(db, DIGEST, len(DATA)) is False
+    assert BlobService.register(db, DIGEST, len(DATA)) is True
+    assert db.query(Blob).count() == 1
+
+
+def test_gc_removes_only_unreferenced_blobs(db, tmp_path):
+    storage = LocalBlobStorage(str(tmp_path / "blobs"))
+    storage.put_file(write(tmp_path, "a.pdf"), DIGEST)
+    BlobService.register(db, DIGEST, len(DATA))
+    report = add_report_file(db, DIGEST)
+
+    assert BlobService.collect_garbage(db, storage, grace_hours=0) == []
+
+    BlobService.release(db, DIGEST)
+    db.delete(report)
+    db.commit()
+    # Vẫn trong thời gian chờ: chưa xoá
+    assert BlobService.collect_garbage(db, storage, grace_hours=1) == []
+
+    db.query(Blob).update({"last_used_at": datetime.utcnow() - timedelta(hours=2)})
+    db.commit()
+    assert BlobService.collect_garbage(db, storage, grace_hours=1) == [DIGEST]
+    assert not storage.exists(DIGEST)
+    assert db.query(Blob).count() == 0
+
+
+@pytest.mark.parametrize("status", [UploadJobFileStatus.pending, UploadJobFileStatus.failed])
+def test_gc_keeps_blobs_of_upload_jobs(db, tmp_path, status):
+    storage = LocalBlobStorage(str(tmp_path / "blobs"))
+    storage.put_file(write(tmp_path, "a.pdf"), DIGEST)
+    BlobService.register(db, DIGEST, len(DATA))
+    job = UploadJob(exam_id=1, folder_path="x", status=UploadJobStatus.failed)
+    job.files.append(UploadJobFile(name_file="a.pdf", path_storage="x", content_hash=DIGEST, status=status))
+    db.add(job)
+    db.commit()
+
+    # Job lỗi vẫn chạy lại / tải ZIP được: file của nó không bị dọn
+    assert BlobService.collect_garbage(db, storage, grace_hours=0) == []
+    assert storage.exists(DIGEST)
+
+
+def test_purged_jobs_release_their_blobs(db, tmp_path):
+    storage = LocalBlobStorage(str(tmp_path / "blobs"))
+    storage.put_file(write(tmp_path, "a.pdf"), DIGEST)
+    BlobService.register(db, DIGEST, len(DATA))
+    long_ago = datetime.utcnow() - timedelta(days=40)
+    for status, finished_at in [(UploadJobStatus.failed, long_ago), (UploadJobStatus.failed, datetime.utcnow()),
+                                (UploadJobStatus.running, None)]:
+        job = UploadJob(exam_id=1, folder_path="x", status=status, finished_at=finished_at)
+        job.files.append(UploadJobFile(name_file="a.pdf", path_storage="x", content_hash=DIGEST))
+        db.add(job)
+    db.commit()
+
+    assert UploadJobService.purge(db, older_than_days=30) == 1
+    assert db.query(UploadJob).count() == 2 and db.query(UploadJobFile).count() == 2
+    assert BlobService.collect_garbage(db, storage, grace_hours=0) == []
+
+    db.query(UploadJob).update({"status": UploadJobStatus.done, "finished_at": long_ago})
+    db.commit()
+    assert UploadJobService.purge(db, older_than_days=30) == 2
+    assert BlobService.collect_garbage(db, storage, grace_hours=0) == [DIGEST]
+    assert not storage.exists(DIGEST)
+
+
+def test_recount_fixes_drift(db):
+    BlobService.register(db, DIGEST, len(DATA))
+    add_report_file(db, DIGEST)
+    add_report_file(db, DIGEST)
+    db.query(Blob).update({"ref_count": 7})
+    db.commit()
+
+    assert BlobService.recount(db) == 1
+    assert db.query(Blob).one().ref_count == 2
+
+
+def test_register_without_commit_joins_callers_transaction(db):
+    BlobService.register(db, DIGEST, len(DATA), commit=False)
+    db.rollback()
+    assert db.query(Blob).count() == 0
+
+    other = hashlib.sha256(b"khac").hexdigest()
+    BlobService.register(db, DIGEST, len(DATA), commit=False)
+    # Trùng khoá chỉ huỷ savepoint của dòng đó, blob kia vẫn còn trong transaction
+    db.add(Blob(sha256=other, size_bytes=4, ref_count=0, last_used_at=datetime.utcnow()))
+    db.flush()
+    assert BlobService.register(db, other, 4, commit=False) is True
+    db.commit()
+    assert db.query(Blob).count() == 2
+
+
+class FailingDeleteStorage(LocalBlobStorage):
+    def delete(self, digest):
+        raise OSError("đĩa chỉ đọc")
+
+
+def test_gc_keeps_row_when_file_cannot_be_deleted(db, tmp_path):
+    storage = FailingDeleteStorage(str(tmp_path / "blobs"))
+    storage.put_file(write(tmp_path, "a.pdf"), DIGEST)
+    BlobService.register(db, DIGEST, len(DATA))
+
+    # File bị xoá trước khi commit DELETE: lỗi xoá file thì dòng blob vẫn còn
+    assert BlobService.collect_garbage(db, storage, grace_hours=0) == []
+    assert db.query(Blob).count() == 1
+    assert storage.exists(DIGEST)
+
+
+def test_recount_without_commit_can_be_rolled_back(db):
+    BlobService.register(db, DIGEST, len(DATA))
+    db.query(Blob).update({"ref_count": 7})
+    db.commit()
+
+    assert BlobService.recount(db, commit=False) == 1
+    db.rollback()
+    assert db.query(Blob).one().ref_count == 7
+
+
+def test_migrate_batch_failure_leaves_files_and_counts_untouched(db, tmp_path, monkeypatch):
+    from scripts.migrate_report_files_to_blobs import migrate_batch
+
+    storage = LocalBlobStorage(str(tmp_path / "blobs"))
+    paths = [write(tmp_path, "a.pdf"), write(tmp_path, "b.pdf", b"%PDF-1.7 khac")]
+    for path in paths:
+        report = Report(name="A", student_code="PH12345", exam_id=1)
+        db.add(report)
+        db.flush()
+        db.add(ReportFile(name_file="a.pdf", path_storage=path, report_id=report.id))
+    db.commit()
+    rows = db.query(ReportFile).order_by(ReportFile.id).all()
+
+    put_file = storage.put_file
+    calls = []
+
+    def put_file_failing_second(src, digest):
+        calls.append(src)
+        if len(calls) == 2:
+            raise OSError("hết dung lượng")
+        return put_file(src, digest)
+
+    monkeypatch.setattr(storage, "put_file", put_file_failing_second)
+    with pytest.raises(OSError):
+        migrate_batch(db, storage, rows, False, False, {}, set())
+    db.rollback()
+
+    assert db.query(Blob).count() == 0
+    assert all(os.path.isfile(path) for path in paths)
+    assert [r.content_hash for r in db.query(ReportFile)] == [None, None]
+
+    monkeypatch.setattr(storage, "put_file", put_file)
+    stats = migrate_batch(db, storage, db.query(ReportFile).order_by(ReportFile.id).all(), False, False, {}, set())
+
+    assert stats["migrated"] == 2
+    assert not any(os.path.exists(path) for path in paths)
+    assert [b.ref_count for b in db.query(Blob)] == [1, 1]
+    assert all(storage.exists(r.content_hash) for r in db.query(ReportFile))
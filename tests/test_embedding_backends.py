@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.embedding_backends import ONNX_MODEL_FILE, l2_normalize, mean_pooling
+
+PARITY_TOLERANCE = 0.02
+SENTENCES = [
+    "Tuần một em tìm hiểu quy trình phát triển phần mềm và cài đặt môi trường.",
+    "Trong tuần đầu tiên, em nghiên cứu quy trình làm phần mềm và thiết lập môi trường.",
+    "Em tham gia kiểm thử tự động giao diện quản trị bằng Selenium.",
+    "Công ty tổ chức buổi họp tổng kết dự án vào cuối tháng.",
+]
+
+
+def test_mean_pooling_ignores_padding():
+    tokens = np.array([[[1.0, 0.0], [3.0, 0.0], [100.0, 100.0]]])
+    mask = np.array([[1, 1, 0]])
+
+    assert mean_pooling(tokens, mask).tolist() == [[2.0, 0.0]]
+
+
+def test_exported_int8_model_matches_fp32_transformer(tmp_path):
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("onnxruntime")
+    import onnxruntime as ort
+    from transformers import XLMRobertaConfig, XLMRobertaModel
+
+    from scripts.export_onnx_embedding import export_transformer
+
+    torch.manual_seed(0)
+    config = XLMRobertaConfig(
+        vocab_size=500, hidden_size=64, num_hidden_layers=2,
+        num_attention_heads=4, intermediate_size=128, max_position_embeddings=80,
+    )
+    model = XLMRobertaModel(config).eval()
+    path = export_transformer(model, str(tmp_path))
+
+    ids = np.random.default_rng(0).integers(5, 500, size=(3, 20))
+    mask = np.ones_like(ids)
+    mask[0, 12:] = 0
+    session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+    onnx_out = session.run(None, {"input_ids": ids, "attention_mask": mask})[0]
+    with torch.no_grad():
+        torch_out = model(input_ids=torch.tensor(ids), attention_mask=torch.tensor(mask))[0].numpy()
+
+    a = l2_normalize(mean_pooling(onnx_out, mask))
+    b = l2_normalize(mean_pooling(torch_out, mask))
+    assert np.all((a * b).sum(axis=1) > 0.95)
+
+
+@pytest.mark.skipif(
+    not os.path.exists(os.path.join(settings.EMBEDDING_ONNX_DIR, ONNX_MODEL_FILE)),
+    reason="Chưa export model ONNX (scripts/export_onnx_embedding.py)",
+)
+def test_onnx_cosine_scores_within_tolerance_of_torch():
+    from app.services.embedding_backends import OnnxBackend, TorchBackend
+
+    try:
+        torch_backend = TorchBackend(settings.EMBEDDING_MODEL_NAME)
+    except OSError:
+        pytest.skip("Không tải được model SentenceTransformer")
+    onnx_backend = OnnxBackend(settings.EMBEDDING_ONNX_DIR)
+
+    ref = torch_backend.encode(SENTENCES)
+    got = onnx_backend.encode(SENTENCES)
+
+    assert np.abs(got @ got.T - ref @ ref.T).max() < PARITY_TOLERANCE
@@ -0,0 +1,66 @@
+import threading
+
+import numpy as np
+
+from app.services.embedding_batcher import MicroBatcher
+
+
+def test_concurrent_callers_get_their_own_rows_from_one_batch():
+    calls = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[len(t)] for t in texts], dtype=np.float32)
+
+    batcher = MicroBatcher(encode, max_batch=100, max_wait_ms=200)
+    results = {}
+
+    def worker(i):
+        results[i] = batcher.encode_sync(["x" * i, "y" * (10 * i)])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(1, 5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) < 4
+    assert all(results[i][:, 0].tolist() == [i, 10 * i] for i in range(1, 5))
+    metrics = batcher.metrics()
+    assert metrics["requests"] == 4
+    assert metrics["texts"] == 8
+    assert metrics["max_batch_size"] >= 4
+
+
+def test_batch_is_cut_at_max_batch():
+    sizes = []
+    gate = threading.Event()
+
+    def encode(texts):
+        gate.wait(1)
+        sizes.append(len(texts))
+        return np.zeros((len(texts), 1), dtype=np.float32)
+
+    batcher = MicroBatcher(encode, max_batch=2, max_wait_ms=50)
+    futures = [batcher.submit(["a"]) for _ in range(5)]
+    gate.set()
+    for f in futures:
+        f.result(timeout=5)
+
+    assert max(sizes) <= 2
+    assert sum(sizes) == 5
+
+
+def test_encode_error_is_raised_to_every_caller():
+    def encode(texts):
+        raise ValueError("model down")
+
+    batcher = MicroBatcher(encode, max_wait_ms=1)
+    future = batcher.submit(["a"])
+
+    try:
+        future.result(timeout=5)
+    except ValueError as e:
+        assert "model down" in str(e)
+    else:
+        raise AssertionError("expected ValueError")
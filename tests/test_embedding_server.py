@@ -0,0 +1,54 @@
+import threading
+
+import numpy as np
+
+from app.services.embedding_server import EmbeddingServer
+from app.services.embedding_service import EmbeddingClient
+
+
+def fake_encode(calls):
+    def encode(texts):
+        calls.append(len(texts))
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+    return encode
+
+
+def test_client_receives_its_own_rows(tmp_path):
+    calls = []
+    path = str(tmp_path / "emb.sock")
+    server = EmbeddingServer(path, fake_encode(calls), max_wait_ms=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        vectors = EmbeddingClient(path).encode(["a", "bbb"])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert vectors.shape == (2, 2)
+    assert vectors[:, 0].tolist() == [1.0, 3.0]
+
+
+def test_concurrent_requests_share_one_forward_pass(tmp_path):
+    calls = []
+    path = str(tmp_path / "emb.sock")
+    server = EmbeddingServer(path, fake_encode(calls), max_batch=100, max_wait_ms=200)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    results = {}
+
+    def worker(i):
+        results[i] = EmbeddingClient(path).encode(["x" * i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(1, 6)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert sum(calls) == 5
+    assert len(calls) < 5
+    assert all(results[i][0, 0] == i for i in range(1, 6))
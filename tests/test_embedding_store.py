@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.models import Exam, Report, ReportEmbedding
+from app.core.config import settings
+from app.services.embedding_store import EmbeddingStore, STORAGE_DTYPE, model_tag
+
+CONTENT = "Tuần 1: tìm hiểu hệ thống, cài đặt môi trường phát triển và đọc tài liệu."
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Exam(id=1, code="EXAM001", name="Kỳ thi 1", start_time=datetime(2025, 1, 1), end_time=datetime(2025, 1, 2)))
+    session.commit()
+    yield session
+    session.close()
+
+
+def add_report(db, content):
+    report = Report(name="A", student_code="PH00001", raw_content=content, exam_id=1)
+    db.add(report)
+    db.flush()
+    return report
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t), 1.0, 0.5] for t in texts], dtype=np.float32)
+
+
+def test_ensure_encodes_once_and_reuses_stored_vector(db):
+    report = add_report(db, CONTENT)
+    encode = CountingEncoder()
+
+    first = EmbeddingStore.ensure(db, [report], encode)
+    second = EmbeddingStore.ensure(db, [report], encode)
+
+    assert len(encode.calls) == 1
+    assert np.allclose(first[report.id], second[report.id])
+    row = db.get(ReportEmbedding, report.id)
+    assert len(row.vector) == 3 * STORAGE_DTYPE.itemsize
+
+
+def test_ensure_reencodes_when_content_changes(db):
+    report = add_report(db, CONTENT)
+    encode = CountingEncoder()
+    EmbeddingStore.ensure(db, [report], encode)
+
+    report.raw_content = CONTENT + " Tuần 2: viết API."
+    EmbeddingStore.ensure(db, [report], encode)
+
+    assert len(encode.calls) == 2
+
+
+def test_switching_engine_reencodes(db, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_ENGINE", "torch")
+    report = add_report(db, CONTENT)
+    encode = CountingEncoder()
+    EmbeddingStore.ensure(db, [report], encode)
+    torch_tag = model_tag()
+
+    # Vector int8 của ONNX lệch so với fp32: không dùng lại embedding của engine cũ
+    monkeypatch.setattr(settings, "EMBEDDING_ENGINE", "onnx")
+    EmbeddingStore.ensure(db, [report], encode)
+
+    assert len(encode.calls) == 2
+    assert "torch-fp32" in torch_tag
+    assert db.get(ReportEmbedding, report.id).model_name == model_tag() != torch_tag
+    assert "onnx-int8" in model_tag()
+
+
+def test_load_matrix_reads_float16_rows(db):
+    reports = [add_report(db, CONTENT + str(i)) for i in range(3)]
+    EmbeddingStore.ensure(db, reports, CountingEncoder())
+
+    ids, matrix = EmbeddingStore.load_matrix(db, [r.id for r in reports])
+
+    assert ids == sorted(r.id for r in reports)
+    assert matrix.shape == (3, 3)
+    assert matrix.dtype == STORAGE_DTYPE
@@ -0,0 +1,162 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db import Base
+from app.models import ExtractionCacheEntry
+from app.services.extraction_cache import ExtractionCache, pdf_digest
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+class FakeExtractor:
+    def __init__(self, ok=True):
+        self.calls = 0
+        self.ok = ok
+
+    def __call__(self, pdf_bytes):
+        self.calls += 1
+        return {"Họ và tên": pdf_bytes.decode(), "MSSV": "PH12345"}, self.ok
+
+
+def test_second_extraction_is_served_from_memory(session_factory):
+    cache = ExtractionCache(max_items=4, session_factory=session_factory)
+    extract = FakeExtractor()
+
+    first = cache.get_or_extract(b"a.pdf", "v1", extract)
+    first["MSSV"] = "sửa bởi người gọi"
+    second = cache.get_or_extract(b"a.pdf", "v1", extract)
+
+    assert extract.calls == 1
+    assert second == {"Họ và tên": "a.pdf", "MSSV": "PH12345"}
+    assert cache.metrics()["memory_hits"] == 1
+    assert cache.metrics()["misses"] == 1
+
+
+def test_file_extraction_uses_upload_digest(session_factory, tmp_path):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(b"a.pdf")
+    cache = ExtractionCache(session_factory=session_factory)
+    extract = FakeExtractor()
+
+    assert cache.get_or_extract_file(str(path), "v1", extract)["Họ và tên"] == "a.pdf"
+    # Trúng cache theo digest tính lúc upload: không cần đọc file (đã bị xoá)
+    path.unlink()
+    assert cache.get_or_extract_file(str(path), "v1", extract, digest=pdf_digest(b"a.pdf"))["MSSV"] == "PH12345"
+    assert extract.calls == 1
+
+
+def test_db_tier_survives_memory_eviction(session_factory):
+    cache = ExtractionCache(max_items=1, session_factory=session_factory)
+    extract = FakeExtractor()
+    cache.get_or_extract(b"a.pdf", "v1", extract)
+    cache.get_or_extract(b"b.pdf", "v1", extract)
+
+    # a.pdf đã bị đẩy khỏi LRU nhưng vẫn còn trong DB (như một worker khác)
+    assert cache.get_or_extract(b"a.pdf", "v1", extract)["Họ và tên"] == "a.pdf"
+    assert extract.calls == 2
+    assert cache.metrics()["db_hits"] == 1
+    assert cache.metrics()["memory_items"] == 1
+
+
+def test_new_prompt_version_misses(session_factory):
+    cache = ExtractionCache(session_factory=session_factory)
+    extract = FakeExtractor()
+    cache.get_or_extract(b"a.pdf", "v1", extract)
+
+    cache.get_or_extract(b"a.pdf", "v2", extract)
+
+    assert extract.calls == 2
+
+
+def test_failed_extraction_is_not_cached(session_factory):
+    cache = ExtractionCache(session_factory=session_factory)
+    extract = FakeExtractor(ok=False)
+
+    cache.get_or_extract(b"a.pdf", "v1", extract)
+    cache.get_or_extract(b"a.pdf", "v1", extract)
+
+    assert extract.calls == 2
+    assert session_factory().query(ExtractionCacheEntry).count() == 0
+
+
+def test_purge_filters(session_factory):
+    db = session_factory()
+    old = datetime.utcnow() - timedelta(days=100)
+    db.add_all([
+        ExtractionCacheEntry(pdf_sha256=pdf_digest(b"a"), prompt_version="v1", data="{}", created_at=old),
+        ExtractionCacheEntry(pdf_sha256=pdf_digest(b"b"), prompt_version="v2", data="{}", created_at=old),
+        ExtractionCacheEntry(pdf_sha256=pdf_digest(b"c"), prompt_version="v2", data="{}"),
+    ])
+    db.commit()
+
+    assert ExtractionCache.purge(db, keep_version="v2") == 1
+    assert ExtractionCache.purge(db, older_than_days=30) == 1
+    assert [r.pdf_sha256 for r in db.query(ExtractionCacheEntry)] == [pdf_digest(b"c")]
+    assert ExtractionCache.purge(db) == 1
+
+
+def test_input_settings_change_the_extraction_version(session_factory, monkeypatch):
+    from app.core.config import settings
+    from app.services import gemini_service
+    from app.services.gemini_service import GeminiService, extraction_version
+
+    cache = ExtractionCache(session_factory=session_factory)
+    extract = FakeExtractor()
+    monkeypatch.setattr(gemini_service, "get_extraction_cache", lambda: cache)
+    monkeypatch.setattr(GeminiService, "_extract_uncached", staticmethod(extract))
+    monkeypatch.setattr(settings, "EXTRACTION_CACHE_ENABLED", True)
+
+    versions = set()
+    for mode, text_first in [("pdf", True), ("pdf", True), ("pages", True), ("pages", False)]:
+        monkeypatch.setattr(settings, "GEMINI_INPUT_MODE", mode)
+        monkeypatch.setattr(settings, "TEXT_LAYER_FIRST", text_first)
+        GeminiService.extract_info_from_pdf(b"a.pdf")
+        versions.add(extraction_version())
+
+    monkeypatch.setattr(settings, "PDF_RENDER_DPI_TIERS", [200, 300])
+    GeminiService.extract_info_from_pdf(b"a.pdf")
+    versions.add(extraction_version())
+
+    # Kết quả gửi nguyên PDF không được dùng lại khi chuyển sang gửi ảnh trang (và ngược lại),
+    # kết quả render ở bậc DPI cũ không được dùng lại khi đổi PDF_RENDER_DPI_TIERS
+    assert extract.calls == 4
+    assert len(versions) == 4
+    assert all(v.startswith(f"{gemini_service.GEMINI_MODEL_NAME}:{gemini_service.PROMPT_VERSION}:") for v in versions)
+
+
+@pytest.mark.parametrize("reply", ["Xin lỗi, tôi không thể đọc tài liệu này.", '```json\n{"Họ và tên": "", "MSSV": ""}\n```'])
+def test_empty_gemini_reply_is_not_cached(session_factory, monkeypatch, reply):
+    from types import SimpleNamespace
+
+    from app.core.config import settings
+    from app.services import gemini_service
+    from app.services.gemini_input import PreparedInput
+    from app.services.gemini_service import GeminiService
+
+    calls = []
+    fake_model = SimpleNamespace(generate_content=lambda contents: calls.append(contents) or SimpleNamespace(text=reply))
+    prepared = PreparedInput({0: "Sinh viên thực tập - MSSV: PH12345"}, {}, ["văn bản"], 150)
+    cache = ExtractionCache(session_factory=session_factory)
+    monkeypatch.setattr(gemini_service, "model", fake_model)
+    monkeypatch.setattr(gemini_service, "get_extraction_cache", lambda: cache)
+    monkeypatch.setattr(GeminiService, "_extract_uncached",
+                        staticmethod(lambda pdf_bytes: GeminiService._extract_once(pdf_bytes, prepared)))
+    monkeypatch.setattr(settings, "EXTRACTION_CACHE_ENABLED", True)
+
+    first = GeminiService.extract_info_from_pdf(b"a.pdf")
+    GeminiService.extract_info_from_pdf(b"a.pdf")
+
+    assert first["Họ và tên"] == "" and first["MSSV"] == "PH12345"
+    # Lần upload sau vẫn gọi Gemini, không nhận lại kết quả rỗng
+    assert len(calls) == 2
+    assert cache.metrics()["stores"] == 0
+    assert session_factory().query(ExtractionCacheEntry).count() == 0
@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from app.services.extraction_pool import map_ordered
+
+
+class SlowCall:
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, item):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            # Phần tử đầu chậm nhất để kết quả hoàn thành ngược thứ tự
+            time.sleep(0.05 / (item + 1))
+            if item == 3:
+                raise ValueError("hỏng")
+            return item * 10
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_results_keep_input_order_and_errors_per_item(concurrency):
+    call = SlowCall()
+    done = []
+
+    results = map_ordered(call, range(6), concurrency, on_done=lambda i, _: done.append(i))
+
+    assert results[:3] == [0, 10, 20]
+    assert isinstance(results[3], ValueError)
+    assert results[4:] == [40, 50]
+    assert sorted(done) == list(range(6))
+    assert call.max_active <= concurrency
+
+
+def test_runs_concurrently():
+    call = SlowCall()
+
+    map_ordered(call, range(6), 3)
+
+    assert call.max_active == 3
+
+
+def test_error_in_on_done_cancels_remaining_items():
+    started = []
+
+    def work(item):
+        started.append(item)
+        time.sleep(0.02)
+        return item
+
+    def stop(index, result):
+        raise RuntimeError("mất lease")
+
+    with pytest.raises(RuntimeError):
+        map_ordered(work, range(20), concurrency=2, on_done=stop)
+
+    # Chỉ các phần tử đang chạy khi dừng được chạy tiếp, phần còn lại bị huỷ
+    assert len(started) < 20
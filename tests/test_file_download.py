@@ -0,0 +1,76 @@
+import hashlib
+from typing import Optional
+
+from fastapi import FastAPI, Header
+from fastapi.testclient import TestClient
+
+from app.services.blob_store import LocalBlobStorage
+from app.services.file_download import IMMUTABLE_CACHE_CONTROL, blob_response, etag_matches, strong_etag
+
+DATA = bytes(range(256)) * 40
+DIGEST = hashlib.sha256(DATA).hexdigest()
+
+
+class CountingStorage(LocalBlobStorage):
+    def __init__(self, root):
+        super().__init__(root)
+        self.lookups = 0
+
+    def local_path(self, digest):
+        self.lookups += 1
+        return super().local_path(digest)
+
+
+def make_client(tmp_path):
+    storage = CountingStorage(str(tmp_path / "blobs"))
+    src = tmp_path / "a.pdf"
+    src.write_bytes(DATA)
+    storage.put_file(str(src), DIGEST)
+
+    app = FastAPI()
+
+    @app.get("/files/{digest}")
+    def download(digest: str, if_none_match: Optional[str] = Header(None)):
+        return blob_response(storage, digest, "", "bao cáo.pdf", if_none_match)
+
+    return TestClient(app), storage
+
+
+def test_etag_matches():
+    etag = strong_etag(DIGEST)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"khac", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"khac"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_full_download_has_strong_etag_and_long_cache(tmp_path):
+    client, _ = make_client(tmp_path)
+    resp = client.get(f"/files/{DIGEST}")
+
+    assert resp.status_code == 200
+    assert resp.content == DATA
+    assert resp.headers["etag"] == f'"{DIGEST}"'
+    assert resp.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert resp.headers["accept-ranges"] == "bytes"
+    assert resp.headers["content-disposition"].startswith("inline;")
+
+
+def test_range_request(tmp_path):
+    client, _ = make_client(tmp_path)
+    resp = client.get(f"/files/{DIGEST}", headers={"Range": "bytes=100-199"})
+
+    assert resp.status_code == 206
+    assert resp.content == DATA[100:200]
+    assert resp.headers["content-range"] == f"bytes 100-199/{len(DATA)}"
+
+
+def test_if_none_match_returns_304_without_touching_storage(tmp_path):
+    client, storage = make_client(tmp_path)
+    resp = client.get(f"/files/{DIGEST}", headers={"If-None-Match": f'"{DIGEST}"'})
+
+    assert resp.status_code == 304
+    assert resp.content == b""
+    assert resp.headers["etag"] == f'"{DIGEST}"'
+    assert storage.lookups == 0
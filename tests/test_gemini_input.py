@@ -0,0 +1,100 @@
+import pymupdf
+import pytest
+
+from app.services.gemini_input import (
+    PDF_MIME_TYPE, RENDER_DPI_KEY, extract_with_dpi_tiers, first_page_image, prepare_input,
+)
+
+LINE = "Tuan 1: tim hieu he thong, cai dat moi truong phat trien va doc tai lieu du an."
+
+
+def make_pdf(scanned_pages=()):
+    doc = pymupdf.open()
+    for i in range(3):
+        page = doc.new_page(width=300, height=200)
+        if i in scanned_pages:
+            pix = pymupdf.Pixmap(pymupdf.csRGB, pymupdf.IRect(0, 0, 30, 20), False)
+            pix.clear_with(180)
+            page.insert_image(page.rect, pixmap=pix)
+        else:
+            for line in range(4):
+                page.insert_text((10, 30 + line * 15), LINE[:60], fontsize=8)
+    return doc.tobytes()
+
+
+def test_digital_pdf_is_sent_as_text_only():
+    prepared = prepare_input(make_pdf(), mode="pdf", text_first=True)
+
+    assert prepared.images == {}
+    assert len(prepared.parts) == 1
+    assert prepared.parts[0].startswith("--- Trang 1 ---")
+
+
+def test_scanned_pdf_is_sent_as_single_pdf_part():
+    pdf_bytes = make_pdf(scanned_pages={1})
+
+    prepared = prepare_input(pdf_bytes, mode="pdf", text_first=True, max_pdf_bytes=len(pdf_bytes))
+
+    assert prepared.parts == [{"mime_type": PDF_MIME_TYPE, "data": pdf_bytes}]
+    assert sorted(prepared.text_pages) == [0, 2]
+
+
+@pytest.mark.parametrize("mode", ["pdf", "pages"])
+def test_large_or_pages_mode_falls_back_to_rendering_scanned_pages(mode):
+    pdf_bytes = make_pdf(scanned_pages={1})
+
+    prepared = prepare_input(pdf_bytes, mode=mode, text_first=True, max_pdf_bytes=len(pdf_bytes) - 1)
+
+    assert list(prepared.images) == [1]
+    assert isinstance(prepared.parts[0], str)
+    assert [p["mime_type"] for p in prepared.parts[1:]] == ["image/png"]
+
+
+def test_first_page_image_renders_on_demand():
+    pdf_bytes = make_pdf(scanned_pages={0})
+    prepared = prepare_input(pdf_bytes, mode="pdf", text_first=True)
+
+    assert prepared.images == {}
+    assert first_page_image(pdf_bytes, prepared).startswith(b"\x89PNG")
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        prepare_input(make_pdf(), mode="images")
+
+
+class TierExtractor:
+    """Trả kết quả hợp lệ chỉ khi ảnh được render từ `good_dpi` trở lên."""
+
+    def __init__(self, good_dpi):
+        self.good_dpi = good_dpi
+        self.calls = []
+
+    def __call__(self, pdf_bytes, prepared):
+        self.calls.append((prepared.dpi, sorted(prepared.images)))
+        return {"MSSV": "PH12345" if prepared.dpi >= self.good_dpi else ""}, True
+
+
+def is_complete(data):
+    return bool(data["MSSV"])
+
+
+def test_dpi_escalates_only_until_result_is_complete():
+    pdf_bytes = make_pdf(scanned_pages={1})
+    extract = TierExtractor(good_dpi=100)
+
+    data, ok = extract_with_dpi_tiers(pdf_bytes, extract, is_complete, tiers=[50, 100, 200], mode="pages", text_first=True)
+
+    assert ok
+    assert data[RENDER_DPI_KEY] == 100
+    # Chỉ trang scan được render lại
+    assert extract.calls == [(50, [1]), (100, [1])]
+
+
+def test_dpi_tier_is_none_without_rendering():
+    extract = TierExtractor(good_dpi=1000)
+
+    data, _ = extract_with_dpi_tiers(make_pdf(), extract, is_complete, tiers=[50, 100], mode="pages", text_first=True)
+
+    assert data[RENDER_DPI_KEY] is None
+    assert len(extract.calls) == 1
@@ -0,0 +1,33 @@
+import numpy as np
+
+from app.services.minhash_lsh import MinHashLSH, normalize_text, shingles
+
+
+def test_normalize_text_keeps_vietnamese_letters():
+    assert normalize_text("  Báo CÁO, thực-tập!! ") == "báo cáo thực tập"
+
+
+def test_jaccard_estimate_close_to_exact():
+    words_a = [f"từ{i}" for i in range(200)]
+    words_b = words_a[:150] + [f"khác{i}" for i in range(50)]
+    text_a, text_b = " ".join(words_a), " ".join(words_b)
+    sa, sb = set(shingles(text_a, 1)), set(shingles(text_b, 1))
+    exact = len(sa & sb) / len(sa | sb)
+
+    lsh = MinHashLSH(num_perm=256, bands=64, shingle_size=1)
+    estimate = MinHashLSH.jaccard(lsh.signature(text_a), lsh.signature(text_b))
+
+    assert abs(estimate - exact) < 0.1
+
+
+def test_candidate_pairs_only_for_overlapping_documents():
+    rng = np.random.default_rng(0)
+    docs = [" ".join(f"w{x}" for x in rng.integers(0, 100000, size=300)) for _ in range(20)]
+    docs.append(docs[4] + " thêm một câu kết")
+    lsh = MinHashLSH()
+
+    candidates = lsh.candidate_pairs(lsh.signatures(docs))
+
+    assert (4, 20) in candidates
+    assert candidates[(4, 20)] > 0.9
+    assert len(candidates) < 5
@@ -0,0 +1,72 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from app.services.mssv_ocr import FULL_PAGE_CONFIG, ROI_CONFIG, find_mssv, identity_region, ocr_mssv
+
+PAGE_SIZE = (1240, 1754)  # A4 ở 150 DPI
+
+
+def make_page():
+    """Trang trắng với các "dòng chữ" là vạch đen: 4 dòng đầu trang, 10 dòng phần thân."""
+    page = np.full((PAGE_SIZE[1], PAGE_SIZE[0]), 255, dtype=np.uint8)
+    for i in range(4):
+        top = 120 + i * 50
+        page[top:top + 20, 150:900] = 0
+    for i in range(10):
+        top = 900 + i * 60
+        page[top:top + 20, 100:1140] = 0
+    return page
+
+
+def test_identity_region_covers_header_lines():
+    left, top, right, bottom = identity_region(make_page(), max_lines=4)
+
+    assert top <= 120 and bottom >= 120 + 3 * 50 + 20
+    assert bottom < 900
+    assert left <= 150 and right >= 900 and right < PAGE_SIZE[0]
+
+
+def test_identity_region_blank_page_falls_back_to_top_band():
+    blank = np.full((1000, 800), 255, dtype=np.uint8)
+    assert identity_region(blank, header_fraction=0.4) == (0, 0, 800, 400)
+
+
+def test_find_mssv_roi_allows_glued_prefix():
+    assert find_mssv("MSSV:PH12345", roi=True) == "PH12345"
+    assert find_mssv("PH1234567", roi=True) is None
+    assert find_mssv("Mã SV: ph12345") == "PH12345"
+
+
+def page_bytes():
+    buf = io.BytesIO()
+    Image.fromarray(make_page()).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_ocr_mssv_reads_roi_only_when_found():
+    calls = []
+
+    def fake_ocr(image, lang, config):
+        calls.append((image.size, lang, config))
+        return "HOTEN\nPH12345\n"
+
+    assert ocr_mssv(page_bytes(), image_to_string=fake_ocr) == "PH12345"
+    assert len(calls) == 1
+    (width, height), lang, config = calls[0]
+    assert config == ROI_CONFIG and lang == "eng"
+    # Vùng cắt (đã phóng to) ít điểm ảnh hơn nhiều so với trang phóng to gấp đôi
+    assert width * height < PAGE_SIZE[0] * PAGE_SIZE[1]
+
+
+def test_ocr_mssv_falls_back_to_full_page():
+    calls = []
+
+    def fake_ocr(image, lang, config):
+        calls.append((image.size, config))
+        return "" if config == ROI_CONFIG else "Mã sinh viên: PH54321"
+
+    assert ocr_mssv(Image.fromarray(make_page()), image_to_string=fake_ocr) == "PH54321"
+    assert [config for _, config in calls] == [ROI_CONFIG, FULL_PAGE_CONFIG]
+    assert calls[1][0] == (PAGE_SIZE[0] * 2, PAGE_SIZE[1] * 2)
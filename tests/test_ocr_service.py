@@ -0,0 +1,132 @@
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services.extraction_pool import map_ordered
+from app.services.ocr_service import OcrService, parse_config
+
+
+class FakeApi:
+    created = []
+
+    def __init__(self, lang, oem, psm):
+        self.lang, self.oem, self.psm = lang, oem, psm
+        self.variables = {}
+        self.images = []
+        self.cleared = self.ended = 0
+        FakeApi.created.append(self)
+
+    def SetVariable(self, name, value):
+        self.variables[name] = value
+        return True
+
+    def SetImageBytes(self, data, width, height, bpp, bpl):
+        self.images.append(("bytes", len(data), width, height, bpp, bpl))
+
+    def SetImage(self, image):
+        self.images.append(("pil", image.size))
+
+    def GetUTF8Text(self):
+        return "PH12345\n"
+
+    def Clear(self):
+        self.cleared += 1
+
+    def End(self):
+        self.ended += 1
+
+
+@pytest.fixture
+def fake_tesserocr(monkeypatch):
+    FakeApi.created = []
+    monkeypatch.setitem(sys.modules, "tesserocr", types.SimpleNamespace(PyTessBaseAPI=FakeApi))
+    return FakeApi
+
+
+def test_parse_config():
+    assert parse_config("--oem 1 --psm 6 -c tessedit_char_whitelist=PH0123456789") == (
+        1, 6, {"tessedit_char_whitelist": "PH0123456789"}
+    )
+    assert parse_config("") == (3, 3, {})
+    with pytest.raises(ValueError):
+        parse_config("--dpi 300")
+
+
+def test_handle_reused_within_thread(fake_tesserocr):
+    service = OcrService("tesserocr")
+    for _ in range(3):
+        assert service.image_to_string(Image.new("L", (40, 20)), lang="eng", config="--oem 1 --psm 6") == "PH12345\n"
+    service.image_to_string(Image.new("L", (40, 20)), lang="vie+eng", config="--oem 3 --psm 6")
+
+    assert [(a.lang, a.oem, a.psm) for a in fake_tesserocr.created] == [("eng", 1, 6), ("vie+eng", 3, 6)]
+    assert fake_tesserocr.created[0].cleared == 3
+    metrics = service.metrics()
+    assert metrics["calls"] == 4 and metrics["handles"] == 2 and metrics["engine"] == "tesserocr"
+
+    service.close()
+    assert all(a.ended == 1 for a in fake_tesserocr.created)
+
+
+def test_concurrent_calls_get_separate_handles(fake_tesserocr, monkeypatch):
+    # Ba luồng cùng giữ handle một lúc: mỗi luồng một handle riêng
+    barrier = threading.Barrier(3)
+
+    def get_text(self):
+        barrier.wait(timeout=5)
+        return ""
+
+    monkeypatch.setattr(FakeApi, "GetUTF8Text", get_text)
+    service = OcrService("tesserocr", max_handles=3)
+    threads = [
+        threading.Thread(target=service.image_to_string, args=(Image.new("L", (10, 10)), "eng", "--psm 6"))
+        for _ in range(3)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(fake_tesserocr.created) == 3
+    assert service.metrics()["idle_handles"] == 3
+
+
+def test_handles_bounded_across_jobs(fake_tesserocr, monkeypatch):
+    # Mỗi job tạo pool luồng mới (map_ordered) nhưng handle được trả về pool và dùng lại
+    monkeypatch.setattr(FakeApi, "GetUTF8Text", lambda self: time.sleep(0.005) or "PH12345\n")
+    service = OcrService("tesserocr", max_handles=2)
+    image = np.zeros((20, 30), dtype=np.uint8)
+    for _ in range(5):
+        texts = map_ordered(lambda _: service.image_to_string(image, "eng", "--psm 6"), range(8), concurrency=4)
+        assert texts == ["PH12345\n"] * 8
+
+    assert len(fake_tesserocr.created) <= 2
+    assert sum(a.cleared for a in fake_tesserocr.created) == 40
+    metrics = service.metrics()
+    assert metrics["handles"] == len(fake_tesserocr.created) and metrics["idle_handles"] == metrics["handles"]
+
+    service.close()
+    assert all(a.ended == 1 for a in fake_tesserocr.created)
+
+
+def test_numpy_image_passed_without_encoding(fake_tesserocr):
+    service = OcrService("tesserocr")
+    service.image_to_string(np.zeros((20, 30), dtype=np.uint8), "eng", "--psm 6 -c tessedit_char_whitelist=PH0123456789")
+    service.image_to_string(np.zeros((20, 30, 3), dtype=np.uint8), "eng", "--psm 6 -c tessedit_char_whitelist=PH0123456789")
+
+    api = fake_tesserocr.created[0]
+    assert api.variables == {"tessedit_char_whitelist": "PH0123456789"}
+    assert api.images == [("bytes", 600, 30, 20, 1, 30), ("bytes", 1800, 30, 20, 3, 90)]
+
+
+def test_auto_falls_back_to_pytesseract(monkeypatch):
+    monkeypatch.setitem(sys.modules, "tesserocr", None)
+    assert OcrService("auto").engine == "pytesseract"
+    with pytest.raises(RuntimeError):
+        OcrService("tesserocr")
+    with pytest.raises(ValueError):
+        OcrService("easyocr")
@@ -0,0 +1,128 @@
+import os
+import time
+
+import pytest
+
+from app.services.pdf_rasterizer import PdfRasterizer, page_runs
+
+
+# Engine giả (cấp module để tiến trình con spawn import được): PDF = b"<số trang>"
+def fake_page_count(pdf_bytes):
+    if pdf_bytes == b"broken":
+        raise ValueError("không phải PDF")
+    return int(pdf_bytes)
+
+
+def fake_render_pages(pdf_bytes, page_indexes, dpi, fmt, colorspace):
+    outputs = []
+    for page_index in page_indexes:
+        time.sleep(0.01 * (3 - page_index % 3))
+        if pdf_bytes == b"9" and page_index == 4:
+            raise RuntimeError("trang hỏng")
+        outputs.append(f"{pdf_bytes.decode()}:{page_index}:{dpi}:{fmt}".encode())
+    return outputs
+
+
+def record_render_pages(source, page_indexes, dpi, fmt, colorspace):
+    # Mỗi ảnh ghi lại tiến trình + đoạn trang đã render nó
+    return [f"{os.getpid()}:{list(page_indexes)}:{source}".encode() for _ in page_indexes]
+
+
+@pytest.fixture(scope="module")
+def rasterizer():
+    r = PdfRasterizer(processes=2, dpi=150, fmt="JPEG", page_count=fake_page_count, render_pages=fake_render_pages)
+    yield r
+    r.close()
+
+
+def test_rasterize_many_keeps_file_and_page_order(rasterizer):
+    results = rasterizer.rasterize_many([b"3", b"broken", b"9", b"2"])
+
+    assert results[0] == [b"3:0:150:JPEG", b"3:1:150:JPEG", b"3:2:150:JPEG"]
+    assert results[1] == []
+    # Một trang lỗi: cả file coi như lỗi, các file khác không ảnh hưởng
+    assert results[2] == []
+    assert results[3] == [b"2:0:150:JPEG", b"2:1:150:JPEG"]
+
+
+def test_metrics_track_page_time(rasterizer):
+    before = rasterizer.metrics()
+
+    assert rasterizer.rasterize(b"4") == [f"4:{i}:150:JPEG".encode() for i in range(4)]
+
+    after = rasterizer.metrics()
+    assert after["pages"] - before["pages"] == 4
+    assert after["files"] - before["files"] == 1
+    assert after["max_page_ms"] >= 10
+    assert after["avg_page_ms"] > 0
+
+
+def test_page_runs():
+    assert page_runs([0, 1, 2, 5, 6, 9]) == [[0, 1, 2], [5, 6], [9]]
+    assert page_runs(range(7), max_pages=3) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert page_runs([]) == []
+
+
+def test_file_rendered_in_contiguous_ranges_not_per_page():
+    r = PdfRasterizer(processes=2, page_count=lambda source: 20, render_pages=record_render_pages)
+    try:
+        # Nguồn là đường dẫn: tiến trình con chỉ nhận đường dẫn
+        images = r.rasterize("/kho/ab/cd/abcd.pdf")
+        scanned = r.rasterize("/kho/ab/cd/abcd.pdf", pages=[1, 2, 3, 7, 8])
+    finally:
+        r.close()
+
+    assert len(images) == 20
+    ranges = sorted({image.decode().split(":")[1] for image in images})
+    assert ranges == [str(list(range(0, 10))), str(list(range(10, 20)))]
+    assert all(image.decode().endswith(":/kho/ab/cd/abcd.pdf") for image in images)
+    assert [image.decode().split(":")[1] for image in scanned] == ["[1, 2, 3]"] * 3 + ["[7, 8]"] * 2
+
+
+def make_pdf(pages):
+    import pymupdf
+
+    doc = pymupdf.open()
+    for i in range(pages):
+        doc.new_page(width=200, height=100).insert_text((20, 50), f"Trang {i + 1}")
+    return doc.tobytes()
+
+
+@pytest.mark.parametrize("fmt,colorspace,magic,mode", [
+    ("PNG", "rgb", b"\x89PNG", "RGB"),
+    ("JPEG", "gray", b"\xff\xd8", "L"),
+])
+def test_pymupdf_engine_renders_in_process(fmt, colorspace, magic, mode):
+    import io
+
+    from PIL import Image
+
+    r = PdfRasterizer(processes=1, dpi=72, fmt=fmt, colorspace=colorspace, engine="pymupdf")
+    try:
+        pages = r.rasterize(make_pdf(2))
+    finally:
+        r.close()
+
+    assert len(pages) == 2
+    assert all(p.startswith(magic) for p in pages)
+    image = Image.open(io.BytesIO(pages[0]))
+    assert image.size == (200, 100)
+    assert image.mode == mode
+    assert r.mime_type == ("image/png" if fmt == "PNG" else "image/jpeg")
+
+
+def test_pymupdf_engine_reads_from_path(tmp_path):
+    path = tmp_path / "bao_cao.pdf"
+    path.write_bytes(make_pdf(3))
+    r = PdfRasterizer(processes=1, dpi=72, fmt="PNG", engine="pymupdf")
+    try:
+        pages = r.rasterize(str(path), pages=[0, 2])
+    finally:
+        r.close()
+
+    assert len(pages) == 2 and all(p.startswith(b"\x89PNG") for p in pages)
+
+
+def test_invalid_engine():
+    with pytest.raises(ValueError):
+        PdfRasterizer(engine="ghostscript")
@@ -0,0 +1,43 @@
+import pymupdf
+
+from app.services.pdf_text import format_text_pages, is_text_page, read_text_layer
+
+LINE = "Tuần 1: tìm hiểu hệ thống, cài đặt môi trường phát triển và đọc tài liệu dự án."
+
+
+def make_pdf():
+    doc = pymupdf.open()
+    page = doc.new_page()
+    for i in range(5):
+        page.insert_text((72, 72 + i * 20), LINE, fontname="helv")
+    # Trang "scan": chỉ có ảnh, không có lớp chữ
+    scanned = doc.new_page()
+    pix = pymupdf.Pixmap(pymupdf.csRGB, pymupdf.IRect(0, 0, 50, 50), False)
+    pix.clear_with(200)
+    scanned.insert_image(scanned.rect, pixmap=pix)
+    return doc.tobytes()
+
+
+def test_read_text_layer_per_page():
+    pages = read_text_layer(make_pdf())
+
+    assert len(pages) == 2
+    assert "Tu" in pages[0]
+    assert pages[1].strip() == ""
+    assert is_text_page(pages[0])
+    assert not is_text_page(pages[1])
+
+
+def test_read_text_layer_invalid_pdf():
+    assert read_text_layer(b"not a pdf") == []
+
+
+def test_is_text_page_rejects_short_or_garbled_text():
+    assert not is_text_page("Trang 1", min_chars=100)
+    assert not is_text_page(" " * 50, min_chars=100)
+    assert not is_text_page("\ue001\ue002" * 60, min_chars=100)
+    assert is_text_page(LINE * 3, min_chars=100)
+
+
+def test_format_text_pages_numbers_from_one():
+    assert format_text_pages({2: "c ", 0: "a"}) == "--- Trang 1 ---\na\n\n--- Trang 3 ---\nc"
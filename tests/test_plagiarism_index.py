@@ -0,0 +1,136 @@
+import numpy as np
+import pytest
+
+from app.services import plagiarism_index
+from app.services.plagiarism_index import PlagiarismIndex
+
+
+def random_vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_add_then_search_finds_nearest(tmp_path):
+    index = PlagiarismIndex(str(tmp_path))
+    vectors = random_vectors(50)
+    index.add(list(range(1, 51)), vectors)
+
+    results = index.search(vectors[[7]] + 0.01, k=3)
+
+    assert results[0][0][0] == 8
+    assert results[0][0][1] > 0.99
+
+
+def test_search_excludes_ids_and_sees_other_writers(tmp_path):
+    writer = PlagiarismIndex(str(tmp_path))
+    reader = PlagiarismIndex(str(tmp_path))
+    vectors = random_vectors(10)
+    writer.add(list(range(10)), vectors)
+
+    results = reader.search(vectors[[3]], k=1, exclude_ids=[3])
+
+    assert len(reader) == 10
+    assert results[0][0][0] != 3
+
+
+def test_rebuild_trains_ivf_lists(tmp_path, monkeypatch):
+    monkeypatch.setattr(plagiarism_index, "TRAIN_MIN_VECTORS", 100)
+    vectors = random_vectors(400, seed=1)
+    index = PlagiarismIndex(str(tmp_path), nprobe=4)
+    index.rebuild(list(range(400)), vectors, nlist=16)
+
+    reloaded = PlagiarismIndex(str(tmp_path), nprobe=4)
+    results = reloaded.search(vectors[:20], k=1)
+
+    assert reloaded.centroids.shape == (16, 16)
+    assert [r[0][0] for r in results] == list(range(20))
+
+
+def test_add_skips_reports_already_indexed(tmp_path):
+    index = PlagiarismIndex(str(tmp_path))
+    vectors = random_vectors(6)
+    index.add([1, 1, 2, 2, 3, 3], vectors)
+    # Job chạy lại: cùng báo cáo không được thêm lần nữa, báo cáo mới vẫn được thêm
+    index.add([3, 3, 4], random_vectors(3, seed=2))
+
+    reloaded = PlagiarismIndex(str(tmp_path))
+    assert len(index) == 7
+    assert reloaded.search(vectors[:1], k=1) and len(reloaded) == 7
+    assert 4 in reloaded and 5 not in reloaded
+
+
+def test_remove_and_replace_are_seen_by_other_processes(tmp_path):
+    writer = PlagiarismIndex(str(tmp_path))
+    reader = PlagiarismIndex(str(tmp_path))
+    vectors = random_vectors(10)
+    writer.add(list(range(10)), vectors)
+    assert reader.search(vectors[[3]], k=1)[0][0][0] == 3
+
+    assert writer.remove([3]) == 1
+    assert reader.search(vectors[[3]], k=1)[0][0][0] != 3
+    assert 3 not in reader and len(reader) == 9
+
+    # Báo cáo 5 đổi nội dung: vector cũ bị thay hoàn toàn
+    writer.replace([5], [5, 5], vectors[[7, 8]] * -1)
+    found = reader.search(vectors[[5]], k=10)[0]
+    assert 5 not in [rid for rid, score in found if score > 0.99]
+    assert len(reader) == 10
+
+
+def test_retrains_as_index_grows(tmp_path, monkeypatch):
+    monkeypatch.setattr(plagiarism_index, "TRAIN_MIN_VECTORS", 100)
+    index = PlagiarismIndex(str(tmp_path), nprobe=2)
+    vectors = random_vectors(450, seed=3)
+
+    index.add(list(range(100)), vectors[:100])
+    assert index.meta["nlist"] == 10 and index.meta["trained_rows"] == 100
+
+    index.remove([0, 1])
+    index.add(list(range(100, 199)), vectors[100:199])
+    assert index.meta["nlist"] == 10  # 197 < 2 x 100
+    index.add(list(range(199, 450)), vectors[199:450])
+
+    # Train lại khi gấp đôi: nlist tăng theo sqrt(N), dòng đã gỡ bị bỏ hẳn
+    assert index.meta["nlist"] == int(np.sqrt(448))
+    assert index.meta["trained_rows"] == 448
+    assert not (tmp_path / "removed.bin").exists()
+    reloaded = PlagiarismIndex(str(tmp_path), nprobe=4)
+    assert len(reloaded.search(vectors[:1], k=1)) == 1 and len(reloaded) == 448
+    assert 0 not in reloaded
+
+
+def test_append_changes_writes_without_loading_the_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(plagiarism_index, "TRAIN_MIN_VECTORS", 20)
+    worker = PlagiarismIndex(str(tmp_path))
+    vectors = random_vectors(30, seed=4)
+    worker.add(list(range(30)), vectors)
+
+    api = PlagiarismIndex(str(tmp_path))
+    assert api.append_changes([5], [5, 5, 40], vectors[[7, 8, 9]] * -1) == 1
+    # Báo cáo đã có trong chỉ mục không bị ghi thêm lần nữa
+    assert api.append_changes([], [40], vectors[[9]]) == 0
+
+    # Tiến trình API không giữ vector nào trong bộ nhớ
+    assert api._lists == {} and api._rows == 0
+    assert worker.search(vectors[[5]], k=1)[0][0][0] != 5
+    assert worker.search(vectors[[9]] * -1, k=2)[0][0][0] in (5, 40)
+    assert 40 in worker and len(worker) == 32
+    assert (tmp_path / "ids.bin").stat().st_size == 33 * 8
+
+
+def test_index_built_for_another_embedding_requires_rebuild(tmp_path, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "EMBEDDING_ENGINE", "torch")
+    index = PlagiarismIndex(str(tmp_path))
+    vectors = random_vectors(10)
+    index.add(list(range(10)), vectors)
+
+    # Đổi engine: vector mới khác không gian, không được tra cứu hay ghi chung
+    monkeypatch.setattr(settings, "EMBEDDING_ENGINE", "onnx")
+    for call in (lambda: index.search(vectors[:1]), lambda: index.add([10], vectors[:1]),
+                 lambda: PlagiarismIndex(str(tmp_path)).append_changes([], [10], vectors[:1])):
+        with pytest.raises(ValueError, match="rebuild_plagiarism_index"):
+            call()
+
+    index.rebuild(list(range(10)), vectors)
+    assert index.search(vectors[[2]], k=1)[0][0][0] == 2
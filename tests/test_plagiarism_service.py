@@ -0,0 +1,123 @@
+import numpy as np
+
+from app.core.config import settings
+from app.services.plagiarism_service import PlagiarismService, chunk_text
+
+LONG = "x" * 60
+
+
+def fake_encoder(vectors):
+    calls = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([vectors[t] for t in texts], dtype=np.float32)
+
+    return encode, calls
+
+
+def make_report(report_id, content):
+    return {"report_id": report_id, "filename": f"r{report_id}.pdf", "content": content}
+
+
+def test_find_similar_pairs_encodes_batch_once():
+    a, b, c = LONG + "a", LONG + "b", LONG + "c"
+    encode, calls = fake_encoder({a: [1.0, 0.0], b: [0.99, 0.1], c: [0.0, 1.0]})
+    reports = [make_report(1, a), make_report(2, b), make_report(3, c)]
+
+    results = PlagiarismService.find_similar_pairs(reports, encode, threshold=0.8, prefilter=False)
+
+    assert len(calls) == 1
+    assert [(r["id_1"], r["id_2"]) for r in results] == [(1, 2)]
+    assert results[0]["file_1"] == "r1.pdf"
+    assert results[0]["file_2"] == "r2.pdf"
+    assert results[0]["score"] == f"{0.99 / np.hypot(0.99, 0.1):.4f}"
+    assert results[0]["method"] == "semantic"
+
+
+def test_find_similar_pairs_skips_short_content():
+    encode, calls = fake_encoder({LONG: [1.0, 0.0]})
+    reports = [make_report(1, LONG), make_report(2, "short"), make_report(3, "")]
+
+    assert PlagiarismService.find_similar_pairs(reports, encode, prefilter=False) == []
+    assert calls == []
+
+
+def test_similarity_matrix_matches_pairwise_cosine():
+    rng = np.random.default_rng(0)
+    emb = rng.normal(size=(5, 8))
+    sim = PlagiarismService.similarity_matrix(emb)
+    expected = emb[1] @ emb[3] / (np.linalg.norm(emb[1]) * np.linalg.norm(emb[3]))
+    assert np.isclose(sim[1, 3], expected, atol=1e-5)
+
+
+BASE = (
+    "Tuần một em tìm hiểu quy trình phát triển phần mềm của công ty, cài đặt môi trường "
+    "và đọc tài liệu dự án. Tuần hai em viết API quản lý người dùng và kiểm thử đơn vị."
+)
+OTHER = (
+    "Trong đợt thực tập tôi tham gia nhóm kiểm thử tự động, xây dựng kịch bản Selenium "
+    "cho trang quản trị và báo cáo lỗi hằng ngày cho trưởng nhóm."
+)
+
+
+def test_prefilter_flags_verbatim_copy_without_encoding():
+    encode, calls = fake_encoder({})
+    reports = [make_report(1, BASE), make_report(2, BASE.upper() + "!"), make_report(3, OTHER)]
+
+    results = PlagiarismService.find_similar_pairs(reports, encode, prefilter=True)
+
+    assert [(r["id_1"], r["id_2"], r["method"]) for r in results] == [(1, 2, "lexical")]
+    assert calls == []
+
+
+def test_prefilter_sends_only_candidates_to_semantic_stage():
+    edited = BASE.replace("Tuần hai em viết API quản lý người dùng", "Tuần hai em làm giao diện đăng nhập")
+    vectors = {BASE: [1.0, 0.0], edited: [0.95, 0.05], OTHER: [0.0, 1.0]}
+    encode, calls = fake_encoder(vectors)
+    reports = [make_report(1, BASE), make_report(2, edited), make_report(3, OTHER)]
+
+    results = PlagiarismService.find_similar_pairs(reports, encode, prefilter=True)
+
+    assert [(r["id_1"], r["id_2"], r["method"]) for r in results] == [(1, 2, "semantic")]
+    assert calls == [[BASE, edited]]
+
+
+def test_chunk_text_covers_tail_with_overlap():
+    words = [f"w{i}" for i in range(25)]
+    chunks = chunk_text(" ".join(words), window=10, stride=7)
+
+    assert chunks[0].split() == words[:10]
+    assert chunks[-1].split() == words[-10:]
+    assert all(len(c.split()) == 10 for c in chunks)
+
+
+def test_copied_tail_is_caught_by_chunk_scores(monkeypatch):
+    monkeypatch.setattr(settings, "PLAGIARISM_CHUNK_WORDS", 10)
+    monkeypatch.setattr(settings, "PLAGIARISM_CHUNK_STRIDE", 10)
+    monkeypatch.setattr(settings, "PLAGIARISM_CHUNK_AGGREGATE", "max")
+    shared = " ".join(f"chung{i}" for i in range(10))
+    doc_a = " ".join(f"a{i}" for i in range(30)) + " " + shared
+    doc_b = " ".join(f"b{i}" for i in range(30)) + " " + shared
+
+    def encode(texts):
+        # Cửa sổ giống hệt nhau -> cùng vector, còn lại trực giao
+        return np.array([np.eye(16)[hash(t) % 15 if t != shared else 15] for t in texts])
+
+    results = PlagiarismService.find_similar_pairs(
+        [make_report(1, doc_a), make_report(2, doc_b)], encode, prefilter=False
+    )
+
+    assert [(r["id_1"], r["id_2"]) for r in results] == [(1, 2)]
+    assert results[0]["score"] == "1.0000"
+
+
+def test_cluster_pairs_groups_connected_reports():
+    edges = [(1, 2, 0.9), (2, 3, 0.85), (3, 1, 0.95), (1, 2, 0.92), (7, 8, 0.81)]
+
+    clusters = PlagiarismService.cluster_pairs(edges)
+
+    assert [c["report_ids"] for c in clusters] == [[1, 2, 3], [7, 8]]
+    assert clusters[0]["pair_count"] == 3
+    assert clusters[0]["max_score"] == 0.95
+    assert np.isclose(clusters[0]["mean_score"], (0.92 + 0.85 + 0.95) / 3)
@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+
+import pytest
+from openpyxl import load_workbook
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.models import Exam, Report
+from app.models.report import ReportStatus
+from app.services.report_export import EXCEL_CELL_MAX_CHARS, EXPORT_COLUMNS, build_export, iter_report_rows
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    for exam_id in (1, 2):
+        session.add(Exam(id=exam_id, code=f"EXAM00{exam_id}", name="Kỳ thi", start_time=datetime(2025, 1, 1), end_time=datetime(2025, 1, 2)))
+    for i in range(25):
+        session.add(Report(
+            name=f"Sinh viên {i}",
+            student_code=f"PH{10000 + i}",
+            exam_id=1 if i < 20 else 2,
+            attitude_score=8,
+            status=ReportStatus.checked,
+            raw_content="Tuần 1:\x0c viết API " * (4000 if i == 0 else 1),
+            created_at=datetime(2025, 1, 1, 8, 0, tzinfo=timezone.utc),
+        ))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_rows_are_read_in_batches_for_one_exam(db):
+    rows = list(iter_report_rows(db, 1, batch_size=7))
+
+    assert [row[0] for row in rows] == list(range(1, 21))
+    assert len(rows[0]) == len(EXPORT_COLUMNS)
+
+
+def test_export_without_raw_content(db):
+    spool, size = build_export(db, 1)
+    with spool:
+        assert size > 0
+        ws = load_workbook(spool, read_only=True).active
+        rows = list(ws.values)
+
+    assert rows[0] == tuple(header for header, _ in EXPORT_COLUMNS)
+    assert len(rows) == 21
+    assert rows[1][2] == "PH10000"
+    assert rows[1][11] == "checked"
+    assert rows[1][12] == datetime(2025, 1, 1, 8, 0)
+
+
+def test_export_with_raw_content_is_sanitised(db):
+    spool, _ = build_export(db, 1, include_raw_content=True)
+    with spool:
+        rows = list(load_workbook(spool, read_only=True).active.values)
+
+    assert rows[0][-1] == "Nội dung báo cáo thô"
+    raw = rows[1][-1]
+    assert "\x0c" not in raw
+    assert len(raw) == EXCEL_CELL_MAX_CHARS
@@ -0,0 +1,376 @@
+import zlib
+from datetime import datetime
+
+import numpy as np
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.models import Exam, Report
+from app.models.plagiarism_match import PlagiarismMatch
+from app.models.report import ReportStatus
+from app.models.report_file import ReportFile
+from app.models.upload_job import UploadJob, UploadJobFile, UploadJobFileStatus
+from app.core.config import settings
+from app.schemas.base_schemas import ListResponse
+from app.schemas.report import PlagiarismMatchResponse, ReportUpdate
+from app.services import report_service
+from app.services.gemini_service import GeminiService
+from app.services.plagiarism_index import PlagiarismIndex
+from app.services.report_service import ReportService
+from app.services.upload_job_service import LeaseLost
+
+COPIED = "Tuần 1 tìm hiểu hệ thống quản lý kỳ thi, viết API đăng nhập và phân quyền người dùng theo vai trò " * 3
+OTHER = "Tuần 2 thiết kế giao diện trang chủ bằng React, tối ưu hiệu năng tải ảnh và viết tài liệu hướng dẫn " * 3
+
+
+def fake_encode(texts):
+    # Túi từ băm vào 64 chiều: cùng nội dung -> cùng vector, nội dung khác -> cosine thấp
+    vectors = np.zeros((len(texts), 64), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[row, zlib.crc32(word.encode()) % 64] += 1
+    return vectors
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    index = PlagiarismIndex(str(tmp_path / "index"))
+    monkeypatch.setattr(report_service, "get_plagiarism_index", lambda: index)
+    monkeypatch.setattr(GeminiService, "encode_texts", staticmethod(fake_encode))
+    # File SQLite: phiên thứ hai (như API trạng thái) thấy được dữ liệu đã commit
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    for exam_id in (1, 2):
+        session.add(Exam(id=exam_id, code=f"EXAM00{exam_id}", name=f"Kỳ thi {exam_id}",
+                         start_time=datetime(2025, 1, 1), end_time=datetime(2025, 1, 2)))
+    session.commit()
+    session.index = index
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def add_report(db, exam_id, content, name="Sinh viên", filename=None):
+    report = Report(name=name, student_code="PH12345", exam_id=exam_id, raw_content=content,
+                    created_at=datetime(2025, 1, 1))
+    db.add(report)
+    db.flush()
+    if filename:
+        db.add(ReportFile(name_file=filename, path_storage=f"/tmp/{filename}", report_id=report.id))
+    db.commit()
+    return report
+
+
+def check_batch(db, reports):
+    embeddings = ReportService._store_embeddings(db, reports)
+    batch = [{"report_id": r.id, "filename": f"{r.id}.pdf", "content": r.raw_content} for r in reports]
+    return ReportService._check_history(db, batch, embeddings)
+
+
+def test_check_history_finds_copy_from_earlier_exam(db):
+    old = add_report(db, 1, COPIED, filename="cu.pdf")
+    check_batch(db, [old])
+
+    new, unrelated = add_report(db, 2, COPIED), add_report(db, 2, OTHER)
+    hits = check_batch(db, [new, unrelated])
+
+    assert [(h["id_1"], h["id_2"], h["file_1"], h["file_2"]) for h in hits] == [(new.id, old.id, f"{new.id}.pdf", "cu.pdf")]
+    assert float(hits[0]["score"]) > 0.99
+    assert {old.id, new.id, unrelated.id} <= set(db.index._owners)
+
+
+def test_check_history_retry_does_not_duplicate_index_rows(db):
+    reports = [add_report(db, 1, COPIED), add_report(db, 1, OTHER)]
+    check_batch(db, reports)
+    size = len(db.index)
+
+    # Job bị nhận lại sau khi mất lease: cùng báo cáo được kiểm tra lần nữa
+    check_batch(db, reports)
+
+    assert len(db.index) == size
+
+
+def test_deleted_and_updated_reports_leave_the_index(db):
+    deleted, edited = add_report(db, 1, COPIED), add_report(db, 1, COPIED + " bản nháp")
+    check_batch(db, [deleted, edited])
+
+    ReportService.delete(db, deleted.id)
+    db.query(Report).filter(Report.id == edited.id).update({"raw_content": OTHER})
+    db.commit()
+    ReportService.update(db, edited.id, ReportUpdate.model_construct(note="Đã sửa"))
+
+    assert deleted.id not in db.index
+    assert check_batch(db, [add_report(db, 2, COPIED)]) == []
+
+
+def save_matches(db, exam_id, pairs):
+    ReportService._save_plagiarism_matches(
+        db, exam_id, [{"id_1": a, "id_2": b, "score": f"{score:.4f}", "method": "semantic"} for a, b, score in pairs]
+    )
+
+
+def test_save_plagiarism_matches_inserts_pairs_and_flags_reports(db):
+    a, b, c, clean = (add_report(db, 1, COPIED, name=n) for n in "abcd")
+    save_matches(db, 1, [(a.id, b.id, 0.97), (c.id, a.id, 0.91)])
+
+    rows = db.query(PlagiarismMatch).order_by(PlagiarismMatch.id).all()
+    assert [(m.report_a_id, m.report_b_id, m.exam_id, m.method) for m in rows] == [
+        (a.id, b.id, 1, "semantic"), (c.id, a.id, 1, "semantic")
+    ]
+    assert rows[0].score == pytest.approx(0.97)
+    db.expire_all()
+    statuses = {r.id: r.status for r in db.query(Report)}
+    assert statuses == {a.id: ReportStatus.plagiarized, b.id: ReportStatus.plagiarized,
+                        c.id: ReportStatus.plagiarized, clean.id: ReportStatus.pending}
+
+
+def test_save_plagiarism_matches_skips_pairs_already_saved(db):
+    a, b, c = (add_report(db, 1, COPIED) for _ in range(3))
+    save_matches(db, 1, [(a.id, b.id, 0.97)])
+
+    # Job chạy lại sau khi đã lưu cặp: cặp cũ không bị ghi lần nữa, cặp mới vẫn được ghi
+    save_matches(db, 1, [(a.id, b.id, 0.97), (c.id, a.id, 0.91)])
+    save_matches(db, 2, [(a.id, b.id, 0.97)])
+
+    pairs = [(m.exam_id, m.report_a_id, m.report_b_id) for m in db.query(PlagiarismMatch).order_by(PlagiarismMatch.id)]
+    assert pairs == [(1, a.id, b.id), (1, c.id, a.id), (2, a.id, b.id)]
+    assert ReportService.get_plagiarism_clusters(db, 1).data[0]["pair_count"] == 2
+
+
+def test_save_plagiarism_matches_without_pairs_writes_nothing(db):
+    add_report(db, 1, COPIED)
+    ReportService._save_plagiarism_matches(db, 1, [])
+    assert db.query(PlagiarismMatch).count() == 0
+
+
+def test_get_plagiarism_matches_filters_orders_and_paginates(db):
+    a, b, c = (add_report(db, 1, COPIED) for _ in range(3))
+    d, e = add_report(db, 2, COPIED), add_report(db, 2, OTHER)
+    save_matches(db, 1, [(a.id, b.id, 0.95), (c.id, a.id, 0.9), (b.id, c.id, 0.85)])
+    save_matches(db, 2, [(d.id, a.id, 0.93), (e.id, d.id, 0.88)])
+    # Dòng ghi sau có created_at không nhỏ hơn và id lớn hơn: mới nhất đứng trước
+    ids = {(m.report_a_id, m.report_b_id): m.id for m in db.query(PlagiarismMatch)}
+
+    exam_1 = ReportService.get_plagiarism_matches(db, exam_id=1)
+    assert exam_1.total == 3
+    assert [m.id for m in exam_1.data] == [ids[(b.id, c.id)], ids[(c.id, a.id)], ids[(a.id, b.id)]]
+
+    # Lọc theo báo cáo: a ở vị trí report_a hoặc report_b, ở cả hai kỳ thi
+    of_a = ReportService.get_plagiarism_matches(db, report_id=a.id)
+    assert {(m.report_a_id, m.report_b_id) for m in of_a.data} == {(a.id, b.id), (c.id, a.id), (d.id, a.id)}
+    both = ReportService.get_plagiarism_matches(db, exam_id=2, report_id=a.id)
+    assert [(m.report_a_id, m.report_b_id) for m in both.data] == [(d.id, a.id)]
+
+    page_2 = ReportService.get_plagiarism_matches(db, exam_id=1, page=2, page_size=2)
+    assert (page_2.total, page_2.pageIndex, page_2.pageSize) == (3, 2, 2)
+    assert [m.id for m in page_2.data] == [ids[(a.id, b.id)]]
+    assert ReportService.get_plagiarism_matches(db, exam_id=1, page=3, page_size=2).data == []
+
+
+def test_plagiarism_matches_response_serializes_orm_rows(db):
+    a, b = add_report(db, 1, COPIED), add_report(db, 1, COPIED)
+    save_matches(db, 1, [(a.id, b.id, 0.9731)])
+
+    # Cùng response_model với route /reports/plagiarism/matches
+    app = FastAPI()
+
+    @app.get("/matches", response_model=ListResponse[PlagiarismMatchResponse])
+    def matches(exam_id: int = None, page: int = 1, page_size: int = 20):
+        return ReportService.get_plagiarism_matches(db, exam_id, None, page, page_size)
+
+    body = TestClient(app).get("/matches", params={"exam_id": 1}).json()
+
+    assert body["total"] == 1 and body["pageIndex"] == 1 and body["pageSize"] == 20
+    match = body["data"][0]
+    assert {k: match[k] for k in ("report_a_id", "report_b_id", "exam_id", "method")} == {
+        "report_a_id": a.id, "report_b_id": b.id, "exam_id": 1, "method": "semantic"
+    }
+    assert match["score"] == pytest.approx(0.9731)
+    assert match["id"] and match["created_at"]
+
+
+def test_get_plagiarism_clusters_groups_pairs_and_paginates(db):
+    a, b, c, d, e = (add_report(db, 1, COPIED, name=n) for n in "abcde")
+    save_matches(db, 1, [(a.id, b.id, 0.95), (c.id, b.id, 0.9), (d.id, e.id, 0.99), (b.id, a.id, 0.97)])
+
+    result = ReportService.get_plagiarism_clusters(db, 1)
+
+    assert result.total == 2
+    big, small = result.data
+    assert (big["report_ids"], big["size"], big["pair_count"]) == ([a.id, b.id, c.id], 3, 2)
+    # Cặp a-b phát hiện hai lần chỉ tính một lần với điểm cao nhất
+    assert big["max_score"] == pytest.approx(0.97)
+    assert big["mean_score"] == pytest.approx((0.97 + 0.9) / 2)
+    assert [(m["id"], m["name"], m["exam_id"]) for m in big["members"]] == [(a.id, "a", 1), (b.id, "b", 1), (c.id, "c", 1)]
+    assert small["report_ids"] == [d.id, e.id]
+
+    page_2 = ReportService.get_plagiarism_clusters(db, 1, page=2, page_size=1)
+    assert (page_2.total, [c["report_ids"] for c in page_2.data]) == (2, [[d.id, e.id]])
+    assert ReportService.get_plagiarism_clusters(db, 2).data == []
+    with pytest.raises(HTTPException) as exc:
+        ReportService.get_plagiarism_clusters(db, 99)
+    assert exc.value.status_code == 404
+
+
+def test_plagiarism_cluster_includes_history_members_from_other_exams(db):
+    old_1, old_2 = add_report(db, 1, COPIED, name="cũ 1"), add_report(db, 1, COPIED, name="cũ 2")
+    check_batch(db, [old_1, old_2])
+    save_matches(db, 1, [(old_1.id, old_2.id, 0.98)])
+    new = add_report(db, 2, COPIED, name="mới")
+
+    # Báo cáo mới của kỳ 2 chép từ kỳ 1: cặp khớp lịch sử ghi với exam_id=2
+    hits = check_batch(db, [new])
+    assert hits and {h["id_2"] for h in hits} <= {old_1.id, old_2.id}
+    ReportService._save_plagiarism_matches(db, 2, hits)
+
+    exam_2 = ReportService.get_plagiarism_clusters(db, 2).data
+    assert [[(m["id"], m["exam_id"]) for m in c["members"]] for c in exam_2] == [
+        [(old_1.id, 1), (old_2.id, 1), (new.id, 2)]
+    ]
+    # Cụm của kỳ 1 giữ nguyên, không kéo báo cáo kỳ 2 vào
+    assert [c["report_ids"] for c in ReportService.get_plagiarism_clusters(db, 1).data] == [[old_1.id, old_2.id]]
+
+
+def test_api_updates_append_to_index_only_when_embedding_changes(db, tmp_path):
+    report = add_report(db, 1, COPIED)
+    index_files = lambda: {name: (tmp_path / "index" / name).stat().st_size
+                           for name in ("ids.bin", "vectors.bin", "removed.bin") if (tmp_path / "index" / name).exists()}
+
+    ReportService.update(db, report.id, ReportUpdate.model_construct(note="Lần 1"))
+    written = index_files()
+    ReportService.update(db, report.id, ReportUpdate.model_construct(note="Lần 2"))
+
+    # Nội dung không đổi: file chỉ mục không lớn thêm
+    assert written["ids.bin"] > 0 and index_files() == written
+    # Tiến trình API chỉ ghi thêm, không nạp vector lịch sử
+    assert db.index._lists == {}
+
+    db.query(Report).filter(Report.id == report.id).update({"raw_content": OTHER})
+    db.commit()
+    ReportService.update(db, report.id, ReportUpdate.model_construct(note="Lần 3"))
+    assert index_files()["removed.bin"] > 0
+    assert check_batch(db, [add_report(db, 2, OTHER)])[0]["id_2"] == report.id
+
+
+class WorkerCrash(BaseException):
+    """Giả lập worker chết giữa chừng (không phải lỗi của một file)."""
+
+
+def make_job(db, names):
+    job = UploadJob(exam_id=1, folder_path="uploads/reports/lo_1", total_files=len(names), created_by="admin")
+    for name in names:
+        job.files.append(UploadJobFile(name_file=name, path_storage=f"/kho/{name}"))
+    db.add(job)
+    db.commit()
+    return job
+
+
+def extracted(path):
+    name = path.rsplit("/", 1)[-1]
+    return {"Họ và tên": name, "MSSV": "PH12345", "Điểm thái độ": "8", "Điểm công việc": "9",
+            "Nội dung báo cáo thô": f"{name} " + OTHER}
+
+
+def file_states(db, job_id):
+    other = sessionmaker(bind=db.get_bind())()
+    try:
+        files = other.query(UploadJobFile).filter(UploadJobFile.job_id == job_id).order_by(UploadJobFile.id)
+        return [(f.name_file, f.status, f.report_id is not None) for f in files]
+    finally:
+        other.close()
+
+
+def test_process_job_saves_each_file_as_it_finishes(db, monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_CONCURRENCY", 1)
+    job = make_job(db, ["a.pdf", "b.pdf", "c.pdf"])
+    seen = []
+
+    def extract(path, digest=None):
+        # Trạng thái các file trước đã được commit khi file sau bắt đầu
+        seen.append(file_states(db, job.id))
+        if path.endswith("b.pdf"):
+            raise ValueError("Gemini lỗi")
+        return extracted(path)
+
+    monkeypatch.setattr(GeminiService, "extract_info_from_file", staticmethod(extract))
+    ReportService.process_job(db, job)
+
+    assert seen[2] == [("a.pdf", UploadJobFileStatus.done, True), ("b.pdf", UploadJobFileStatus.failed, False),
+                       ("c.pdf", UploadJobFileStatus.pending, False)]
+    assert file_states(db, job.id)[2] == ("c.pdf", UploadJobFileStatus.done, True)
+    assert job.processed_files == 3
+    assert db.query(ReportFile).count() == 2
+
+
+def test_process_job_resumes_after_crash(db, monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_CONCURRENCY", 1)
+    job = make_job(db, ["a.pdf", "b.pdf", "c.pdf"])
+    calls = []
+
+    def crash_on_c(path, digest=None):
+        if path.endswith("c.pdf"):
+            raise WorkerCrash()
+        calls.append(path)
+        return extracted(path)
+
+    monkeypatch.setattr(GeminiService, "extract_info_from_file", staticmethod(crash_on_c))
+    with pytest.raises(WorkerCrash):
+        ReportService.process_job(db, job)
+    db.rollback()
+
+    # Lần chạy lại chỉ gọi Gemini cho file chưa xong
+    monkeypatch.setattr(GeminiService, "extract_info_from_file",
+                        staticmethod(lambda path, digest=None: calls.append(path) or extracted(path)))
+    ReportService.process_job(db, job)
+
+    assert calls == ["/kho/a.pdf", "/kho/b.pdf", "/kho/c.pdf"]
+    assert db.query(Report).count() == 3
+    assert all(status == UploadJobFileStatus.done for _, status, _ in file_states(db, job.id))
+
+
+def test_process_job_stops_when_lease_is_lost(db, monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_CONCURRENCY", 1)
+    job = make_job(db, ["a.pdf", "b.pdf", "c.pdf"])
+    calls = []
+    monkeypatch.setattr(GeminiService, "extract_info_from_file",
+                        staticmethod(lambda path, digest=None: calls.append(path) or extracted(path)))
+
+    # Lease mất ngay sau khi file đầu được lưu
+    with pytest.raises(LeaseLost):
+        ReportService.process_job(db, job, lease_lost=lambda: len(calls) > 1)
+
+    assert calls == ["/kho/a.pdf", "/kho/b.pdf"]
+    assert [status for _, status, _ in file_states(db, job.id)] == [
+        UploadJobFileStatus.done, UploadJobFileStatus.pending, UploadJobFileStatus.pending
+    ]
+    assert db.query(Report).count() == 1
+
+
+def test_file_saved_by_another_worker_is_not_duplicated(db, monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_CONCURRENCY", 1)
+    job = make_job(db, ["a.pdf", "b.pdf"])
+    other_worker = sessionmaker(bind=db.get_bind())()
+
+    def extract(path, digest=None):
+        if path.endswith("b.pdf"):
+            # Worker khác (nhận lại job) vừa lưu xong b.pdf
+            b = other_worker.query(UploadJobFile).filter(UploadJobFile.name_file == "b.pdf").one()
+            report = Report(name="b", student_code="PH12345", exam_id=1)
+            other_worker.add(report)
+            other_worker.flush()
+            b.status, b.report_id = UploadJobFileStatus.done, report.id
+            other_worker.commit()
+        return extracted(path)
+
+    monkeypatch.setattr(GeminiService, "extract_info_from_file", staticmethod(extract))
+    ReportService.process_job(db, job)
+    other_worker.close()
+
+    assert db.query(Report).count() == 2
+    assert db.query(ReportFile).count() == 1
+    assert job.processed_files == 1
@@ -0,0 +1,84 @@
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.services.upload_ingest import file_digest, ingest_files, stream_to_file
+
+
+class CountingReader(io.BytesIO):
+    """Ghi lại kích thước từng lần đọc để kiểm tra việc chép theo khối."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        self.reads.append(size)
+        return super().read(size)
+
+
+def test_stream_to_file_chunks_and_hashes(tmp_path):
+    data = os.urandom(10_000)
+    src = CountingReader(data)
+    dest = tmp_path / "a.pdf"
+
+    size, sha256 = stream_to_file(src, str(dest), max_bytes=20_000, chunk_size=4096)
+
+    assert size == 10_000
+    assert sha256 == hashlib.sha256(data).hexdigest()
+    assert dest.read_bytes() == data
+    assert set(src.reads) == {4096}
+    assert file_digest(str(dest), chunk_size=1000) == sha256
+
+
+def test_stream_to_file_over_limit_leaves_nothing(tmp_path):
+    src = CountingReader(b"x" * 10_000)
+    with pytest.raises(HTTPException) as e:
+        stream_to_file(src, str(tmp_path / "a.pdf"), max_bytes=5_000, chunk_size=1024)
+
+    assert e.value.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+    # Dừng ngay khi vượt giới hạn, không đọc hết file
+    assert len(src.reads) == 5
+
+
+def make_upload(name, size):
+    return UploadFile(file=io.BytesIO(b"%" * size), filename=name)
+
+
+def test_ingest_files_returns_hashes(tmp_path):
+    folder = tmp_path / "batch"
+    folder.mkdir()
+    stored = ingest_files([make_upload("a.pdf", 100), make_upload("b.pdf", 200)], str(folder), 1_000, 10_000)
+
+    assert [(s.name, s.size) for s in stored] == [("a.pdf", 100), ("b.pdf", 200)]
+    assert stored[1].sha256 == hashlib.sha256(b"%" * 200).hexdigest()
+    assert sorted(os.listdir(folder)) == ["a.pdf", "b.pdf"]
+
+
+def test_ingest_files_batch_limit_removes_folder(tmp_path):
+    folder = tmp_path / "batch"
+    folder.mkdir()
+    files = [make_upload("a.pdf", 600), make_upload("b.pdf", 600)]
+
+    with pytest.raises(HTTPException) as e:
+        ingest_files(files, str(folder), max_file_bytes=1_000, max_batch_bytes=1_000)
+
+    assert e.value.status_code == 413
+    assert "lô" in e.value.detail["message"]
+    assert not folder.exists()
+
+
+def test_ingest_files_rejects_declared_size_before_copying(tmp_path):
+    folder = tmp_path / "batch"
+    folder.mkdir()
+    upload = UploadFile(file=CountingReader(b"%" * 10), filename="big.pdf", size=5_000)
+
+    with pytest.raises(HTTPException) as e:
+        ingest_files([upload], str(folder), max_file_bytes=1_000, max_batch_bytes=10_000)
+
+    assert e.value.status_code == 413
+    assert upload.file.reads == []
@@ -0,0 +1,118 @@
+import hashlib
+import io
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db import Base
+from app.models import Blob, Exam, UploadJob
+from app.models.upload_job import UploadJobStatus
+from app.services import blob_store, upload_job_service
+from app.services.blob_store import LocalBlobStorage
+from app.services.upload_job_service import UploadJobService
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_job_service, "UPLOAD_ROOT", str(tmp_path))
+    monkeypatch.setattr(blob_store, "_storage", LocalBlobStorage(str(tmp_path / "blobs")))
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Exam(id=1, code="EXAM001", name="Kỳ thi 1", start_time=datetime(2025, 1, 1), end_time=datetime(2025, 1, 2)))
+    session.commit()
+    yield session
+    session.close()
+
+
+def make_files(*names):
+    return [UploadFile(file=io.BytesIO(f"%PDF {name}".encode()), filename=name) for name in names]
+
+
+def test_enqueue_stores_files_and_pending_job(db):
+    job = UploadJobService.enqueue(db, 1, make_files("a.pdf", "b.pdf"), "admin")
+
+    assert job.status == UploadJobStatus.pending
+    assert job.total_files == 2
+    assert [f.name_file for f in job.files] == ["a.pdf", "b.pdf"]
+    with open(job.files[1].path_storage, "rb") as f:
+        assert f.read() == b"%PDF b.pdf"
+    assert job.files[1].content_hash == hashlib.sha256(b"%PDF b.pdf").hexdigest()
+    assert job.files[1].size_bytes == len(b"%PDF b.pdf")
+
+
+def test_reupload_is_stored_once(db, tmp_path):
+    first = UploadJobService.enqueue(db, 1, make_files("a.pdf"), "admin")
+    second = UploadJobService.enqueue(db, 1, make_files("a.pdf"), "admin")
+
+    assert first.files[0].path_storage == second.files[0].path_storage
+    assert len([p for p in (tmp_path / "blobs").rglob("*") if p.is_file()]) == 1
+    assert db.query(Blob).count() == 1
+
+
+def test_enqueue_over_size_limit_creates_no_job(db, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BATCH_BYTES", 12)
+    with pytest.raises(HTTPException) as e:
+        UploadJobService.enqueue(db, 1, make_files("a.pdf", "b.pdf"), "admin")
+    assert e.value.status_code == 413
+    assert db.query(UploadJob).count() == 0
+
+
+def test_enqueue_unknown_exam(db):
+    with pytest.raises(HTTPException) as e:
+        UploadJobService.enqueue(db, 99, make_files("a.pdf"), "admin")
+    assert e.value.status_code == 404
+
+
+def test_claim_is_exclusive(db):
+    job = UploadJobService.enqueue(db, 1, make_files("a.pdf"), "admin")
+
+    claimed = UploadJobService.claim(db, "worker-1", lease_seconds=60)
+
+    assert claimed.id == job.id
+    assert claimed.lease_owner == "worker-1"
+    assert claimed.attempts == 1
+    assert UploadJobService.claim(db, "worker-2", lease_seconds=60) is None
+
+
+def test_expired_lease_is_reclaimed(db):
+    job = UploadJobService.enqueue(db, 1, make_files("a.pdf"), "admin")
+    UploadJobService.claim(db, "worker-1", lease_seconds=60)
+    db.query(UploadJob).filter(UploadJob.id == job.id).update(
+        {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+
+    claimed = UploadJobService.claim(db, "worker-2", lease_seconds=60)
+
+    assert claimed.lease_owner == "worker-2"
+    assert claimed.attempts == 2
+    # Worker cũ mất lease: không gia hạn hay hoàn thành được nữa
+    assert not UploadJobService.heartbeat(db, job.id, "worker-1")
+    assert not UploadJobService.complete(db, job.id, "worker-1", {})
+    assert UploadJobService.complete(db, job.id, "worker-2", {"zip_file": "x.zip"})
+    assert UploadJobService.get_status(db, job.id).data["result"] == {"zip_file": "x.zip"}
+
+
+def test_job_fails_after_max_attempts(db, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_JOB_MAX_ATTEMPTS", 2)
+    job = UploadJobService.enqueue(db, 1, make_files("a.pdf"), "admin")
+
+    UploadJobService.claim(db, "worker-1")
+    assert UploadJobService.fail(db, job.id, "worker-1", "lỗi mạng")
+    db.refresh(job)
+    assert job.status == UploadJobStatus.pending
+
+    UploadJobService.claim(db, "worker-1")
+    db.query(UploadJob).filter(UploadJob.id == job.id).update(
+        {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+
+    assert UploadJobService.claim(db, "worker-2") is None
+    db.refresh(job)
+    assert job.status == UploadJobStatus.failed
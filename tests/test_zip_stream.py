@@ -0,0 +1,41 @@
+import io
+import os
+import zipfile
+
+from app.services.zip_stream import iter_zip_stored, unique_names
+
+
+def entries_for(tmp_path, files):
+    entries = []
+    for name, data in files:
+        path = tmp_path / f"src_{len(entries)}"
+        path.write_bytes(data)
+        entries.append((name, lambda p=path: open(p, "rb")))
+    return entries
+
+
+def test_unique_names():
+    assert list(unique_names(["a.pdf", "b.pdf", "a.pdf", "a.pdf"])) == ["a.pdf", "b.pdf", "a (2).pdf", "a (3).pdf"]
+
+
+def test_archive_is_stored_and_complete(tmp_path):
+    files = [("a.pdf", os.urandom(200_000)), ("b.pdf", os.urandom(50_000)), ("rỗng.pdf", b"")]
+    chunks = list(iter_zip_stored(entries_for(tmp_path, files), chunk_size=16_384))
+
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert archive.testzip() is None
+    assert [(i.filename, i.compress_type) for i in archive.infolist()] == [
+        (name, zipfile.ZIP_STORED) for name, _ in files
+    ]
+    for name, data in files:
+        assert archive.read(name) == data
+    # Stream từng khối: không khối nào lớn hơn một khối đọc + header, không có khối rỗng
+    assert all(0 < len(c) <= 16_384 + 1024 for c in chunks)
+
+
+def test_unreadable_source_is_skipped(tmp_path):
+    entries = entries_for(tmp_path, [("a.pdf", b"%PDF a")])
+    entries.insert(0, ("mất.pdf", lambda: open(tmp_path / "khong_ton_tai", "rb")))
+
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(iter_zip_stored(entries))))
+    assert archive.namelist() == ["a.pdf"]